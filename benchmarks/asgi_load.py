@@ -0,0 +1,194 @@
+"""
+Load-test the sync search views against the async JSON API under ASGI.
+
+Requests are fed straight into the project's ASGI application, with a fixed
+number in flight at once, so the comparison covers Django's request
+handling (sync views run one at a time in the thread-sensitive executor;
+async views run on the event loop) without a server or network in the way.
+A ticker task records the worst event-loop stall seen during each run.
+
+Usage: python -m benchmarks.asgi_load [--shape cycle] [--airports 10000] [--requests 500]
+                                      [--concurrency 1 8 32] [--seed 0]
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from benchmarks.synthetic import SHAPES, airport_code, load_network
+
+from django.core.asgi import get_asgi_application
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+
+async def _request(app, method: str, path: str, params: dict, cookie: str = None, token: str = None):
+    """
+    Send one HTTP request through 'app'. Returns (status, headers).
+    """
+    query = body = b''
+    headers = [(b'host', b'testserver')]
+    if method == 'GET':
+        query = urlencode(params).encode()
+    else:
+        body = urlencode(params).encode()
+        headers += [
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'content-length', str(len(body)).encode()),
+        ]
+    if cookie:
+        headers += [(b'cookie', cookie.encode()), (b'x-csrftoken', token.encode())]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': query, 'root_path': '', 'headers': headers,
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    response = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client never disconnects
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = message['headers']
+
+    await app(scope, receive, send)
+    return response['status'], response['headers']
+
+
+async def _csrf_token(app) -> str:
+    """
+    Fetch a CSRF token for the sync views' POST forms.
+    """
+    _, headers = await _request(app, 'GET', '/shortest-node/', {})
+    for name, value in headers:
+        if name.lower() == b'set-cookie' and value.startswith(b'csrftoken='):
+            return value.split(b';')[0].split(b'=', 1)[1].decode()
+    raise RuntimeError("No CSRF cookie set")
+
+
+async def _ticker(stop: asyncio.Event, lag: list):
+    """
+    Record the worst delay of a 1 ms sleep, i.e. the longest event-loop stall.
+    """
+    while not stop.is_set():
+        began = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lag[0] = max(lag[0], time.perf_counter() - began - 0.001)
+
+
+async def run(app, requests: list, concurrency: int, token: str) -> dict:
+    """
+    Send 'requests' with at most 'concurrency' in flight; return throughput and latencies.
+    """
+    pending = iter(requests)
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for method, path, params in pending:
+            began = time.perf_counter()
+            if method == 'GET':
+                status, _ = await _request(app, method, path, params)
+            else:
+                status, _ = await _request(app, method, path, params, f'csrftoken={token}', token)
+            latencies.append(time.perf_counter() - began)
+            errors += status != 200
+
+    stop, lag = asyncio.Event(), [0.0]
+    ticker = asyncio.create_task(_ticker(stop, lag))
+    began = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - began
+    stop.set()
+    await ticker
+
+    latencies.sort()
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': 1000 * latencies[len(latencies) // 2],
+        'p99_ms': 1000 * latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+        'max_loop_stall_ms': 1000 * lag[0],
+        'errors': errors,
+    }
+
+
+def _workload(size: int, count: int, seed: int) -> dict:
+    """
+    Build the same mix of nth/longest/shortest queries for both modes.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        kind = rng.choice(('nth', 'longest', 'shortest'))
+        start, end = airport_code(rng.randrange(size)), airport_code(rng.randrange(size))
+        if kind == 'nth':
+            params = {'airport_code': start, 'direction': rng.choice(('left', 'right')), 'n': rng.randint(1, size)}
+        elif kind == 'longest':
+            params = {'airport_code': start}
+        else:
+            params = {'from_airport': start, 'to_airport': end}
+        queries.append((kind, params))
+    sync_paths = {'nth': '/nth-node/', 'longest': '/longest-node/', 'shortest': '/shortest-node/'}
+    async_paths = {'nth': '/api/nth-node/', 'longest': '/api/longest-node/', 'shortest': '/api/shortest-route/'}
+    return {
+        'sync views': [('POST', sync_paths[kind], params) for kind, params in queries],
+        'async api': [('GET', async_paths[kind], params) for kind, params in queries],
+    }
+
+
+async def _main(args):
+    app = get_asgi_application()
+    token = await _csrf_token(app)
+    workload = _workload(args.airports, args.requests, args.seed)
+    # Warm the graph snapshot and indexes so both modes start equal
+    for mode in workload.values():
+        await run(app, mode[:20], 1, token)
+
+    for concurrency in args.concurrency:
+        for mode, requests in workload.items():
+            result = await run(app, requests, concurrency, token)
+            print(
+                f"concurrency {concurrency:>3} {mode:<11} {result['throughput']:8.1f} req/s"
+                f"  p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms"
+                f"  max loop stall {result['max_loop_stall_ms']:8.2f} ms  errors {result['errors']}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='cycle')
+    parser.add_argument('--airports', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    index_dir = tempfile.TemporaryDirectory(prefix='route-bench-')
+    # DEBUG query logging would dominate the timings
+    isolated = override_settings(DEBUG=False, ROUTES_INDEX_DIR=index_dir.name, ROUTES_GRAPH_FILE=None)
+    isolated.enable()
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        load_network(args.shape, args.airports, args.seed)
+        print(f"{args.shape} network, {args.airports} airports, {args.requests} requests per run")
+        asyncio.run(_main(args))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        isolated.disable()
+        index_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare unidirectional and bidirectional Dijkstra on a synthetic network.
+
+Usage: python -m benchmarks.bidirectional_dijkstra [--airports 100000] [--queries 50] [--seed 0]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import grid_network
+from routes.search import bidirectional_dijkstra, dijkstra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--airports', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    graph = grid_network(args.airports, args.seed)
+    graph.reverse()  # built once per snapshot; keep it out of the timings
+    rng = random.Random(args.seed)
+
+    totals = {'dijkstra': [0, 0.0], 'bidirectional': [0, 0.0]}
+    answered = 0
+    while answered < args.queries:
+        start, target = rng.randrange(graph.num_airports), rng.randrange(graph.num_airports)
+        results = {}
+        for name, search in (('dijkstra', dijkstra), ('bidirectional', bidirectional_dijkstra)):
+            stats = {}
+            began = time.perf_counter()
+            found = search(graph, start, target, stats)
+            totals[name][1] += time.perf_counter() - began
+            totals[name][0] += stats['settled']
+            results[name] = found and found[0]
+        if results['dijkstra'] is None:
+            continue
+        assert results['dijkstra'] == results['bidirectional'], (start, target, results)
+        answered += 1
+
+    print(f"{graph.num_airports} airports, {graph.num_routes} routes, {answered} queries")
+    for name, (settled, seconds) in totals.items():
+        print(f"{name:>14}: {settled / answered:12.0f} settled/query {1000 * seconds / answered:10.2f} ms/query")
+    ratio = totals['bidirectional'][0] / totals['dijkstra'][0]
+    print(f"settled-node reduction: {100 * (1 - ratio):.1f}%")
+
+
+if __name__ == '__main__':
+    main()
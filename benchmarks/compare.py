@@ -0,0 +1,59 @@
+"""
+Compare two benchmarks.suite result files.
+
+Prints one line per (shape, airports, target) present in both files with the
+relative change of the chosen latency metric, query count and peak memory,
+and exits with status 1 if any latency regressed by more than --threshold.
+
+Usage: python -m benchmarks.compare BASE.json NEW.json [--metric p50_ms] [--threshold 0.2]
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return {(r['shape'], r['airports'], r['target']): r for r in report['results']}
+
+
+def _change(old: float, new: float) -> float:
+    """
+    Relative change from 'old' to 'new' (0.25 means 25% higher).
+    """
+    if old == 0:
+        return 0.0 if new == 0 else float('inf')
+    return (new - old) / old
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='p50_ms', help="Latency field to compare (default p50_ms)")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    base, new = _load(args.base), _load(args.new)
+    regressions = 0
+    for key in sorted(base.keys() & new.keys()):
+        old_result, new_result = base[key], new[key]
+        latency = _change(old_result[args.metric], new_result[args.metric])
+        flag = ''
+        if latency > args.threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        shape, airports, target = key
+        print(
+            f"{shape:<6} {airports:>8} {target:<28}"
+            f" {args.metric} {old_result[args.metric]:9.3f} -> {new_result[args.metric]:9.3f} ({latency:+7.1%})"
+            f"  queries {old_result['queries_mean']:6.2f} -> {new_result['queries_mean']:6.2f}"
+            f"  peak {_change(old_result['peak_memory_kib'], new_result['peak_memory_kib']):+7.1%}{flag}"
+        )
+    print(f"{regressions} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
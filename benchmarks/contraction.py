@@ -0,0 +1,69 @@
+"""
+Compare contraction-hierarchy queries with Dijkstra and bidirectional Dijkstra.
+
+Builds a contraction hierarchy for a synthetic network (reporting the
+preprocessing time, shortcuts added and the size of the uncontracted core),
+then answers the same random origin/destination pairs with all three
+searches and reports the mean time and airports settled per query. Every
+hierarchy answer is checked against Dijkstra's distance.
+
+Usage: python -m benchmarks.contraction [--shape grid] [--airports 100000] [--queries 200]
+                                        [--witness-limit 200] [--core-degree 12] [--seed 0]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import SHAPES, airport_code, generate
+from routes.contraction import DEFAULT_CORE_DEGREE, DEFAULT_WITNESS_LIMIT, build_contraction_hierarchy
+from routes.graph import RouteGraph
+from routes.search import bidirectional_dijkstra, dijkstra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='grid')
+    parser.add_argument('--airports', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--witness-limit', type=int, default=DEFAULT_WITNESS_LIMIT)
+    parser.add_argument('--core-degree', type=float, default=DEFAULT_CORE_DEGREE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    airports = ((i + 1, airport_code(i)) for i in range(args.airports))
+    routes = generate(args.shape, args.airports, args.seed)
+    graph = RouteGraph.from_rows(airports, ((n + 1, i + 1, j + 1, d, p) for n, (i, j, p, d) in enumerate(routes)))
+
+    began = time.perf_counter()
+    hierarchy = build_contraction_hierarchy(graph, args.witness_limit, args.core_degree)
+    built = time.perf_counter() - began
+    print(f"{args.shape} network, {args.airports} airports, {graph.num_routes} routes")
+    print(f"  preprocessing: {built:.2f}s, {hierarchy.shortcuts} shortcuts, {hierarchy.core} core airports")
+
+    pairs = [(rng.randrange(args.airports), rng.randrange(args.airports)) for _ in range(args.queries)]
+    expected = {}
+    searches = (
+        ('dijkstra', lambda s, t, stats: dijkstra(graph, s, t, stats)),
+        ('bidirectional', lambda s, t, stats: bidirectional_dijkstra(graph, s, t, stats)),
+        ('contraction', lambda s, t, stats: hierarchy.shortest(graph, s, t, stats)),
+    )
+    for name, search in searches:
+        elapsed = settled = 0
+        for start, target in pairs:
+            stats = {}
+            began = time.perf_counter()
+            found = search(start, target, stats)
+            elapsed += time.perf_counter() - began
+            settled += stats['settled']
+            distance = found[0] if found else None
+            if name == 'dijkstra':
+                expected[start, target] = distance
+            elif distance != expected[start, target]:
+                raise SystemExit(f"{name} disagrees with dijkstra for {start} -> {target}")
+        n = len(pairs)
+        print(f"  {name:>13}: {1000 * elapsed / n:9.3f} ms per query  {settled / n:10.1f} airports settled")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Measure how the cost of Yen's k-shortest-paths search grows with k.
+
+For random reachable origin/destination pairs of a synthetic network, the
+k shortest loopless paths are computed for each k; the mean time, spur
+searches and airports settled per query are reported next to a single
+Dijkstra search between the same pairs for scale.
+
+Usage: python -m benchmarks.k_shortest [--shape grid] [--airports 100000] [--k 1 2 4 8 16]
+                                       [--queries 20] [--seed 0]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import SHAPES, airport_code, generate
+from routes.graph import RouteGraph
+from routes.search import dijkstra, k_shortest_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='grid')
+    parser.add_argument('--airports', type=int, default=100000)
+    parser.add_argument('--k', nargs='+', type=int, default=[1, 2, 4, 8, 16])
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    airports = ((i + 1, airport_code(i)) for i in range(args.airports))
+    routes = generate(args.shape, args.airports, args.seed)
+    graph = RouteGraph.from_rows(airports, ((n + 1, i + 1, j + 1, d, p) for n, (i, j, p, d) in enumerate(routes)))
+
+    # Only pairs with a path say anything about k
+    pairs = []
+    while len(pairs) < args.queries:
+        start, target = rng.randrange(args.airports), rng.randrange(args.airports)
+        if dijkstra(graph, start, target) is not None:
+            pairs.append((start, target))
+    began = time.perf_counter()
+    for start, target in pairs:
+        dijkstra(graph, start, target)
+    single = (time.perf_counter() - began) / len(pairs)
+    print(f"{args.shape} network, {args.airports} airports, {len(pairs)} reachable pairs")
+    print(f"  dijkstra (for scale): {1000 * single:9.2f} ms per query")
+
+    for k in args.k:
+        elapsed = spurs = settled = paths = 0
+        for start, target in pairs:
+            stats = {}
+            began = time.perf_counter()
+            found = k_shortest_paths(graph, start, target, k, stats)
+            elapsed += time.perf_counter() - began
+            spurs += stats.get('spurs', 0)
+            settled += stats.get('settled', 0)
+            paths += len(found)
+        n = len(pairs)
+        print(f"  k={k:>3}: {1000 * elapsed / n:9.2f} ms  {paths / n:5.1f} paths  {spurs / n:8.1f} spur searches"
+              f"  {settled / n:10.1f} airports settled  ({settled / max(spurs, 1):.1f} per spur)")
+
+
+if __name__ == '__main__':
+    main()
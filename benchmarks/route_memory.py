@@ -0,0 +1,112 @@
+"""
+Compare the memory cost of the ORM route map with the array-backed snapshot.
+
+The original find_shortest_route_between() loaded every AirportRoute with
+both airports joined and kept the instances in a route map; the current
+code reads plain rows into a RouteGraph and describes only the legs of the
+returned path as RouteLeg records. For a synthetic network loaded into a
+throwaway test database, both are built under tracemalloc and their peak
+and retained memory and build time are reported, followed by the cost of
+describing one path's legs either way.
+
+Usage: python -m benchmarks.route_memory [--shape grid] [--airports 100000] [--seed 0]
+"""
+import argparse
+from collections import defaultdict
+import gc
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import SHAPES, load_network
+
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from routes.graph import RouteGraph
+from routes.models import AirportRoute
+from routes.search import dijkstra
+from routes.utils import _path_answer, _route_result
+
+
+def _orm_route_map():
+    """
+    Build the adjacency and route map the way the original search did.
+    """
+    graph = defaultdict(list)
+    route_map = {}
+    for r in AirportRoute.objects.select_related('from_airport', 'to_airport').all():
+        graph[r.from_airport_id].append((r.to_airport_id, r.duration))
+        route_map[(r.from_airport_id, r.to_airport_id)] = r
+    return graph, route_map
+
+
+def _traced(func, *args):
+    """
+    Run func(*args) under tracemalloc, keeping its result alive while measuring.
+
+    Returns:
+        (result, seconds, peak bytes, retained bytes)
+    """
+    gc.collect()
+    tracemalloc.start()
+    began = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - began
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak, retained
+
+
+def _report(name: str, elapsed: float, peak: int, retained: int):
+    print(f"  {name:<24} {1000 * elapsed:10.1f} ms  peak {peak / 1024:10.1f} KiB  retained {retained / 1024:10.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='grid')
+    parser.add_argument('--airports', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    index_dir = tempfile.TemporaryDirectory(prefix='route-bench-')
+    # DEBUG query logging would hold on to every query
+    isolated = override_settings(DEBUG=False, ROUTES_INDEX_DIR=index_dir.name, ROUTES_GRAPH_FILE=None)
+    isolated.enable()
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        load_network(args.shape, args.airports, args.seed)
+        routes = AirportRoute.objects.count()
+        print(f"{args.shape} network, {args.airports} airports, {routes} routes")
+
+        _, elapsed, peak, retained = _traced(_orm_route_map)
+        _report("ORM route map", elapsed, peak, retained)
+        graph, elapsed, peak, retained = _traced(RouteGraph.from_database)
+        _report("RouteGraph snapshot", elapsed, peak, retained)
+
+        # One long path, described both ways
+        rng = random.Random(args.seed)
+        found = None
+        while found is None or len(found[1]) < 10:
+            start = rng.randrange(args.airports)
+            found = dijkstra(graph, start, rng.randrange(args.airports))
+        answer = _path_answer(graph, start, *found)
+        print(f"path of {len(answer['route_ids'])} legs:")
+        _, elapsed, peak, retained = _traced(
+            lambda ids: list(AirportRoute.objects.select_related('from_airport', 'to_airport').in_bulk(ids).values()),
+            answer['route_ids'],
+        )
+        _report("AirportRoute instances", elapsed, peak, retained)
+        _, elapsed, peak, retained = _traced(_route_result, graph, answer)
+        _report("RouteLeg records", elapsed, peak, retained)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        isolated.disable()
+        index_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
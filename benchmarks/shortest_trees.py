@@ -0,0 +1,84 @@
+"""
+Compare incremental shortest-path tree repair with rebuilding the tree.
+
+A route of a synthetic network is added (the network is first built without
+it), shortened or deleted, and the stored tree of a random origin is brought
+up to date both ways; the results are checked to agree.
+
+Usage: python -m benchmarks.shortest_trees [--shape grid] [--airports 100000] [--changes 20] [--seed 0]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import SHAPES, airport_code, generate
+from routes.graph import RouteGraph
+from routes.shortest_trees import NetworkEdits, ShortestPathTree
+
+
+KINDS = ('insert', 'decrease', 'delete')
+
+
+def _graph(size: int, routes: list) -> RouteGraph:
+    airports = ((i + 1, airport_code(i)) for i in range(size))
+    return RouteGraph.from_rows(airports, ((n + 1, i + 1, j + 1, d, p) for n, (i, j, p, d) in routes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='grid')
+    parser.add_argument('--airports', type=int, default=100000)
+    parser.add_argument('--changes', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Route n has primary key n + 1; keep (from, to, position, duration) per route
+    routes = [(n, route) for n, route in enumerate(generate(args.shape, args.airports, args.seed))]
+    network = _graph(args.airports, routes)
+    totals = {kind: [0.0, 0.0, 0] for kind in KINDS}
+    for _ in range(args.changes):
+        kind = rng.choice(KINDS)
+        n, (i, j, position, duration) = rng.choice(routes)
+        # Rows stay in (from, position) order, as RouteGraph.from_rows() expects
+        without = [r for r in routes if r[0] != n]
+        before = _graph(args.airports, without) if kind == 'insert' else network
+        if kind == 'delete':
+            after = _graph(args.airports, without)
+        else:
+            new_duration = duration if kind == 'insert' else rng.randint(0, duration)
+            changed = list(routes)
+            changed[n] = (n, (i, j, position, new_duration))
+            after = _graph(args.airports, changed)
+
+        # The tree follows the change on top of the snapshot it was built on
+        tree = ShortestPathTree.build(before, rng.randrange(args.airports))
+        edits = NetworkEdits(before)
+        began = time.perf_counter()
+        if kind == 'delete':
+            edits.remove_route(n + 1)
+            repaired = tree.worsen(edits, {n + 1})
+        else:
+            edits.set_route(n + 1, i, j, new_duration)
+            repaired = tree.improve(edits, [(i, j, new_duration, n + 1)])
+        repair = time.perf_counter() - began
+
+        began = time.perf_counter()
+        fresh = ShortestPathTree.build(after, tree.origin)
+        rebuild = time.perf_counter() - began
+        assert fresh.dist == tree.dist, (kind, n)
+
+        totals[kind][0] += repair
+        totals[kind][1] += rebuild
+        totals[kind][2] += 1
+        print(f"{kind:>8}: {repaired:7d} airports repaired  "
+              f"repair {1000 * repair:9.2f} ms  rebuild {1000 * rebuild:9.2f} ms")
+
+    for kind, (repair, rebuild, changes) in totals.items():
+        if changes:
+            print(f"{kind:>8} mean: repair {1000 * repair / changes:9.2f} ms  "
+                  f"rebuild {1000 * rebuild / changes:9.2f} ms  ({100 * repair / rebuild:.2f}% of a rebuild)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+Benchmark routes.utils and the search views on synthetic networks.
+
+Each (shape, size) network is loaded into a throwaway test database. For
+every target the suite runs one cold call (right after the graph version is
+bumped, so caches and snapshots are rebuilt) and then a set of warm calls,
+recording latency percentiles, SQL query counts and peak traced memory.
+Results are written as JSON so runs on different commits can be compared
+with benchmarks.compare.
+
+Usage: python -m benchmarks.suite [--shapes tree chain dag cycle] [--sizes 1000 10000]
+                                  [--queries 100] [--seed 0] [--output results.json]
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.synthetic import SHAPES, airport_code, load_network
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from routes.graph import bump_graph_version
+from routes.utils import find_longest_node, find_nth_node, find_shortest_route_between
+
+
+DEFAULT_SHAPES = ('tree', 'chain', 'dag', 'cycle')
+DEFAULT_SIZES = (1000, 10000)
+
+# Calls traced for peak memory; tracemalloc slows Python down too much to trace every call
+MEMORY_SAMPLES = 5
+
+
+def _percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _queries(size: int, count: int, rng) -> dict:
+    """
+    Draw the argument lists for every benchmark target.
+
+    Returns:
+        dict of target name -> list of argument tuples
+    """
+    code = lambda: airport_code(rng.randrange(size))  # noqa: E731
+    nth = [(code(), rng.choice(('left', 'right')), rng.randint(1, size)) for _ in range(count)]
+    longest = [(code(),) for _ in range(count)]
+    shortest = [(code(), code()) for _ in range(count)]
+    return {
+        'find_nth_node': (find_nth_node, nth),
+        'find_longest_node': (find_longest_node, longest),
+        'find_shortest_route_between': (find_shortest_route_between, shortest),
+        'view:nth_node': ('routes:nth_node', [
+            {'airport_code': start, 'direction': direction, 'n': n} for start, direction, n in nth
+        ]),
+        'view:longest_node': ('routes:longest_node', [{'airport_code': start} for start, in longest]),
+        'view:shortest_node': ('routes:shortest_node', [
+            {'from_airport': start, 'to_airport': end} for start, end in shortest
+        ]),
+    }
+
+
+def _caller(client, target, args):
+    """
+    Return a zero-argument callable running one benchmark call.
+    """
+    if isinstance(target, str):
+        url = reverse(target)
+
+        def call():
+            response = client.post(url, args)
+            assert response.status_code == 200, (url, args, response.status_code)
+    else:
+        def call():
+            target(*args)
+    return call
+
+
+def _measure(call):
+    """
+    Run 'call' once, returning (seconds, query count).
+    """
+    with CaptureQueriesContext(connection) as captured:
+        began = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - began
+    return elapsed, len(captured.captured_queries)
+
+
+def run_target(client, target, arg_list) -> dict:
+    """
+    Benchmark one target over 'arg_list'. The first call runs cold.
+    """
+    calls = [_caller(client, target, args) for args in arg_list]
+
+    bump_graph_version()
+    cold, cold_queries = _measure(calls[0])
+
+    latencies, query_counts = [], []
+    for call in calls:
+        elapsed, queries = _measure(call)
+        latencies.append(elapsed * 1000)
+        query_counts.append(queries)
+    latencies.sort()
+
+    # Peak memory of a cold call followed by a few warm ones
+    bump_graph_version()
+    tracemalloc.start()
+    for call in calls[:MEMORY_SAMPLES]:
+        call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'calls': len(latencies),
+        'cold_ms': round(cold * 1000, 3),
+        'cold_queries': cold_queries,
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(_percentile(latencies, 0.50), 3),
+        'p95_ms': round(_percentile(latencies, 0.95), 3),
+        'p99_ms': round(_percentile(latencies, 0.99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries_mean': round(sum(query_counts) / len(query_counts), 2),
+        'queries_max': max(query_counts),
+        'peak_memory_kib': round(peak / 1024, 1),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--shapes', nargs='+', choices=sorted(SHAPES), default=list(DEFAULT_SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument('--queries', type=int, default=100, help="Warm calls per target")
+    parser.add_argument('--targets', nargs='+', help="Only run targets whose name contains one of these")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark-results.json')
+    args = parser.parse_args()
+
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seed': args.seed,
+        'results': [],
+    }
+
+    # Keep persisted indexes and the mapped graph file of the real database out of the way
+    index_dir = tempfile.TemporaryDirectory(prefix='route-bench-')
+    isolated = override_settings(ROUTES_INDEX_DIR=index_dir.name, ROUTES_GRAPH_FILE=None)
+    isolated.enable()
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    client = Client()
+    try:
+        for shape in args.shapes:
+            for size in args.sizes:
+                began = time.perf_counter()
+                load_network(shape, size, args.seed)
+                load_seconds = time.perf_counter() - began
+                print(f"{shape} x {size}: loaded in {load_seconds:.1f}s", file=sys.stderr)
+
+                rng = random.Random(args.seed)
+                for name, (target, arg_list) in _queries(size, args.queries, rng).items():
+                    if args.targets and not any(part in name for part in args.targets):
+                        continue
+                    result = run_target(client, target, arg_list)
+                    result.update(shape=shape, airports=size, target=name)
+                    report['results'].append(result)
+                    print(
+                        f"  {name:<28} p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms"
+                        f"  cold {result['cold_ms']:10.3f} ms  queries {result['queries_mean']:6.2f}"
+                        f"  peak {result['peak_memory_kib']:10.1f} KiB",
+                        file=sys.stderr,
+                    )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        isolated.disable()
+        index_dir.cleanup()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Seeded synthetic route networks for benchmarks.
+
+Every shape yields routes as (from_index, to_index, position, duration)
+tuples over airports 0..size-1, ordered by source and position. Networks
+can be built as in-memory RouteGraph snapshots (no database needed) or
+loaded into the database with bulk inserts.
+
+Shapes:
+    tree   complete binary tree (i -> 2i+1 left, 2i+2 right)
+    chain  one long left chain (i -> i+1) and a right chain skipping one airport
+    dag    random DAG; every route points to a higher-numbered airport
+    cycle  random functional graph per direction, full of cycles
+    grid   road-like grid; routes go to a random airport at most two cells away
+"""
+import os
+import random
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "flight_routes.settings")
+django.setup()
+
+from routes.graph import RouteGraph, bump_graph_version  # noqa: E402
+from routes.models import Airport, AirportRoute  # noqa: E402
+
+
+LEFT, RIGHT = AirportRoute.LEFT, AirportRoute.RIGHT
+
+
+def airport_code(i: int) -> str:
+    """
+    Return the synthetic airport code for node 'i'.
+    """
+    return f"S{i}"
+
+
+def _tree(size, rng, max_duration):
+    for i in range(size):
+        for position, child in ((LEFT, 2 * i + 1), (RIGHT, 2 * i + 2)):
+            if child < size:
+                yield i, child, position, rng.randint(1, max_duration)
+
+
+def _chain(size, rng, max_duration):
+    for i in range(size):
+        if i + 1 < size:
+            yield i, i + 1, LEFT, rng.randint(1, max_duration)
+        if i + 2 < size:
+            yield i, i + 2, RIGHT, rng.randint(1, max_duration)
+
+
+def _dag(size, rng, max_duration):
+    for i in range(size - 1):
+        # One short hop and one long jump, both forward
+        yield i, rng.randint(i + 1, min(size - 1, i + 10)), LEFT, rng.randint(1, max_duration)
+        yield i, rng.randint(i + 1, size - 1), RIGHT, rng.randint(1, max_duration)
+
+
+def _cycle(size, rng, max_duration):
+    for i in range(size):
+        for position in (LEFT, RIGHT):
+            j = rng.randrange(size - 1)
+            yield i, j if j < i else j + 1, position, rng.randint(1, max_duration)
+
+
+def _grid(size, rng, max_duration):
+    side = max(1, int(size ** 0.5))
+    for i in range(size):
+        x, y = i % side, i // side
+        for position in (LEFT, RIGHT):
+            while True:
+                nx = x + rng.randint(-2, 2)
+                ny = y + rng.randint(-2, 2)
+                j = ny * side + nx
+                if 0 <= nx < side and 0 <= j < size and j != i:
+                    break
+            yield i, j, position, rng.randint(1, max_duration)
+
+
+SHAPES = {
+    'tree': _tree,
+    'chain': _chain,
+    'dag': _dag,
+    'cycle': _cycle,
+    'grid': _grid,
+}
+
+
+def generate(shape: str, size: int, seed: int = 0, max_duration: int = 1000):
+    """
+    Yield the routes of a synthetic network as (from_index, to_index, position, duration).
+    """
+    if size < 2:
+        return iter(())
+    return SHAPES[shape](size, random.Random(seed), max_duration)
+
+
+def network_graph(shape: str, size: int, seed: int = 0, max_duration: int = 1000) -> RouteGraph:
+    """
+    Build a synthetic network directly as an in-memory RouteGraph.
+    Airport i gets primary key i + 1.
+    """
+    airports = ((i + 1, airport_code(i)) for i in range(size))
+    routes = (
+        (n + 1, i + 1, j + 1, duration, position)
+        for n, (i, j, position, duration) in enumerate(generate(shape, size, seed, max_duration))
+    )
+    return RouteGraph.from_rows(airports, routes)
+
+
+def grid_network(size: int, seed: int = 0, max_duration: int = 1000) -> RouteGraph:
+    """
+    Shortcut for network_graph('grid', ...).
+    """
+    return network_graph('grid', size, seed, max_duration)
+
+
+def load_network(shape: str, size: int, seed: int = 0, batch_size: int = 5000):
+    """
+    Replace the database contents with a synthetic network.
+
+    Returns:
+        list of Airport primary keys indexed by synthetic airport index.
+    """
+    AirportRoute.objects.all().delete()
+    Airport.objects.all().delete()
+    for start in range(0, size, batch_size):
+        Airport.objects.bulk_create(
+            Airport(code=airport_code(i), name=f"Synthetic {i}")
+            for i in range(start, min(size, start + batch_size))
+        )
+    # Codes were inserted in index order, so primary keys are too
+    ids = list(Airport.objects.order_by('pk').values_list('pk', flat=True))
+
+    batch = []
+    for i, j, position, duration in generate(shape, size, seed):
+        batch.append(AirportRoute(from_airport_id=ids[i], to_airport_id=ids[j], position=position, duration=duration))
+        if len(batch) >= batch_size:
+            AirportRoute.objects.bulk_create(batch)
+            batch = []
+    AirportRoute.objects.bulk_create(batch)
+    # Bulk inserts send no model signals
+    bump_graph_version()
+    return ids
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so it times the whole request (see routes.metrics)
+    "routes.metrics.RouteMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,11 +82,100 @@ WSGI_APPLICATION = "flight_routes.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# The primary database takes every write: the SQLite file DJANGO_DB_NAME
+# (relative to BASE_DIR), or with DJANGO_DB_ENGINE=postgresql a PostgreSQL
+# database (needs psycopg) configured by DJANGO_DB_NAME, DJANGO_DB_USER,
+# DJANGO_DB_PASSWORD, DJANGO_DB_HOST and DJANGO_DB_PORT.
+DB_ENGINE = os.environ.get("DJANGO_DB_ENGINE", "sqlite3")
+
+# Read replicas (comma-separated) that routes.routers.ReplicaRouter sends
+# lookups to: SQLite file paths (relative to BASE_DIR; the primary's own file
+# gives a separate read connection, other files are refreshed with
+# `manage.py sync_sqlite_replicas`) or PostgreSQL hosts as HOST[:PORT].
+DB_REPLICAS = [r.strip() for r in os.environ.get("DJANGO_DB_REPLICAS", "").split(",") if r.strip()]
+
+# Seconds a connection is kept open and reused by later requests (0 closes it
+# after every request); reused connections are checked before use, so one
+# dropped by the server is replaced transparently
+DB_CONN_MAX_AGE = int(os.environ.get("DJANGO_DB_CONN_MAX_AGE", "60"))
+
+# SQLite runs in WAL mode, so readers keep a consistent snapshot while a writer
+# appends to the log instead of waiting for each other; synchronous=NORMAL only
+# risks the last commits on power loss in WAL mode. init_command runs on every
+# new connection.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;"
+    "PRAGMA synchronous=NORMAL;"
+    "PRAGMA temp_store=MEMORY;"
+    "PRAGMA cache_size=-65536;"  # 64 MiB page cache per connection
+    "PRAGMA mmap_size=268435456"  # map up to 256 MiB of the file
+)
+
+
+def _database(name=None, host=None, replica=False):
+    """
+    Settings dict for the primary, or for a replica at SQLite file 'name' /
+    PostgreSQL 'host'.
+    """
+    database = {
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
     }
+    if DB_ENGINE == "postgresql":
+        host, _, port = (host or os.environ.get("DJANGO_DB_HOST", "localhost")).partition(":")
+        database.update({
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DJANGO_DB_NAME", "flight_routes"),
+            "USER": os.environ.get("DJANGO_DB_USER", "postgres"),
+            "PASSWORD": os.environ.get("DJANGO_DB_PASSWORD", ""),
+            "HOST": host,
+            "PORT": port or os.environ.get("DJANGO_DB_PORT", "5432"),
+        })
+    else:
+        database.update({
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / (name or os.environ.get("DJANGO_DB_NAME", "db.sqlite3")),
+            "OPTIONS": {
+                "timeout": 20,  # seconds to wait for a lock before "database is locked"
+                # Replica connections refuse writes
+                "init_command": SQLITE_PRAGMAS + (";PRAGMA query_only=ON" if replica else ""),
+            },
+        })
+    if replica:
+        # Tests run against the primary's test database only
+        database["TEST"] = {"MIRROR": "default"}
+    return database
+
+
+DATABASES = {"default": _database()}
+for number, replica in enumerate(DB_REPLICAS, 1):
+    if DB_ENGINE == "postgresql":
+        DATABASES[f"replica{number}"] = _database(host=replica, replica=True)
+    else:
+        DATABASES[f"replica{number}"] = _database(name=replica, replica=True)
+
+DATABASE_ROUTERS = ["routes.routers.ReplicaRouter"]
+
+# Seconds a replica that failed to connect is skipped before it is tried again
+ROUTES_REPLICA_RETRY_SECONDS = int(os.environ.get("ROUTES_REPLICA_RETRY_SECONDS", "30"))
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Shortest-route and nth-node answers (see routes.result_cache). Swap the
+    # backend for django.core.cache.backends.filebased.FileBasedCache (with a
+    # directory as LOCATION) to share answers between worker processes.
+    "routes": {
+        "BACKEND": "routes.result_cache.CountingLocMemCache",
+        "LOCATION": "route-results",
+        "TIMEOUT": int(os.environ.get("ROUTES_RESULT_CACHE_TIMEOUT", "3600")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("ROUTES_RESULT_CACHE_ENTRIES", "10000"))},
+    },
 }
 
 
@@ -134,3 +225,76 @@ MEDIA_ROOT = BASE_DIR / "media"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Route graph engines
+
+# Engine used by find_nth_node: "auto"/"jump" (binary lifting index), "sql"
+# (single recursive query on SQLite/PostgreSQL), "memory" (cached graph walk)
+# or "chain" (indexed lookup in the table written by `manage.py build_chain_index`)
+ROUTES_NTH_NODE_ENGINE = os.environ.get("ROUTES_NTH_NODE_ENGINE", "auto")
+
+# A write whose chains span more airports than this empties the chain index
+# instead of laying them out again inside the request
+ROUTES_CHAIN_INDEX_MAX_RELAYOUT = int(os.environ.get("ROUTES_CHAIN_INDEX_MAX_RELAYOUT", "100000"))
+
+# Seconds a process may reuse its last check of the shared network stamp
+# before reading it again, so warm queries make no database round trip;
+# writes by other processes can be served that much later (0: check before
+# every use of the cached graph). Writes of the process itself reset it.
+ROUTES_GRAPH_STAMP_TTL = float(os.environ.get("ROUTES_GRAPH_STAMP_TTL", "1"))
+
+# Directory where precomputed route indexes are persisted between restarts
+ROUTES_INDEX_DIR = Path(os.environ.get("ROUTES_INDEX_DIR", BASE_DIR / "route_indexes"))
+
+# Patches of the jump-pointer index applied in memory before it is written
+# back to ROUTES_INDEX_DIR (it is also written when the process exits)
+ROUTES_JUMP_INDEX_SAVE_EVERY = int(os.environ.get("ROUTES_JUMP_INDEX_SAVE_EVERY", "1000"))
+
+# Use the distance index written by `manage.py build_distance_index` for
+# shortest-route queries while it matches the current network
+ROUTES_USE_DISTANCE_INDEX = os.environ.get("ROUTES_USE_DISTANCE_INDEX", "True") == "True"
+
+# Use the contraction hierarchy written by `manage.py build_contraction_hierarchy`
+# for shortest-route queries while it matches the current network
+ROUTES_USE_CONTRACTION_HIERARCHY = os.environ.get("ROUTES_USE_CONTRACTION_HIERARCHY", "True") == "True"
+
+# Networks up to this many airports get an all-pairs table; larger ones get ALT landmarks
+ROUTES_APSP_MAX_AIRPORTS = int(os.environ.get("ROUTES_APSP_MAX_AIRPORTS", "2000"))
+
+# Number of landmarks used by the ALT index
+ROUTES_ALT_LANDMARKS = int(os.environ.get("ROUTES_ALT_LANDMARKS", "8"))
+
+# Networks with at least this many airports use bidirectional Dijkstra by default
+ROUTES_BIDIRECTIONAL_MIN_AIRPORTS = int(os.environ.get("ROUTES_BIDIRECTIONAL_MIN_AIRPORTS", "10000"))
+
+# Maximum number of origin/destination pairs accepted by one batch shortest-route request
+ROUTES_BATCH_MAX_PAIRS = int(os.environ.get("ROUTES_BATCH_MAX_PAIRS", "10000"))
+
+# Worker processes used for batch shortest-route requests (0 or 1 runs them in-process)
+ROUTES_BATCH_WORKERS = int(os.environ.get("ROUTES_BATCH_WORKERS", "0"))
+
+# Threads running shortest-route searches for the async API, so searches never block the event loop
+ROUTES_ASYNC_SEARCH_WORKERS = int(os.environ.get("ROUTES_ASYNC_SEARCH_WORKERS", "4"))
+
+# Shortest-path trees kept for the most queried origins, and the queries an
+# origin needs before it gets one (see routes.shortest_trees); 0 disables them
+ROUTES_SHORTEST_TREES = int(os.environ.get("ROUTES_SHORTEST_TREES", "8"))
+ROUTES_SHORTEST_TREE_MIN_QUERIES = int(os.environ.get("ROUTES_SHORTEST_TREE_MIN_QUERIES", "5"))
+
+# Cache alias (in CACHES) holding query answers; set to an empty string to disable
+ROUTES_RESULT_CACHE = os.environ.get("ROUTES_RESULT_CACHE", "routes")
+
+# Binary graph file written by `manage.py export_route_graph`; mapped by every
+# worker instead of loading the routes from the database while it is up to date
+ROUTES_GRAPH_FILE = Path(os.environ.get("ROUTES_GRAPH_FILE", ROUTES_INDEX_DIR / "route_graph.bin"))
+
+# Default and maximum page sizes of the JSON airport and route listings
+ROUTES_API_PAGE_SIZE = int(os.environ.get("ROUTES_API_PAGE_SIZE", "100"))
+ROUTES_API_MAX_PAGE_SIZE = int(os.environ.get("ROUTES_API_MAX_PAGE_SIZE", "1000"))
+
+# Rows fetched per database round trip by the streaming export (see routes.export)
+ROUTES_EXPORT_CHUNK_SIZE = int(os.environ.get("ROUTES_EXPORT_CHUNK_SIZE", "2000"))
+
+# Add a Server-Timing header with query counts and phase timings to every response
+ROUTES_SERVER_TIMING = os.environ.get("ROUTES_SERVER_TIMING", "True") == "True"
@@ -0,0 +1,194 @@
+"""
+Subtree and reachability analytics over the left/right route tree.
+
+RouteTreeIndex is built in one linear pass over the cached RouteGraph: a
+depth-first traversal (left child before right) from every airport without
+incoming routes, then from any airport not reached yet (airports on
+cycles), lays the network out as a spanning forest. Each airport gets
+Euler-tour indices 'tin' and 'tout' such that its subtree occupies the
+contiguous tour slice [tin, tout). With them:
+
+    - "is B in the subtree of A" is tin[A] <= tin[B] < tout[A]
+    - the subtree size is tout[A] - tin[A]
+    - the subtree duration is a difference of two prefix sums over the
+      durations of the routes into the airports in tour order
+
+all in O(1). When the network really is a forest (no airport has two
+incoming routes and there are no cycles), the subtree of A is exactly the
+set of airports reachable from A. Otherwise the forest keeps each airport
+under the first route that reached it, and reachable_from() falls back to a
+traversal over every route.
+
+The index lives in memory and is rebuilt the first time it is asked for
+after the graph version changes.
+"""
+from array import array
+import threading
+
+from .metrics import timed
+
+
+_index = None
+_lock = threading.Lock()
+
+
+class RouteTreeIndex:
+    """
+    Euler-tour layout of the route network's spanning forest.
+
+    Attributes:
+        version: graph version the index was built for
+        forest: bool - True if the network itself is a forest, so subtrees
+            equal reachable sets
+        parent: array of the parent airport per airport (-1 for roots)
+        root: array of the root airport of each airport's tree
+        depth: array of the number of routes from the root
+        height: array of the routes on the longest downward path in the subtree
+        tin: array of the Euler-tour entry index per airport
+        tout: array of the Euler-tour exit index (one past the subtree)
+        order: array of airports in tour order
+        prefix: array of N + 1 prefix sums of incoming route durations in tour order
+    """
+
+    __slots__ = ('version', 'forest', 'parent', 'root', 'depth', 'height', 'tin', 'tout', 'order', 'prefix')
+
+    def __init__(self, version, forest, parent, root, depth, height, tin, tout, order, prefix):
+        self.version = version
+        self.forest = forest
+        self.parent = parent
+        self.root = root
+        self.depth = depth
+        self.height = height
+        self.tin = tin
+        self.tout = tout
+        self.order = order
+        self.prefix = prefix
+
+    @classmethod
+    def from_graph(cls, graph) -> 'RouteTreeIndex':
+        """
+        Lay out 'graph' as a spanning forest in O(airports + routes).
+        """
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        n = graph.num_airports
+
+        indegree = array('i', bytes(4 * n))
+        for t in targets:
+            indegree[t] += 1
+        roots = [i for i in range(n) if indegree[i] == 0]
+        forest = all(d <= 1 for d in indegree)
+
+        parent = array('i', [-1]) * n
+        root = array('i', [-1]) * n
+        depth = array('i', bytes(4 * n))
+        height = array('i', bytes(4 * n))
+        tin = array('q', [-1]) * n
+        tout = array('q', bytes(8 * n))
+        order = array('i', bytes(4 * n))
+        incoming = array('q', bytes(8 * n))  # duration of the tree route into each tour slot
+        next_edge = array('q', offsets[:n]) if n else array('q')
+        timer = 0
+
+        # Airports on cycles are reached from no root; start from them afterwards
+        starts = roots + [i for i in range(n) if indegree[i] > 0]
+        for k, start in enumerate(starts):
+            if k == len(roots):
+                # A forest is covered by the trees grown from its roots
+                forest = forest and timer == n
+            if tin[start] >= 0:
+                continue
+            tin[start] = timer
+            order[timer] = start
+            root[start] = start
+            timer += 1
+            stack = [start]
+            while stack:
+                node = stack[-1]
+                e = next_edge[node]
+                if e < offsets[node + 1]:
+                    next_edge[node] = e + 1
+                    child = targets[e]
+                    if tin[child] < 0:
+                        parent[child] = node
+                        root[child] = start
+                        depth[child] = depth[node] + 1
+                        tin[child] = timer
+                        order[timer] = child
+                        incoming[timer] = weights[e]
+                        timer += 1
+                        stack.append(child)
+                else:
+                    stack.pop()
+                    tout[node] = timer
+                    up = parent[node]
+                    if up >= 0 and height[node] + 1 > height[up]:
+                        height[up] = height[node] + 1
+
+        prefix = array('q', [0]) * (n + 1)
+        for k in range(n):
+            prefix[k + 1] = prefix[k] + incoming[k]
+        return cls(graph.version, forest, parent, root, depth, height, tin, tout, order, prefix)
+
+    def contains(self, ancestor: int, node: int) -> bool:
+        """
+        True if 'node' is in the subtree of 'ancestor' (itself included).
+        """
+        return self.tin[ancestor] <= self.tin[node] < self.tout[ancestor]
+
+    def subtree_size(self, node: int) -> int:
+        """
+        Number of airports in the subtree of 'node', itself included.
+        """
+        return self.tout[node] - self.tin[node]
+
+    def subtree_duration(self, node: int) -> int:
+        """
+        Total duration of the routes inside the subtree of 'node'.
+        """
+        # The route into 'node' itself sits at tour slot tin[node] and is excluded
+        return self.prefix[self.tout[node]] - self.prefix[self.tin[node] + 1]
+
+    def subtree(self, node: int):
+        """
+        Airports in the subtree of 'node' in tour (depth-first) order.
+        """
+        return self.order[self.tin[node]:self.tout[node]]
+
+
+def get_tree_index(graph) -> RouteTreeIndex:
+    """
+    Return the RouteTreeIndex for 'graph', building it if the graph version changed.
+    """
+    global _index
+    index = _index
+    if index is not None and index.version == graph.version:
+        return index
+    with _lock:
+        if _index is None or _index.version != graph.version:
+            with timed('tree_index_build'):
+                _index = RouteTreeIndex.from_graph(graph)
+        return _index
+
+
+def reachable_from(graph, index: RouteTreeIndex, start: int) -> list:
+    """
+    Airports reachable from 'start' over any routes, 'start' included.
+
+    On a forest this is the Euler-tour slice of the subtree; otherwise a
+    depth-first traversal over every route, O(reachable airports and routes).
+    """
+    if index.forest:
+        return list(index.subtree(start))
+    offsets, targets = graph.offsets, graph.targets
+    seen = {start}
+    reached = [start]
+    stack = [start]
+    while stack:
+        node = stack.pop()
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            if neighbor not in seen:
+                seen.add(neighbor)
+                reached.append(neighbor)
+                stack.append(neighbor)
+    return reached
@@ -0,0 +1,449 @@
+import functools
+import itertools
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views.decorators.http import require_GET, require_POST
+
+from .export import CONTENT_TYPES, export_network, gzip_stream
+from .forms import (
+    AirportListForm, LongestNodesSearchForm, NthNodeSearchForm, RouteListForm, ShortestNodeSearchForm,
+    SubtreeSearchForm,
+)
+from .graph import current_stamp, network_stamp
+from .metrics import registry
+from .models import Airport, AirportRoute
+from .routers import read_from
+from .utils import (
+    afind_longest_node, afind_nth_node, afind_shortest_route_between, find_k_shortest_routes, find_longest_nodes,
+    find_reachable_airports, find_shortest_routes, find_subtree_stats, is_in_subtree,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Columns read for each field of the airport and route listings
+AIRPORT_COLUMNS = {'id': 'pk', 'code': 'code', 'name': 'name'}
+ROUTE_COLUMNS = {
+    'id': 'pk', 'from': 'from_airport__code', 'to': 'to_airport__code',
+    'position': 'position', 'duration': 'duration',
+}
+
+
+def _nth_node_reads_rows() -> bool:
+    """
+    True if find_nth_node answers from database rows rather than the route graph.
+    """
+    return getattr(settings, 'ROUTES_NTH_NODE_ENGINE', 'auto') in ('sql', 'chain')
+
+
+def _network_conditional(rows=False):
+    """
+    Make a GET view conditional on the network stamp of the data it serves.
+
+    The tag is the stamp of the database the answer is read from, read
+    before the answer, and the view's reads are held to that database (see
+    routes.routers.read_from()). Views answering from database rows ('rows'
+    true, or a callable returning whether they do) may be served by a
+    replica and carry that replica's stamp. Views answering from the cached
+    route graph read any rows from the primary and carry the stamp the graph
+    is checked against. The answer is therefore never older than its tag,
+    so a repeated request only gets a 304 while that data is unchanged.
+
+    A request whose If-None-Match matches gets a 304 without running the
+    view. Only 200 and 304 responses carry the ETag; an error is not
+    cacheable.
+    """
+    def prepare():
+        # Queries; run in a thread for async views
+        if rows() if callable(rows) else rows:
+            alias = router.db_for_read(AirportRoute)
+            return alias, f'W/"{network_stamp(alias):x}"'
+        return DEFAULT_DB_ALIAS, f'W/"{current_stamp():x}"'
+
+    def tagged(response, etag):
+        if response.status_code in (200, 304) and not response.has_header('ETag'):
+            response.headers['ETag'] = etag
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                alias, etag = await sync_to_async(prepare)()
+                with read_from(alias):
+                    response = get_conditional_response(request, etag=etag)
+                    if response is None:
+                        response = await view(request, *args, **kwargs)
+                return tagged(response, etag)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                alias, etag = prepare()
+                with read_from(alias):
+                    response = get_conditional_response(request, etag=etag)
+                    if response is None:
+                        response = view(request, *args, **kwargs)
+                return tagged(response, etag)
+        return wrapper
+    return decorator
+
+
+def _error(message: str, status: int = 400):
+    """
+    Return a JSON error response.
+    """
+    return JsonResponse({'error': message}, status=status)
+
+
+def _form_error(form):
+    """
+    Return a JSON error response listing the invalid query parameters.
+    """
+    fields = {name: [str(message) for message in messages] for name, messages in form.errors.items()}
+    return JsonResponse({'error': "Invalid query parameters.", 'fields': fields}, status=400)
+
+
+def _airport(airport):
+    """
+    Serialize an Airport (or None) for a JSON response.
+    """
+    return {'code': airport.code, 'name': airport.name} if airport else None
+
+
+def _route(result):
+    """
+    Serialize a find_shortest_route_between()-shaped result (or None) for a
+    JSON response; every shortest-route endpoint uses this shape.
+    """
+    if result is None:
+        return {'distance': None, 'path': None, 'route_ids': None}
+    return {
+        'distance': result['distance'],
+        'path': result['path'],
+        'route_ids': [route.pk for route in result['routes']],
+    }
+
+
+def _read_json(request):
+    """
+    Parse the request body as a JSON object.
+
+    Returns:
+        dict, or None if the body is not a JSON object.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _code_list(value):
+    """
+    Return 'value' if it is a list of airport code strings, else None.
+    """
+    if isinstance(value, list) and all(isinstance(code, str) for code in value):
+        return value
+    return None
+
+
+def _batch_pairs(payload):
+    """
+    Extract origin/destination pairs from a batch request body.
+
+    Accepts either {"pairs": [["JFK", "LHR"], ...]} or
+    {"sources": ["JFK", ...], "targets": ["LHR", ...]} (every source to every target).
+
+    Returns:
+        (count, pairs) where 'pairs' iterates (from_code, to_code) tuples,
+        or None if the body is malformed.
+    """
+    if 'pairs' in payload:
+        pairs = payload['pairs']
+        if not isinstance(pairs, list):
+            return None
+        if not all(_code_list(pair) is not None and len(pair) == 2 for pair in pairs):
+            return None
+        return len(pairs), [tuple(pair) for pair in pairs]
+    sources = _code_list(payload.get('sources'))
+    targets = _code_list(payload.get('targets'))
+    if sources is None or targets is None:
+        return None
+    return len(sources) * len(targets), itertools.product(sources, targets)
+
+
+def _stream_routes(first, results):
+    """
+    Yield the batch response body as JSON text, one result at a time.
+
+    'first' is the first item of 'results', already taken by the view. If a
+    later item fails, the body still ends as a valid JSON object, with an
+    'error' key telling the client the results are incomplete.
+    """
+    yield '{"results": ['
+    separator = ''
+    try:
+        for from_code, to_code, result in itertools.chain([first], results):
+            yield separator + json.dumps({'from': from_code, 'to': to_code, **_route(result)})
+            separator = ','
+    except Exception:
+        logger.exception("Batch shortest-route query failed after the response started")
+        yield '], "error": "The batch failed part way; the results are incomplete."}'
+        return
+    yield ']}'
+
+
+@csrf_exempt
+@require_POST
+def shortest_routes_batch(request):
+    """
+    Answer many shortest-route queries in one request.
+
+    Body: {"pairs": [[from, to], ...]} or {"sources": [...], "targets": [...]}.
+
+    The response is streamed as {"results": [...]}, one entry per pair with
+    'from', 'to', 'distance', 'path' and 'route_ids' (null when no path
+    exists), as returned by the single shortest-route endpoint. Entries are
+    grouped by origin rather than in request order. The searches run before
+    the first byte is sent, so a failure there is a plain error response
+    rather than a cut-off body.
+    """
+    payload = _read_json(request)
+    if payload is None:
+        return _error("Request body must be a JSON object.")
+    batch = _batch_pairs(payload)
+    if batch is None:
+        return _error("Provide 'pairs' as [[from, to], ...] or 'sources' and 'targets' as lists of codes.")
+    count, pairs = batch
+    limit = getattr(settings, 'ROUTES_BATCH_MAX_PAIRS', 10000)
+    if count > limit:
+        return _error(f"Too many pairs: {count} (limit {limit}).")
+    if not count:
+        return JsonResponse({'results': []})
+    # Loads the graph and runs every search; only serializing is left to the stream
+    results = find_shortest_routes(pairs)
+    first = next(results)
+    return StreamingHttpResponse(_stream_routes(first, results), content_type='application/json')
+
+
+@require_GET
+@_network_conditional(rows=_nth_node_reads_rows)
+async def nth_node(request):
+    """
+    Async JSON counterpart of the nth-node search page.
+
+    Query: ?airport_code=JFK&direction=left&n=3
+    Response: {"airport": {"code": ..., "name": ...}} or {"airport": null}.
+    """
+    form = NthNodeSearchForm(request.GET)
+    if not form.is_valid():
+        return _form_error(form)
+    airport = await afind_nth_node(
+        form.cleaned_data['airport_code'], form.cleaned_data['direction'], form.cleaned_data['n'],
+    )
+    return JsonResponse({'airport': _airport(airport)})
+
+
+@require_GET
+@_network_conditional(rows=True)
+async def longest_node(request):
+    """
+    Async JSON counterpart of the longest-node search page.
+
+    Query: ?airport_code=JFK
+    Response: {"airport": {"code": ..., "name": ...}} or {"airport": null}.
+    """
+    code = request.GET.get('airport_code')
+    if not code:
+        return _error("Provide 'airport_code'.")
+    return JsonResponse({'airport': _airport(await afind_longest_node(code))})
+
+
+@require_GET
+@_network_conditional(rows=True)
+def longest_nodes(request):
+    """
+    Longest-node search for many airports in one query (see find_longest_nodes).
+
+    Query: ?airport_codes=JFK,LHR,CDG
+    Response: {"airports": {"JFK": {"code": ..., "name": ...}, "LHR": null, ...}},
+    null for an unknown airport or one without outgoing routes.
+    """
+    form = LongestNodesSearchForm(request.GET)
+    if not form.is_valid():
+        return _form_error(form)
+    longest = find_longest_nodes(form.cleaned_data['airport_codes'])
+    return JsonResponse({'airports': {code: _airport(airport) for code, airport in longest.items()}})
+
+
+@require_GET
+@_network_conditional()
+async def shortest_route(request):
+    """
+    Async JSON counterpart of the shortest-node search page.
+
+    Query: ?from_airport=JFK&to_airport=LHR, optionally with max_hops=3,
+    avoid=ORD,DEN and max_leg_duration=5000.
+    Response: {"distance": ..., "path": [codes], "route_ids": [ids]}, with
+    null values when no path meets the constraints.
+    """
+    form = ShortestNodeSearchForm(request.GET)
+    if not form.is_valid():
+        return _form_error(form)
+    result = await afind_shortest_route_between(
+        form.cleaned_data['from_airport'], form.cleaned_data['to_airport'], **form.constraints(),
+    )
+    return JsonResponse(_route(result))
+
+
+@require_GET
+@_network_conditional()
+def alternative_routes(request):
+    """
+    JSON list of up to 'alternatives' loopless routes between two airports,
+    shortest first (see find_k_shortest_routes).
+
+    Query: ?from_airport=JFK&to_airport=LHR&alternatives=3
+    Response: {"routes": [{"distance": ..., "path": [codes], "route_ids": [ids]}, ...]},
+    empty when no path exists.
+    """
+    form = ShortestNodeSearchForm(request.GET)
+    if not form.is_valid():
+        return _form_error(form)
+    found = find_k_shortest_routes(
+        form.cleaned_data['from_airport'], form.cleaned_data['to_airport'], form.cleaned_data['alternatives'] or 1,
+    )
+    return JsonResponse({'routes': [_route(result) for result in found]})
+
+
+@require_GET
+@_network_conditional()
+def subtree(request):
+    """
+    JSON counterpart of the subtree analytics page.
+
+    Query: ?airport_code=JFK, optionally with descendant_code=LHR and list_reachable=true.
+    Response: the find_subtree_stats() fields, plus 'contains' (bool, null if
+    the second airport is unknown) and 'reachable' (list of codes) when asked for.
+    """
+    form = SubtreeSearchForm(request.GET)
+    if not form.is_valid():
+        return _form_error(form)
+    code = form.cleaned_data['airport_code']
+    stats = find_subtree_stats(code)
+    if stats is None:
+        return _error(f"Unknown airport {code!r}.", status=404)
+    if form.cleaned_data['descendant_code']:
+        stats['contains'] = is_in_subtree(code, form.cleaned_data['descendant_code'])
+    if form.cleaned_data['list_reachable']:
+        stats['reachable'] = find_reachable_airports(code)
+    return JsonResponse(stats)
+
+
+@require_GET
+@_network_conditional(rows=True)
+def export(request):
+    """
+    Stream the whole route network for external analytics (see routes.export).
+
+    Query: ?format=jsonl (default), dot or adjacency.
+    The body is gzip-compressed on the fly when the client sends
+    'Accept-Encoding: gzip'; memory use stays flat whatever the network size.
+    """
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in CONTENT_TYPES:
+        return _error(f"Unknown format {fmt!r}; choose one of {', '.join(CONTENT_TYPES)}.")
+    # The body streams after the view returns, outside read_from(), so name
+    # the database the tag was read from explicitly
+    body = export_network(fmt, using=router.db_for_read(AirportRoute))
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = StreamingHttpResponse(
+        gzip_stream(body) if compress else body, content_type=f'{CONTENT_TYPES[fmt]}; charset=utf-8',
+    )
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['Content-Disposition'] = f'attachment; filename="routes.{fmt}"'
+    return response
+
+
+def _page(queryset, key_columns: tuple, columns: dict, fields: list, limit: int):
+    """
+    Fetch one keyset page of 'queryset' (already filtered past the cursor
+    and ordered by 'key_columns').
+
+    Returns:
+        (results, last_key): the selected fields of up to 'limit' rows as
+        dicts, and the key of the last row if more rows follow, else None.
+    """
+    rows = list(queryset.values_list(*key_columns, *(columns[name] for name in fields))[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    width = len(key_columns)
+    results = [dict(zip(fields, row[width:])) for row in rows]
+    return results, (rows[-1][:width] if more else None)
+
+
+@require_GET
+@_network_conditional(rows=True)
+def airports(request):
+    """
+    JSON listing of airports in primary key order, a page at a time.
+
+    Query: ?limit=100&fields=code,name&after=<next of the previous page>
+    Response: {"results": [{"id": ..., "code": ..., "name": ...}, ...], "next": cursor or null}.
+    Pages seek past the cursor on the primary key, so a deep page costs as
+    little as the first.
+    """
+    form = AirportListForm(request.GET)
+    if not form.is_valid():
+        return _form_error(form)
+    queryset = Airport.objects.order_by('pk')
+    if form.cleaned_data['after'] is not None:
+        queryset = queryset.filter(pk__gt=form.cleaned_data['after'])
+    results, last = _page(queryset, ('pk',), AIRPORT_COLUMNS, form.cleaned_data['fields'], form.cleaned_data['limit'])
+    return JsonResponse({'results': results, 'next': str(last[0]) if last else None})
+
+
+@require_GET
+@_network_conditional(rows=True)
+def routes(request):
+    """
+    JSON listing of routes ordered by (from_airport, position), a page at a time.
+
+    Query: ?limit=100&fields=from,to,duration&after=<next of the previous page>
+    Response: {"results": [{"id", "from", "to", "position", "duration"}, ...], "next": cursor or null}.
+    The cursor is the (from_airport, position) key of the last route, which
+    the unique constraint on those columns indexes, so every page is an
+    index range scan however deep.
+    """
+    form = RouteListForm(request.GET)
+    if not form.is_valid():
+        return _form_error(form)
+    queryset = AirportRoute.objects.order_by('from_airport_id', 'position')
+    if form.cleaned_data['after'] is not None:
+        from_id, position = form.cleaned_data['after']
+        # (from, position) > cursor, written as a range on from_airport_id so the index seeks to it
+        queryset = queryset.filter(from_airport_id__gte=from_id).exclude(
+            from_airport_id=from_id, position__lte=position,
+        )
+    results, last = _page(
+        queryset, ('from_airport_id', 'position'), ROUTE_COLUMNS,
+        form.cleaned_data['fields'], form.cleaned_data['limit'],
+    )
+    return JsonResponse({'results': results, 'next': f'{last[0]}:{last[1]}' if last else None})
+
+
+def metrics(request):
+    """
+    Expose the request metrics of this process in the Prometheus text format
+    (see routes.metrics).
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,378 @@
+"""
+Materialized left/right walk trees for nth-node lookups (the 'chain' engine).
+
+Following one direction from every airport is a functional graph: each
+airport has at most one successor, so the walks form in-trees that end at
+an airport without a successor or run into a cycle. The RouteChainIndex
+table stores each airport's place in its tree: the tree id, the depth (steps
+to the root, or to the cycle airport the walk enters), and its preorder
+number 'tin' from a depth-first traversal from the root(s) against the
+routes. Airports on a root cycle have depth 0 and are numbered by their
+position on the cycle instead. That is two rows per airport however deep
+the walks are, where a row for every (start, depth) pair would grow
+quadratically with the walk length.
+
+The nth node is then one indexed SELECT: when n is below the start's depth
+it is the start's ancestor n levels up, which in preorder is the row at that
+depth with the largest 'tin' not after the start's (a MAX seek on the
+(direction, tree, depth, tin) index); otherwise the walk reaches the root
+and either ends there or goes round the cycle, resolved arithmetically to
+one row by its position.
+
+The table is filled by `manage.py build_chain_index`, which records the
+network stamp it was built at (NetworkVersion.chain_index_stamp, see
+routes.graph). While settings.ROUTES_NTH_NODE_ENGINE is 'chain', every
+Airport/AirportRoute write that finds the table current for the stamp it
+replaces keeps it current inside its transaction and moves the table's
+stamp on with it (see routes.signals). A route from the root of a tree that
+ends into another tree grafts the first tree under its new successor with
+two UPDATEs; other changes lay out the affected trees again. A change whose
+trees exceed settings.ROUTES_CHAIN_INDEX_MAX_RELAYOUT airports empties the
+table instead.
+
+Writes made while another engine is configured leave the table behind the
+network stamp. Lookups only trust the table while its stamp equals the
+network's, checked in the same statement and database as the tree rows,
+and fall back to the jump-pointer index otherwise, until the command is run
+again.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F, Max
+
+from .graph import NETWORK_ROW, RouteGraph
+from .metrics import timed
+from .models import Airport, AirportRoute, NetworkVersion, RouteChainIndex
+
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS = (AirportRoute.LEFT, AirportRoute.RIGHT)
+
+# Rows per INSERT, and values per IN (...) list, when laying out trees
+BATCH_SIZE = 1000
+
+# Larger step counts fall back to the jump-pointer index (the SQL works in 64-bit integers)
+MAX_STEPS = 2 ** 62
+
+# The start's row joined to the row n steps further along its walk, found
+# only while the table is current for the network stamp. Below the start's
+# depth that is its ancestor n levels up: the row at that depth numbered
+# last before the start in preorder. From the root on, the walk ends at a
+# root without a cycle (tin 0) or goes round the cycle to a position.
+NTH_SQL = """
+    SELECT a.id, a.code, a.name
+    FROM {index} s
+    JOIN {airport} start ON start.id = s.airport_id
+    LEFT JOIN {index} t ON t.direction = s.direction AND t.tree = s.tree AND t.depth = CASE
+        WHEN %s <= s.depth THEN s.depth - %s
+        WHEN s.cycle_length IS NOT NULL THEN 0
+    END AND t.tin = CASE
+        WHEN %s < s.depth THEN (
+            SELECT MAX(u.tin) FROM {index} u
+            WHERE u.direction = s.direction AND u.tree = s.tree AND u.depth = s.depth - %s AND u.tin <= s.tin
+        )
+        WHEN s.cycle_length IS NOT NULL THEN (s.cycle_position + %s - s.depth) %% s.cycle_length
+        ELSE 0
+    END
+    LEFT JOIN {airport} a ON a.id = t.airport_id
+    JOIN {version} v ON v.id = %s AND v.chain_index_stamp = v.stamp
+    WHERE start.code = %s AND s.direction = %s
+"""
+
+
+def enabled() -> bool:
+    """
+    True if find_nth_node uses (and writes therefore maintain) the chain index.
+    """
+    return getattr(settings, 'ROUTES_NTH_NODE_ENGINE', 'auto') == 'chain'
+
+
+def layout(nodes, successor: dict) -> list:
+    """
+    Lay the functional graph over 'nodes' out as trees.
+
+    Args:
+        nodes: iterable of airport ids
+        successor: dict airport id -> next airport id in the direction;
+            every successor must itself be in 'nodes'
+
+    Returns:
+        list of (airport_id, tree, depth, tin, cycle_length, cycle_position)
+        rows, one per airport.
+    """
+    nodes = list(nodes)
+
+    # Cycles, in walk order
+    state = {}  # 1 = on the current walk, 2 = done
+    cycles = []
+    for start in nodes:
+        walk = []
+        x = start
+        while x is not None and x not in state:
+            state[x] = 1
+            walk.append(x)
+            x = successor.get(x)
+        if x is not None and state[x] == 1:
+            cycles.append(walk[walk.index(x):])
+        for y in walk:
+            state[y] = 2
+    on_cycle = {x for cycle in cycles for x in cycle}
+
+    # Tree edges point from an airport to the airports leading into it
+    children = {}
+    for x in nodes:
+        y = successor.get(x)
+        if y is not None and x not in on_cycle:
+            children.setdefault(y, []).append(x)
+
+    # Every walk ends at an airport without a successor or on one cycle
+    trees = [([x], None) for x in nodes if successor.get(x) is None]
+    trees += [(cycle, len(cycle)) for cycle in cycles]
+    rows = []
+    for roots, cycle_length in trees:
+        tree = roots[0]
+        # Roots take numbers 0..len(roots) - 1, the airports below them the following ones
+        tin = len(roots)
+        for position, root in enumerate(roots):
+            cycle_position = position if cycle_length is not None else None
+            rows.append((root, tree, 0, position, cycle_length, cycle_position))
+            stack = [(child, 1) for child in reversed(children.get(root, ()))]
+            while stack:
+                x, depth = stack.pop()
+                rows.append((x, tree, depth, tin, cycle_length, cycle_position))
+                tin += 1
+                stack.extend((child, depth + 1) for child in reversed(children.get(x, ())))
+    return rows
+
+
+def _insert(direction: str, rows: list) -> int:
+    """
+    Write 'rows' (as returned by layout()) for 'direction'.
+    """
+    written = 0
+    for batch in _batches(rows):
+        RouteChainIndex.objects.bulk_create([
+            RouteChainIndex(
+                airport_id=airport_id, direction=direction, tree=tree, depth=depth, tin=tin,
+                cycle_length=cycle_length, cycle_position=cycle_position,
+            )
+            for airport_id, tree, depth, tin, cycle_length, cycle_position in batch
+        ])
+        written += len(batch)
+    return written
+
+
+def rebuild() -> int:
+    """
+    Replace the whole chain index with one laid out from the current routes,
+    stamped with the network stamp read before them.
+
+    Returns:
+        number of rows written.
+    """
+    written = 0
+    with timed('chain_index_build'), transaction.atomic():
+        graph = RouteGraph.from_database_stamped()
+        RouteChainIndex.objects.all().delete()
+        ids = graph.airport_ids
+        for direction in DIRECTIONS:
+            successors = graph.left if direction == AirportRoute.LEFT else graph.right
+            successor = {ids[i]: ids[j] for i, j in enumerate(successors) if j >= 0}
+            written += _insert(direction, layout(ids, successor))
+        NetworkVersion.objects.update_or_create(pk=NETWORK_ROW, defaults={'chain_index_stamp': graph.version})
+    return written
+
+
+def nth_airport(start_code: str, direction: str, n: int):
+    """
+    Look up the airport 'n' steps from 'start_code' in 'direction' with one
+    SELECT (see NTH_SQL).
+
+    Returns:
+        (found, airport): 'found' is False if the index cannot answer (the
+        table is behind the network stamp, the start airport has no row, or
+        'n' is too large), else 'airport' is the Airport or None when the
+        walk ends first.
+    """
+    if n >= MAX_STEPS:
+        return False, None
+    database = router.db_for_read(RouteChainIndex)
+    connection = connections[database]
+    quote = connection.ops.quote_name
+    sql = NTH_SQL.format(
+        index=quote(RouteChainIndex._meta.db_table),
+        airport=quote(Airport._meta.db_table),
+        version=quote(NetworkVersion._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [n, n, n, n, n, NETWORK_ROW, start_code, direction])
+        row = cursor.fetchone()
+    if row is None:
+        return False, None
+    if row[0] is None:
+        return True, None
+    return True, Airport.from_db(database, ['id', 'code', 'name'], row)
+
+
+def _advance(previous: int, stamp: int) -> bool:
+    """
+    True if the write moving the network from stamp 'previous' to 'stamp'
+    must maintain the index: the engine is in use and the table was current
+    just before the write. The table's stamp then moves on to 'stamp'
+    within the writing transaction; a table left behind stays behind.
+    """
+    if not enabled() or not previous:
+        return False
+    current = NetworkVersion.objects.filter(pk=NETWORK_ROW, chain_index_stamp=previous)
+    return bool(current.update(chain_index_stamp=stamp))
+
+
+def _batches(values):
+    values = list(values)
+    for i in range(0, len(values), BATCH_SIZE):
+        yield values[i:i + BATCH_SIZE]
+
+
+def _tree_airports(direction: str, seeds) -> set:
+    """
+    Airports in the same trees as 'seeds' in 'direction', 'seeds' included.
+    """
+    rows = RouteChainIndex.objects.filter(direction=direction)
+    trees = set()
+    for batch in _batches(seeds):
+        trees.update(rows.filter(airport_id__in=batch).values_list('tree', flat=True))
+    airports = set(seeds)
+    for batch in _batches(trees):
+        airports.update(rows.filter(tree__in=batch).values_list('airport_id', flat=True))
+    return airports
+
+
+def _drop(direction: str, limit: int):
+    """
+    Empty the index instead of laying out trees of more than 'limit' airports.
+    """
+    RouteChainIndex.objects.all().delete()
+    NetworkVersion.objects.filter(pk=NETWORK_ROW).update(chain_index_stamp=0)
+    logger.warning(
+        "Chain index dropped: a %s-route change touches more than %s airports "
+        "(ROUTES_CHAIN_INDEX_MAX_RELAYOUT); run `manage.py build_chain_index` to rebuild it",
+        direction, limit,
+    )
+
+
+def _relayout(direction: str, seeds):
+    """
+    Lay out the trees around 'seeds' again from the routes.
+    """
+    limit = getattr(settings, 'ROUTES_CHAIN_INDEX_MAX_RELAYOUT', 100000)
+    airports = _tree_airports(direction, seeds)
+    successor = {}
+    pending = set(airports)
+    while pending:
+        if len(airports) > limit:
+            _drop(direction, limit)
+            return
+        # Routes may lead outside these trees when the index lagged behind; follow them in
+        outside = set()
+        for batch in _batches(pending):
+            routes = AirportRoute.objects.filter(position=direction, from_airport_id__in=batch)
+            for from_id, to_id in routes.values_list('from_airport_id', 'to_airport_id'):
+                successor[from_id] = to_id
+                if to_id not in airports:
+                    outside.add(to_id)
+        pending = _tree_airports(direction, outside) | outside
+        pending -= airports
+        airports |= pending
+
+    existing = set()
+    for batch in _batches(airports):
+        existing.update(Airport.objects.filter(pk__in=batch).values_list('pk', flat=True))
+        RouteChainIndex.objects.filter(direction=direction, airport_id__in=batch).delete()
+    successor = {x: y for x, y in successor.items() if x in existing and y in existing}
+    _insert(direction, layout(sorted(existing), successor))
+
+
+def _append(route) -> bool:
+    """
+    Handle a new route from the root of a tree whose walks end there by
+    grafting that tree under the route's target, in another tree.
+
+    Returns:
+        False if the route does not leave such a root or closes a cycle
+        (the caller lays the trees out again).
+    """
+    rows = RouteChainIndex.objects.filter(direction=route.position)
+    source = rows.filter(airport_id=route.from_airport_id).first()
+    target = rows.filter(airport_id=route.to_airport_id).first()
+    if (source is None or target is None or source.depth != 0
+            or source.cycle_length is not None or source.tree == target.tree):
+        return False
+    size = rows.filter(tree=source.tree).count()
+    # The grafted tree becomes the first subtree below the target; 'after'
+    # is the number it follows in the target tree's preorder
+    if target.depth > 0:
+        after = target.tin
+    elif target.cycle_length is None:
+        after = 0
+    else:
+        # Below a cycle airport: after the airports below the roots before it
+        after = rows.filter(
+            tree=target.tree, depth__gt=0, cycle_position__lt=target.cycle_position,
+        ).aggregate(last=Max('tin'))['last']
+        if after is None:
+            after = target.cycle_length - 1
+    # The source tree's numbers are its preorder from 0 at its root
+    rows.filter(tree=target.tree, depth__gt=0, tin__gt=after).update(tin=F('tin') + size)
+    rows.filter(tree=source.tree).update(
+        tree=target.tree, depth=F('depth') + target.depth + 1, tin=F('tin') + after + 1,
+        cycle_length=target.cycle_length, cycle_position=target.cycle_position,
+    )
+    return True
+
+
+def airport_saved(airport_id: int, created: bool, previous: int, stamp: int):
+    """
+    Add a new airport as a tree of its own in both directions; an update
+    (a rename) leaves the trees as they are.
+    """
+    if _advance(previous, stamp) and created:
+        RouteChainIndex.objects.bulk_create([
+            RouteChainIndex(airport_id=airport_id, direction=d, tree=airport_id, depth=0, tin=0)
+            for d in DIRECTIONS
+        ])
+
+
+def airport_deleted(airport_id: int, previous: int, stamp: int):
+    """
+    Remove a deleted airport from the trees (its routes are deleted first).
+    """
+    if _advance(previous, stamp):
+        for direction in DIRECTIONS:
+            _relayout(direction, [airport_id])
+
+
+def route_saved(route, created: bool, previous: int, stamp: int):
+    """
+    Update the trees for a created or updated route.
+    """
+    if not _advance(previous, stamp):
+        return
+    if created:
+        if not _append(route):
+            _relayout(route.position, [route.from_airport_id, route.to_airport_id])
+        return
+    # The previous target and position are unknown, but the source's old
+    # trees contain them
+    for direction in DIRECTIONS:
+        _relayout(direction, [route.from_airport_id, route.to_airport_id])
+
+
+def route_deleted(route, previous: int, stamp: int):
+    """
+    Update the trees for a deleted route.
+    """
+    if _advance(previous, stamp):
+        _relayout(route.position, [route.from_airport_id, route.to_airport_id])
@@ -0,0 +1,414 @@
+"""
+Contraction hierarchies for fast point-to-point shortest-route queries.
+
+``manage.py build_contraction_hierarchy`` contracts the airports one by one
+in order of importance. Contracting an airport removes it from the working
+network, adding a shortcut u -> x (via the airport) for every pair of
+remaining neighbours whose shortest connection ran through it; a bounded
+"witness" Dijkstra skips shortcuts that an equally short path already
+makes redundant. The next airport to contract is the one with the lowest
+edge difference (shortcuts added minus routes removed, plus the number of
+already contracted neighbours to spread contraction evenly), with priorities
+recomputed lazily when an airport reaches the top of the queue.
+
+On networks without a road-like hierarchy (random long-haul links) the
+remaining network eventually turns dense and every further contraction
+adds more shortcuts than it removes routes. Contraction therefore stops
+once the remaining airports average more than a given number of arcs; they
+form the core, which keeps all its arcs in both directions and is crossed
+by the query as plain bidirectional Dijkstra.
+
+Every route and shortcut is then stored at its lower-ranked end (arcs
+between core airports at both ends):
+upward arcs (to higher-ranked airports) for the forward search and
+downward arcs (from higher-ranked airports) for the backward search. A
+query runs Dijkstra upwards from both ends and meets at the highest airport
+of the shortest path (or crosses the core between them), settling a small
+fraction of the airports plain Dijkstra would. Shortcuts remember the airport they bypass, so the path is
+unpacked recursively back into the snapshot's routes.
+
+The hierarchy is stored in settings.ROUTES_INDEX_DIR with the fingerprint of
+the network it was built from and is only used while it matches; any route
+change leaves it stale until the command is run again.
+"""
+from array import array
+import heapq
+
+from django.conf import settings
+
+from .metrics import timed
+from .search import INF, tally
+from .storage import index_path, load_arrays, save_arrays
+
+
+INDEX_FILE = 'contraction.idx'
+
+# Airports a witness search may settle before giving up (and adding the shortcut)
+DEFAULT_WITNESS_LIMIT = 200
+
+# Contraction stops when the remaining airports average more arcs than this
+DEFAULT_CORE_DEGREE = 12
+
+# (file mtime, loaded hierarchy) for the index file last read by this process
+_loaded = (None, None)
+
+
+class ContractionHierarchy:
+    """
+    A loaded or freshly built contraction hierarchy.
+
+    Arcs carry an unpacking code: a code >= 0 is the edge index of a route
+    in the RouteGraph snapshot, a negative code -w - 1 marks a shortcut via
+    airport w.
+
+    Attributes:
+        fingerprint: RouteGraph.fingerprint of the network it was built from
+        size: number of airports at build time
+        shortcuts: number of shortcuts added
+        core: number of airports left uncontracted
+        rank: array of the contraction order of each airport (core airports last)
+        up_offsets, up_targets, up_weights, up_codes: CSR arrays of the
+            arcs from each airport to higher-ranked airports
+        down_offsets, down_sources, down_weights, down_codes: CSR arrays of
+            the arcs into each airport from higher-ranked airports
+    """
+
+    ARRAYS = (
+        'rank', 'up_offsets', 'up_targets', 'up_weights', 'up_codes',
+        'down_offsets', 'down_sources', 'down_weights', 'down_codes',
+    )
+
+    __slots__ = ('fingerprint', 'size', 'shortcuts', 'core') + ARRAYS
+
+    def __init__(self, fingerprint, size, shortcuts, core, arrays):
+        self.fingerprint = fingerprint
+        self.size = size
+        self.shortcuts = shortcuts
+        self.core = core
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a persisted hierarchy, or return None if there is no usable file.
+        """
+        loaded = load_arrays(path)
+        if loaded is None:
+            return None
+        meta, arrays = loaded
+        if any(name not in arrays for name in cls.ARRAYS):
+            return None
+        return cls(meta['fingerprint'], meta['size'], meta['shortcuts'], meta['core'], arrays)
+
+    def save(self, path):
+        """
+        Persist the hierarchy to 'path'.
+        """
+        meta = {'fingerprint': self.fingerprint, 'size': self.size, 'shortcuts': self.shortcuts, 'core': self.core}
+        save_arrays(path, meta, {name: getattr(self, name) for name in self.ARRAYS})
+
+    def shortest(self, graph, start: int, target: int, stats: dict = None):
+        """
+        Answer a point-to-point query on 'graph' (which must match the hierarchy).
+
+        Args:
+            stats: optional dict the counters of both searches are added to
+                (see routes.search.SEARCH_STATS); arcs include shortcuts
+
+        Returns:
+            (distance, edges) tuple with 'edges' indexing the snapshot's
+            routes, or None if 'target' is unreachable.
+        """
+        up_offsets, up_targets, up_weights, up_codes = (
+            self.up_offsets, self.up_targets, self.up_weights, self.up_codes)
+        down_offsets, down_sources, down_weights, down_codes = (
+            self.down_offsets, self.down_sources, self.down_weights, self.down_codes)
+
+        dist_f, dist_b = {start: 0}, {target: 0}
+        prev_f, prev_b = {}, {}  # node -> (neighbour towards the end, arc code)
+        heap_f, heap_b = [(0, start)], [(0, target)]
+        best, meet = (0, start) if start == target else (INF, -1)
+        settled = pops = relaxations = 0
+
+        while True:
+            # Each side stops once its smallest key cannot improve the best meeting
+            forward = heap_f and heap_f[0][0] < best
+            backward = heap_b and heap_b[0][0] < best
+            if not forward and not backward:
+                break
+            if forward and (not backward or heap_f[0][0] <= heap_b[0][0]):
+                heap, dist, other = heap_f, dist_f, dist_b
+                offsets, ends, weights, codes, prev = up_offsets, up_targets, up_weights, up_codes, prev_f
+            else:
+                heap, dist, other = heap_b, dist_b, dist_f
+                offsets, ends, weights, codes, prev = down_offsets, down_sources, down_weights, down_codes, prev_b
+            d, node = heapq.heappop(heap)
+            pops += 1
+            if d != dist[node]:
+                continue
+            settled += 1
+            if node in other and d + other[node] < best:
+                best, meet = d + other[node], node
+            relaxations += offsets[node + 1] - offsets[node]
+            for a in range(offsets[node], offsets[node + 1]):
+                neighbor = ends[a]
+                nd = d + weights[a]
+                if nd < dist.get(neighbor, INF):
+                    dist[neighbor] = nd
+                    prev[neighbor] = (node, codes[a])
+                    heapq.heappush(heap, (nd, neighbor))
+
+        tally(stats, settled, pops, pops + len(heap_f) + len(heap_b), relaxations)
+        if meet < 0:
+            return None
+
+        # Arcs from start up to the meeting airport, then down to target
+        arcs = []
+        node = meet
+        while node != start:
+            parent, code = prev_f[node]
+            arcs.append((parent, node, code))
+            node = parent
+        arcs.reverse()
+        node = meet
+        while node != target:
+            child, code = prev_b[node]
+            arcs.append((node, child, code))
+            node = child
+
+        edges = []
+        for arc in arcs:
+            self._unpack(arc, edges)
+        return best, edges
+
+    def _unpack(self, arc: tuple, edges: list):
+        """
+        Append the snapshot edges of 'arc' (from, to, code) to 'edges',
+        expanding shortcuts recursively.
+        """
+        stack = [arc]
+        while stack:
+            source, target, code = stack.pop()
+            if code >= 0:
+                edges.append(code)
+                continue
+            via = -code - 1
+            # 'via' was contracted before both ends: source -> via is a downward
+            # arc into 'via' and via -> target an upward arc out of it
+            second = first = None
+            for a in range(self.up_offsets[via], self.up_offsets[via + 1]):
+                if self.up_targets[a] == target:
+                    second = self.up_codes[a]
+                    break
+            for a in range(self.down_offsets[via], self.down_offsets[via + 1]):
+                if self.down_sources[a] == source:
+                    first = self.down_codes[a]
+                    break
+            # Pushed in reverse so the first half is expanded first
+            stack.append((via, target, second))
+            stack.append((source, via, first))
+
+
+class _Contractor:
+    """
+    Working state of build_contraction_hierarchy().
+    """
+
+    def __init__(self, graph, witness_limit: int):
+        size = graph.num_airports
+        self.witness_limit = witness_limit
+        # Remaining network: node -> {neighbour: (weight, code)}, parallel routes keep the shortest
+        self.out_arcs = [{} for _ in range(size)]
+        self.in_arcs = [{} for _ in range(size)]
+        for source in range(size):
+            for e in range(graph.offsets[source], graph.offsets[source + 1]):
+                target, weight = graph.targets[e], graph.weights[e]
+                if target == source:
+                    continue
+                current = self.out_arcs[source].get(target)
+                if current is None or weight < current[0]:
+                    self.out_arcs[source][target] = self.in_arcs[target][source] = (weight, e)
+        self.contracted_neighbors = array('i', bytes(4 * size))
+        self.remaining = size
+        self.arcs = sum(len(arcs) for arcs in self.out_arcs)
+
+    def _witness(self, source: int, skip: int, bound: int, wanted) -> dict:
+        """
+        Distances from 'source' in the remaining network without 'skip',
+        up to 'bound' and the witness settle limit.
+        """
+        out_arcs = self.out_arcs
+        dist = {source: 0}
+        heap = [(0, source)]
+        remaining = set(wanted)
+        settled = 0
+        while heap and remaining:
+            d, node = heapq.heappop(heap)
+            if d != dist[node]:
+                continue
+            if d > bound or settled >= self.witness_limit:
+                break
+            remaining.discard(node)
+            settled += 1
+            for neighbor, (weight, _) in out_arcs[node].items():
+                if neighbor == skip:
+                    continue
+                nd = d + weight
+                if nd < dist.get(neighbor, INF):
+                    dist[neighbor] = nd
+                    heapq.heappush(heap, (nd, neighbor))
+        return dist
+
+    def shortcuts(self, node: int) -> list:
+        """
+        Shortcuts (u, x, weight) needed if 'node' were contracted now.
+        """
+        outgoing = self.out_arcs[node]
+        if not outgoing:
+            return []
+        longest_out = max(weight for weight, _ in outgoing.values())
+        needed = []
+        for u, (w_in, _) in self.in_arcs[node].items():
+            dist = self._witness(u, node, w_in + longest_out, outgoing.keys() - {u})
+            for x, (w_out, _) in outgoing.items():
+                if x != u and dist.get(x, INF) > w_in + w_out:
+                    needed.append((u, x, w_in + w_out))
+        return needed
+
+    def priority(self, node: int, shortcuts: list) -> int:
+        removed = len(self.in_arcs[node]) + len(self.out_arcs[node])
+        return len(shortcuts) - removed + self.contracted_neighbors[node]
+
+    def contract(self, node: int, shortcuts: list):
+        """
+        Remove 'node' from the remaining network, adding 'shortcuts'.
+
+        Returns:
+            (up, down): its arcs to and from the remaining (higher-ranked)
+            airports as lists of (neighbour, weight, code).
+        """
+        up = [(x, weight, code) for x, (weight, code) in self.out_arcs[node].items()]
+        down = [(u, weight, code) for u, (weight, code) in self.in_arcs[node].items()]
+        for x in self.out_arcs[node]:
+            del self.in_arcs[x][node]
+            self.contracted_neighbors[x] += 1
+        for u in self.in_arcs[node]:
+            del self.out_arcs[u][node]
+            self.contracted_neighbors[u] += 1
+        self.arcs -= len(up) + len(down)
+        self.remaining -= 1
+        self.out_arcs[node] = {}
+        self.in_arcs[node] = {}
+        for u, x, weight in shortcuts:
+            current = self.out_arcs[u].get(x)
+            if current is None:
+                self.arcs += 1
+            if current is None or weight < current[0]:
+                self.out_arcs[u][x] = self.in_arcs[x][u] = (weight, -node - 1)
+        return up, down
+
+    def core_arcs(self, node: int):
+        """
+        All remaining arcs of core airport 'node', as (up, down) lists like contract().
+        """
+        up = [(x, weight, code) for x, (weight, code) in self.out_arcs[node].items()]
+        down = [(u, weight, code) for u, (weight, code) in self.in_arcs[node].items()]
+        return up, down
+
+
+def _csr(size: int, lists: list, end_code: str):
+    """
+    Pack per-airport arc lists into (offsets, ends, weights, codes) arrays.
+    """
+    offsets = array('q', [0])
+    ends, weights, codes = array(end_code), array('q'), array('q')
+    for node in range(size):
+        for end, weight, code in lists[node]:
+            ends.append(end)
+            weights.append(weight)
+            codes.append(code)
+        offsets.append(len(ends))
+    return offsets, ends, weights, codes
+
+
+def build_contraction_hierarchy(graph, witness_limit: int = DEFAULT_WITNESS_LIMIT,
+                                core_degree: float = DEFAULT_CORE_DEGREE) -> ContractionHierarchy:
+    """
+    Contract the airports of 'graph' and return the resulting hierarchy.
+
+    Args:
+        graph: RouteGraph to preprocess
+        witness_limit: int - airports a witness search may settle; lower
+            values build faster but add more (harmless) shortcuts
+        core_degree: float - stop contracting once the remaining airports
+            average more arcs than this; the rest form the core
+    """
+    size = graph.num_airports
+    contractor = _Contractor(graph, witness_limit)
+    heap = []
+    for node in range(size):
+        heap.append((contractor.priority(node, contractor.shortcuts(node)), node))
+    heapq.heapify(heap)
+
+    rank = array('i', [-1]) * size
+    up_lists, down_lists = [None] * size, [None] * size
+    shortcuts_added = 0
+    next_rank = 0
+    while heap:
+        if contractor.arcs > core_degree * contractor.remaining:
+            break
+        _, node = heapq.heappop(heap)
+        if rank[node] >= 0:
+            continue
+        # Lazy update: the stored priority may be outdated by earlier contractions
+        shortcuts = contractor.shortcuts(node)
+        priority = contractor.priority(node, shortcuts)
+        if heap and priority > heap[0][0]:
+            heapq.heappush(heap, (priority, node))
+            continue
+        rank[node] = next_rank
+        next_rank += 1
+        shortcuts_added += len(shortcuts)
+        up_lists[node], down_lists[node] = contractor.contract(node, shortcuts)
+
+    # The core keeps every remaining arc in both directions
+    core = 0
+    for node in range(size):
+        if rank[node] < 0:
+            rank[node] = next_rank
+            next_rank += 1
+            core += 1
+            up_lists[node], down_lists[node] = contractor.core_arcs(node)
+
+    arrays = {'rank': rank}
+    (arrays['up_offsets'], arrays['up_targets'], arrays['up_weights'],
+     arrays['up_codes']) = _csr(size, up_lists, 'i')
+    (arrays['down_offsets'], arrays['down_sources'], arrays['down_weights'],
+     arrays['down_codes']) = _csr(size, down_lists, 'i')
+    return ContractionHierarchy(graph.fingerprint, size, shortcuts_added, core, arrays)
+
+
+def get_contraction_hierarchy(graph):
+    """
+    Return the persisted hierarchy if it matches 'graph', else None.
+
+    The file is re-read only when its modification time changes, so a
+    hierarchy rebuilt by the management command is picked up without a restart.
+    """
+    global _loaded
+    if not getattr(settings, 'ROUTES_USE_CONTRACTION_HIERARCHY', True):
+        return None
+    path = index_path(INDEX_FILE)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    loaded_mtime, hierarchy = _loaded
+    if loaded_mtime != mtime:
+        with timed('contraction_load'):
+            hierarchy = ContractionHierarchy.load(path)
+        _loaded = (mtime, hierarchy)
+    if hierarchy is None or hierarchy.fingerprint != graph.fingerprint:
+        return None
+    return hierarchy
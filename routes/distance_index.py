@@ -0,0 +1,273 @@
+"""
+Precomputed distance indexes for shortest-path queries.
+
+Two kinds of index can be built with ``manage.py build_distance_index``:
+
+    - 'apsp': all-pairs distance and next-hop matrices, for small networks.
+      Computed with a vectorised Floyd-Warshall when NumPy is installed and
+      with one Dijkstra per airport otherwise. Queries are a table lookup.
+    - 'alt': distances to and from a few landmark airports. Queries run A*
+      with the triangle-inequality lower bounds these give (ALT), which
+      settles far fewer airports than plain Dijkstra on large networks.
+
+The index is stored in settings.ROUTES_INDEX_DIR together with the graph
+fingerprint it was built from, and find_shortest_route_between only uses it
+while that fingerprint matches the current network.
+"""
+from array import array
+
+from django.conf import settings
+
+from .metrics import timed
+from .search import INF, astar, single_source
+from .storage import index_path, load_arrays, save_arrays
+
+
+INDEX_FILE = 'distances.idx'
+
+KINDS = ('auto', 'apsp', 'alt')
+
+# Stored in place of a distance when there is no path; small enough that
+# adding two of them cannot overflow a signed 64-bit integer
+UNREACHABLE = 2 ** 60
+
+# (file mtime, loaded index) for the index file last read by this process
+_loaded = (None, None)
+
+
+class DistanceIndex:
+    """
+    A loaded or freshly built distance index.
+
+    Attributes:
+        kind: 'apsp' or 'alt'
+        fingerprint: RouteGraph.fingerprint of the network it was built from
+        size: number of airports at build time
+        arrays: name -> array holding the index data
+            apsp: 'dist' (size * size distances), 'next' (size * size next hops, -1 if none)
+            alt: 'landmarks', and 'fwd.<i>' / 'bwd.<i>' distances from / to landmark i
+    """
+
+    def __init__(self, kind, fingerprint, size, arrays):
+        self.kind = kind
+        self.fingerprint = fingerprint
+        self.size = size
+        self.arrays = arrays
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a persisted index, or return None if there is no usable file.
+        """
+        loaded = load_arrays(path)
+        if loaded is None:
+            return None
+        meta, arrays = loaded
+        return cls(meta['kind'], meta['fingerprint'], meta['size'], arrays)
+
+    def save(self, path):
+        """
+        Persist the index to 'path'.
+        """
+        meta = {'kind': self.kind, 'fingerprint': self.fingerprint, 'size': self.size}
+        save_arrays(path, meta, self.arrays)
+
+    def shortest(self, graph, start: int, target: int):
+        """
+        Answer a point-to-point query on 'graph' (which must match the index).
+
+        Returns:
+            (distance, edges) tuple, or None if 'target' is unreachable.
+        """
+        if self.kind == 'apsp':
+            return self._lookup(graph, start, target)
+        return astar(graph, start, target, self.heuristic(target))
+
+    def _lookup(self, graph, start, target):
+        size, dist, nxt = self.size, self.arrays['dist'], self.arrays['next']
+        distance = dist[start * size + target]
+        if distance >= UNREACHABLE:
+            return None
+        # Follow next hops, taking the cheapest route between each pair
+        edges = []
+        node = start
+        while node != target:
+            hop = nxt[node * size + target]
+            edges.append(graph.best_edge(node, hop))
+            node = hop
+        return distance, edges
+
+    def heuristic(self, target: int):
+        """
+        Return the ALT lower-bound function for queries towards 'target'.
+
+        For a landmark L, d(v, t) >= d(L, t) - d(L, v) and
+        d(v, t) >= d(v, L) - d(t, L); the bound is the largest over all
+        landmarks. If L reaches v but not t, or t reaches L but v does not,
+        then v cannot reach t and the bound is INF.
+        """
+        count = len(self.arrays['landmarks'])
+        fwd = [self.arrays[f'fwd.{i}'] for i in range(count)]
+        bwd = [self.arrays[f'bwd.{i}'] for i in range(count)]
+        bounds = [(f, b, f[target], b[target]) for f, b in zip(fwd, bwd)]
+
+        def bound(node):
+            best = 0
+            for f, b, f_target, b_target in bounds:
+                f_node = f[node]
+                if f_node < UNREACHABLE:
+                    if f_target >= UNREACHABLE:
+                        return INF
+                    if f_target - f_node > best:
+                        best = f_target - f_node
+                if b_target < UNREACHABLE:
+                    b_node = b[node]
+                    if b_node >= UNREACHABLE:
+                        return INF
+                    if b_node - b_target > best:
+                        best = b_node - b_target
+            return best
+
+        return bound
+
+
+def _all_pairs_numpy(graph, np):
+    """
+    Vectorised Floyd-Warshall: one O(N^2) NumPy step per intermediate airport.
+    """
+    size = graph.num_airports
+    dist = np.full((size, size), UNREACHABLE, dtype=np.int64)
+    nxt = np.full((size, size), -1, dtype=np.int32)
+    nodes = np.arange(size)
+    dist[nodes, nodes] = 0
+    nxt[nodes, nodes] = nodes
+    for source in range(size):
+        for target, weight, _ in graph.neighbors(source):
+            if weight < dist[source, target]:
+                dist[source, target] = weight
+                nxt[source, target] = target
+    for k in range(size):
+        through = dist[:, k, None] + dist[None, k, :]
+        better = through < dist
+        np.copyto(dist, through, where=better)
+        np.copyto(nxt, np.broadcast_to(nxt[:, k, None], nxt.shape), where=better)
+    return array('q', dist.tobytes()), array('i', nxt.tobytes())
+
+
+def _all_pairs_dijkstra(graph):
+    """
+    Pure-Python fallback: one full Dijkstra per airport.
+    """
+    size = graph.num_airports
+    dist = array('q', [UNREACHABLE]) * (size * size)
+    nxt = array('i', [-1]) * (size * size)
+    for source in range(size):
+        reached, prev, order = single_source(graph.offsets, graph.targets, graph.weights, source)
+        row = source * size
+        first = {source: source}
+        for node in order:
+            dist[row + node] = reached[node]
+            if node != source:
+                # Nodes settle after their predecessor, so its first hop is known
+                parent = graph.source_of(prev[node])
+                first[node] = node if parent == source else first[parent]
+            nxt[row + node] = first[node]
+    return dist, nxt
+
+
+def build_all_pairs(graph) -> DistanceIndex:
+    """
+    Build an 'apsp' index for 'graph'.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        dist, nxt = _all_pairs_dijkstra(graph)
+    else:
+        dist, nxt = _all_pairs_numpy(graph, np)
+    return DistanceIndex('apsp', graph.fingerprint, graph.num_airports, {'dist': dist, 'next': nxt})
+
+
+def _distance_array(size, reached):
+    values = array('q', [UNREACHABLE]) * size
+    for node, d in reached.items():
+        values[node] = d
+    return values
+
+
+def build_landmarks(graph, count: int) -> DistanceIndex:
+    """
+    Build an 'alt' index for 'graph' with up to 'count' landmarks.
+
+    Landmarks are chosen by farthest-point selection: starting from the
+    busiest airport, each next landmark is the airport farthest from all
+    landmarks chosen so far (unreachable airports count as farthest).
+    """
+    size = graph.num_airports
+    r_offsets, r_sources, r_weights, _ = graph.reverse()
+    arrays = {'landmarks': array('i')}
+    if size == 0:
+        return DistanceIndex('alt', graph.fingerprint, size, arrays)
+
+    nearest = array('q', [UNREACHABLE + 1]) * size
+    degree = [graph.offsets[i + 1] - graph.offsets[i] for i in range(size)]
+    landmark = max(range(size), key=degree.__getitem__)
+    for i in range(min(count, size)):
+        arrays['landmarks'].append(landmark)
+        fwd = _distance_array(size, single_source(graph.offsets, graph.targets, graph.weights, landmark)[0])
+        bwd = _distance_array(size, single_source(r_offsets, r_sources, r_weights, landmark)[0])
+        arrays[f'fwd.{i}'] = fwd
+        arrays[f'bwd.{i}'] = bwd
+        for node in range(size):
+            if fwd[node] < nearest[node]:
+                nearest[node] = fwd[node]
+        nearest[landmark] = -1
+        landmark = max(range(size), key=nearest.__getitem__)
+    return DistanceIndex('alt', graph.fingerprint, size, arrays)
+
+
+def build_distance_index(graph, kind: str = 'auto', landmarks: int = None) -> DistanceIndex:
+    """
+    Build a distance index for 'graph'.
+
+    Args:
+        graph: RouteGraph to index
+        kind: str - 'apsp', 'alt', or 'auto' (apsp up to settings.ROUTES_APSP_MAX_AIRPORTS airports)
+        landmarks: int - number of ALT landmarks (default settings.ROUTES_ALT_LANDMARKS)
+
+    Returns:
+        DistanceIndex
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown distance index kind: {kind!r}")
+    if kind == 'auto':
+        limit = getattr(settings, 'ROUTES_APSP_MAX_AIRPORTS', 2000)
+        kind = 'apsp' if graph.num_airports <= limit else 'alt'
+    if kind == 'apsp':
+        return build_all_pairs(graph)
+    return build_landmarks(graph, landmarks or getattr(settings, 'ROUTES_ALT_LANDMARKS', 8))
+
+
+def get_distance_index(graph):
+    """
+    Return the persisted distance index if it matches 'graph', else None.
+
+    The file is re-read only when its modification time changes, so an
+    index rebuilt by the management command is picked up without a restart.
+    """
+    global _loaded
+    if not getattr(settings, 'ROUTES_USE_DISTANCE_INDEX', True):
+        return None
+    path = index_path(INDEX_FILE)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    loaded_mtime, index = _loaded
+    if loaded_mtime != mtime:
+        with timed('distance_index_load'):
+            index = DistanceIndex.load(path)
+        _loaded = (mtime, index)
+    if index is None or index.fingerprint != graph.fingerprint:
+        return None
+    return index
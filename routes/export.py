@@ -0,0 +1,144 @@
+"""
+Streaming export of the route network in text formats.
+
+Every format is produced by a generator that walks the tables with
+QuerySet.iterator(chunk_size=settings.ROUTES_EXPORT_CHUNK_SIZE), so only one
+chunk of rows is held in memory at a time whatever the network size, and
+the output is handed on in blocks of a few tens of kilobytes. The same
+generators back the `export_routes` management command and the export API
+endpoint, optionally compressed on the fly with gzip_stream().
+
+Formats:
+    jsonl: one route per line as {"id", "from", "to", "position", "duration"},
+        readable by `manage.py load_routes --format jsonl`
+    dot: Graphviz digraph with one node per airport and one edge per route
+    adjacency: one line per airport, 'CODE TO:DURATION ...' in position order
+"""
+import json
+import zlib
+
+from django.conf import settings
+
+from .models import Airport, AirportRoute
+
+
+# Output is passed on in blocks of about this many bytes
+BLOCK_SIZE = 64 * 1024
+
+# Content type of each format
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'dot': 'text/vnd.graphviz',
+    'adjacency': 'text/plain',
+}
+
+FORMATS = tuple(CONTENT_TYPES)
+
+
+def _chunk_size() -> int:
+    return getattr(settings, 'ROUTES_EXPORT_CHUNK_SIZE', 2000)
+
+
+def _airports(using):
+    """
+    Airports in primary key order, streamed in chunks.
+    """
+    return Airport.objects.using(using).order_by('pk').only('code', 'name').iterator(chunk_size=_chunk_size())
+
+
+def _routes(using):
+    """
+    Routes ordered by source airport and position with both endpoints
+    joined, streamed in chunks.
+    """
+    return (
+        AirportRoute.objects.using(using)
+        .select_related('from_airport', 'to_airport')
+        .only('position', 'duration', 'from_airport__code', 'to_airport__code')
+        .order_by('from_airport_id', 'position')
+        .iterator(chunk_size=_chunk_size())
+    )
+
+
+def _jsonl_lines(using):
+    for route in _routes(using):
+        yield json.dumps({
+            'id': route.pk,
+            'from': route.from_airport.code,
+            'to': route.to_airport.code,
+            'position': route.position,
+            'duration': route.duration,
+        }) + '\n'
+
+
+def _dot_id(text: str) -> str:
+    """
+    Quote 'text' as a DOT identifier.
+    """
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _dot_lines(using):
+    yield 'digraph routes {\n'
+    for airport in _airports(using):
+        yield f'  {_dot_id(airport.code)} [label={_dot_id(airport.code + " - " + airport.name)}];\n'
+    for route in _routes(using):
+        yield (
+            f'  {_dot_id(route.from_airport.code)} -> {_dot_id(route.to_airport.code)}'
+            f' [label="{route.duration}", position="{route.position}"];\n'
+        )
+    yield '}\n'
+
+
+def _adjacency_lines(using):
+    # Both streams are ordered by source airport, so they are merged in one pass
+    routes = _routes(using)
+    route = next(routes, None)
+    for airport in _airports(using):
+        line = [airport.code]
+        while route is not None and route.from_airport_id == airport.pk:
+            line.append(f'{route.to_airport.code}:{route.duration}')
+            route = next(routes, None)
+        yield ' '.join(line) + '\n'
+
+
+_WRITERS = {'jsonl': _jsonl_lines, 'dot': _dot_lines, 'adjacency': _adjacency_lines}
+
+
+def export_network(fmt: str, using: str = None):
+    """
+    Stream the network in format 'fmt' (one of FORMATS), read from database
+    'using' (default: the one the router picks for each query).
+
+    Yields:
+        str blocks of about BLOCK_SIZE characters, ending on line boundaries.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    block = []
+    size = 0
+    for line in _WRITERS[fmt](using):
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield ''.join(block)
+            block = []
+            size = 0
+    if block:
+        yield ''.join(block)
+
+
+def gzip_stream(blocks, level: int = 6):
+    """
+    Compress str 'blocks' into a gzip stream on the fly.
+
+    Yields:
+        bytes; only non-empty pieces are yielded, so a block that compresses
+        into the internal buffer produces no output until more data arrives.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 16 + 15: gzip container
+    for block in blocks:
+        data = compressor.compress(block.encode())
+        if data:
+            yield data
+    yield compressor.flush()
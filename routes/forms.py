@@ -1,7 +1,12 @@
 from django import forms
+from django.conf import settings
 from .models import AirportRoute, Airport
 
 
+# Upper bound on the alternative routes one search may ask for
+MAX_ALTERNATIVES = 10
+
+
 class AirportRouteForm(forms.ModelForm):
     """
     Form to create or edit an AirportRoute instance.
@@ -45,6 +50,33 @@ class NthNodeSearchForm(forms.Form):
     n = forms.IntegerField(min_value=1, label="N (1 = immediate child)")
 
 
+class LongestNodesSearchForm(forms.Form):
+    """
+    Form for finding the longest direct route from several airports at once.
+
+    Fields:
+        - airport_codes: comma-separated airport codes, at most
+          settings.ROUTES_API_MAX_PAGE_SIZE of them
+    """
+    airport_codes = forms.CharField(label="Airport codes (comma-separated)")
+
+    def clean_airport_codes(self):
+        """
+        Split the codes into a list, dropping blanks and duplicates.
+
+        Raises:
+            forms.ValidationError: If no code is given, or too many are.
+        """
+        codes = (code.strip() for code in self.cleaned_data['airport_codes'].split(','))
+        codes = list(dict.fromkeys(code for code in codes if code))
+        limit = getattr(settings, 'ROUTES_API_MAX_PAGE_SIZE', 1000)
+        if not codes:
+            raise forms.ValidationError("Provide at least one airport code.")
+        if len(codes) > limit:
+            raise forms.ValidationError(f"Too many airport codes: {len(codes)} (limit {limit}).")
+        return codes
+
+
 class ShortestNodeSearchForm(forms.Form):
     """
     Form for searching the shortest path between two airports.
@@ -52,6 +84,122 @@ class ShortestNodeSearchForm(forms.Form):
     Fields:
         - from_airport: starting airport code
         - to_airport: destination airport code
+        - alternatives: optional number of routes to list, shortest first
+        - max_hops: optional maximum number of legs
+        - avoid: optional comma-separated airport codes the route must not visit
+        - max_leg_duration: optional maximum duration of any single leg
     """
     from_airport = forms.CharField(max_length=10)
     to_airport = forms.CharField(max_length=10)
+    alternatives = forms.IntegerField(
+        min_value=1, max_value=MAX_ALTERNATIVES, required=False, label="Routes to list (default 1)"
+    )
+    max_hops = forms.IntegerField(min_value=1, required=False, label="At most this many legs")
+    avoid = forms.CharField(required=False, label="Avoid airports (comma-separated codes)")
+    max_leg_duration = forms.IntegerField(min_value=1, required=False, label="No leg longer than")
+
+    def clean_avoid(self):
+        """
+        Split the avoided airport codes into a list, dropping blanks and duplicates.
+        """
+        codes = (code.strip() for code in self.cleaned_data['avoid'].split(','))
+        return list(dict.fromkeys(code for code in codes if code))
+
+    def clean(self):
+        """
+        Reject constraints that cannot be met or combined.
+
+        Raises:
+            forms.ValidationError: If an endpoint is avoided, or alternatives
+                are requested together with constraints.
+        """
+        cleaned = super().clean()
+        avoid = cleaned.get('avoid') or []
+        if cleaned.get('from_airport') in avoid or cleaned.get('to_airport') in avoid:
+            raise forms.ValidationError("The start and destination airports cannot be avoided.")
+        if (cleaned.get('alternatives') or 1) > 1 and self.constraints():
+            raise forms.ValidationError("Alternative routes cannot be combined with constraints.")
+        return cleaned
+
+    def constraints(self) -> dict:
+        """
+        Return the constraints that were filled in, as keyword arguments for
+        find_shortest_route_between().
+        """
+        constraints = {
+            'max_hops': self.cleaned_data.get('max_hops'),
+            'avoid': self.cleaned_data.get('avoid') or [],
+            'max_leg_duration': self.cleaned_data.get('max_leg_duration'),
+        }
+        return {name: value for name, value in constraints.items() if value}
+
+
+class SubtreeSearchForm(forms.Form):
+    """
+    Form for subtree analytics of an airport in the left/right route tree.
+
+    Fields:
+        - airport_code: the airport whose subtree is described
+        - descendant_code: optional airport to test for membership in that subtree
+        - list_reachable: whether to list every airport reachable from it
+    """
+    airport_code = forms.CharField(max_length=10, label="Airport Code")
+    descendant_code = forms.CharField(max_length=10, required=False, label="Is this airport in its subtree?")
+    list_reachable = forms.BooleanField(required=False, label="List reachable airports")
+
+
+class AirportListForm(forms.Form):
+    """
+    Query parameters of the keyset-paginated airport listing.
+
+    Fields:
+        - after: cursor from the previous page's 'next' (the last airport id)
+        - limit: page size, capped at settings.ROUTES_API_MAX_PAGE_SIZE
+        - fields: comma-separated subset of FIELDS to return (default: all)
+    """
+    FIELDS = ('id', 'code', 'name')
+
+    after = forms.IntegerField(min_value=0, required=False)
+    limit = forms.IntegerField(min_value=1, required=False)
+    fields = forms.CharField(required=False)
+
+    def clean_limit(self):
+        limit = self.cleaned_data.get('limit') or getattr(settings, 'ROUTES_API_PAGE_SIZE', 100)
+        return min(limit, getattr(settings, 'ROUTES_API_MAX_PAGE_SIZE', 1000))
+
+    def clean_fields(self):
+        value = self.cleaned_data.get('fields')
+        if not value:
+            return list(self.FIELDS)
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in self.FIELDS]
+        if unknown or not fields:
+            raise forms.ValidationError(f"Choose fields from: {', '.join(self.FIELDS)}.")
+        # Keep the listing's column order and drop repeats
+        return [name for name in self.FIELDS if name in fields]
+
+
+class RouteListForm(AirportListForm):
+    """
+    Query parameters of the keyset-paginated route listing, ordered like
+    AirportRoute.Meta.ordering.
+
+    Fields:
+        - after: cursor from the previous page's 'next', 'FROM_AIRPORT_ID:POSITION'
+        - limit, fields: as for AirportListForm
+    """
+    FIELDS = ('id', 'from', 'to', 'position', 'duration')
+
+    after = forms.CharField(required=False)
+
+    def clean_after(self):
+        """
+        Parse the cursor into a (from_airport_id, position) tuple, or None.
+        """
+        value = self.cleaned_data.get('after')
+        if not value:
+            return None
+        from_id, _, position = value.partition(':')
+        if not from_id.isdigit() or position not in (AirportRoute.LEFT, AirportRoute.RIGHT):
+            raise forms.ValidationError("Expected a cursor like '42:left'.")
+        return int(from_id), position
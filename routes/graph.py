@@ -0,0 +1,500 @@
+"""
+Process-wide in-memory snapshot of the route network.
+
+The snapshot stores the AirportRoute table as a CSR (compressed sparse row)
+adjacency structure over dense airport indices, so graph searches can run
+without touching the database. It is built lazily on first use and rebuilt
+whenever the network stamp moves on.
+
+The stamp is the NetworkVersion row in the primary database: every write to
+airports or routes replaces it inside the writing transaction (see
+routes.signals, and bump_graph_version() for bulk writers), so a write made
+by any process, the admin in another worker or a management command,
+invalidates the snapshot of every process. Checking it is one primary key
+lookup, made at most once every settings.ROUTES_GRAPH_STAMP_TTL seconds, so
+warm queries run without touching the database; writes made by other
+processes are served up to that much later. This process's own writes reset
+the check when they commit (forget_stamp()), so it always reads them.
+"""
+from array import array
+import bisect
+import hashlib
+import os
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import F
+
+from .metrics import timed
+from .models import Airport, AirportRoute, NetworkVersion
+from .routers import use_primary
+
+
+# Primary key of the single NetworkVersion row
+NETWORK_ROW = 1
+
+# Seconds a stamp read from the primary is trusted when settings.ROUTES_GRAPH_STAMP_TTL is unset
+DEFAULT_STAMP_TTL = 1.0
+
+# Cached snapshot, and the last stamp read from the primary as (stamp, time.monotonic())
+_snapshot = None
+_checked = (None, 0.0)
+_build_lock = threading.Lock()
+
+
+class RouteGraph:
+    """
+    Read-only CSR view of the route network.
+
+    Airports are mapped to dense indices 0..N-1 in primary key order.
+    The outgoing routes of airport ``i`` occupy the slice
+    ``offsets[i]:offsets[i + 1]`` of the ``targets``, ``weights`` and
+    ``route_ids`` arrays. The arrays are array.array instances, or read-only
+    memoryviews when the snapshot is mapped from a graph file.
+
+    Attributes:
+        version: network stamp this snapshot was built at (see network_stamp)
+        airport_ids: array of Airport primary keys, indexed by dense index
+        codes: list of airport codes, indexed by dense index
+        offsets: array of N + 1 edge offsets
+        targets: array of destination dense indices, one per route
+        weights: array of route durations, one per route
+        route_ids: array of AirportRoute primary keys, one per route
+        left: array of the left child index per airport (-1 if none)
+        right: array of the right child index per airport (-1 if none)
+    """
+
+    __slots__ = (
+        'version', 'airport_ids', 'codes', 'offsets', 'targets', 'weights',
+        'route_ids', 'left', 'right', '_index_by_code', '_index_by_id',
+        '_fingerprint', '_reverse',
+    )
+
+    def __init__(self, version, airport_ids, codes, offsets, targets, weights, route_ids, left, right,
+                 fingerprint=None):
+        self.version = version
+        self.airport_ids = airport_ids
+        self.codes = codes
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.route_ids = route_ids
+        self.left = left
+        self.right = right
+        self._index_by_code = {code: i for i, code in enumerate(codes)}
+        self._index_by_id = {pk: i for i, pk in enumerate(airport_ids)}
+        self._fingerprint = fingerprint
+        self._reverse = None
+
+    @classmethod
+    def from_database(cls, version: int = 0):
+        """
+        Build a snapshot from the current database contents.
+
+        Only primary keys, codes and durations are read (no model instances
+        are created), so memory stays proportional to the array sizes.
+        """
+        # Read airports and routes in one transaction so every route endpoint
+        # is guaranteed to be present in the airport list
+        with transaction.atomic():
+            return cls._load(version)
+
+    @classmethod
+    def from_database_stamped(cls):
+        """
+        Build a snapshot tagged with the network stamp read in the same
+        transaction, before the rows: a write landing mid-build can only
+        make the rows newer than the stamp, which forces another rebuild.
+        """
+        with transaction.atomic():
+            return cls._load(network_stamp())
+
+    @classmethod
+    def _load(cls, version):
+        airports = Airport.objects.order_by('pk').values_list('pk', 'code')
+        routes = (
+            AirportRoute.objects
+            .order_by('from_airport_id', 'position')
+            .values_list('pk', 'from_airport_id', 'to_airport_id', 'duration', 'position')
+        )
+        return cls.from_rows(airports.iterator(), routes.iterator(), version)
+
+    @classmethod
+    def from_rows(cls, airports, routes, version: int = 0):
+        """
+        Build a snapshot from plain rows.
+
+        Args:
+            airports: iterable of (airport_id, code), ordered by airport_id
+            routes: iterable of (route_id, from_id, to_id, duration, position),
+                ordered by (from_id, position)
+            version: graph version to tag the snapshot with
+        """
+        airport_ids = array('q')
+        codes = []
+        for pk, code in airports:
+            airport_ids.append(pk)
+            codes.append(code)
+        index_by_id = {pk: i for i, pk in enumerate(airport_ids)}
+
+        # Routes come grouped by source airport, so the CSR arrays can be
+        # filled in a single pass while counting edges per source
+        counts = array('q', bytes(8 * len(airport_ids)))
+        targets = array('i')
+        weights = array('I')
+        route_ids = array('q')
+        # Left/right children are kept separately for chain traversals
+        left = array('i', [-1]) * len(airport_ids)
+        right = array('i', [-1]) * len(airport_ids)
+        for pk, from_id, to_id, duration, position in routes:
+            source = index_by_id[from_id]
+            counts[source] += 1
+            targets.append(index_by_id[to_id])
+            weights.append(duration)
+            route_ids.append(pk)
+            if position == AirportRoute.LEFT:
+                left[source] = index_by_id[to_id]
+            else:
+                right[source] = index_by_id[to_id]
+
+        offsets = array('q', [0])
+        total = 0
+        for c in counts:
+            total += c
+            offsets.append(total)
+
+        return cls(version, airport_ids, codes, offsets, targets, weights, route_ids, left, right)
+
+    @property
+    def num_airports(self) -> int:
+        return len(self.airport_ids)
+
+    @property
+    def num_routes(self) -> int:
+        return len(self.targets)
+
+    @property
+    def fingerprint(self) -> int:
+        """
+        Order-independent content hash of the network (see airport_fingerprint
+        and route_fingerprint). Indexes persisted to disk store it so they can
+        tell whether they still match the database.
+        """
+        if self._fingerprint is None:
+            total = 0
+            for pk, code in zip(self.airport_ids, self.codes):
+                total += airport_fingerprint(pk, code)
+            for source in range(len(self.airport_ids)):
+                first, last = self.offsets[source], self.offsets[source + 1]
+                for e in range(first, last):
+                    # Routes are ordered by position within a source, so a
+                    # second route is always the right child
+                    if e > first or self.left[source] < 0:
+                        position = AirportRoute.RIGHT
+                    else:
+                        position = AirportRoute.LEFT
+                    total += route_fingerprint(
+                        self.route_ids[e], self.airport_ids[source],
+                        self.airport_ids[self.targets[e]], position, self.weights[e],
+                    )
+            self._fingerprint = total % FINGERPRINT_MODULUS
+        return self._fingerprint
+
+    def index_of(self, code: str):
+        """
+        Return the dense index of the airport with 'code', or None if unknown.
+        """
+        return self._index_by_code.get(code)
+
+    def index_of_id(self, airport_id: int):
+        """
+        Return the dense index of the airport with primary key 'airport_id', or None.
+        """
+        return self._index_by_id.get(airport_id)
+
+    def source_of(self, edge: int) -> int:
+        """
+        Return the dense index of the airport route 'edge' leaves from.
+        """
+        # Empty CSR slices repeat an offset, so take the last slice starting at or before 'edge'
+        return bisect.bisect_right(self.offsets, edge) - 1
+
+    def best_edge(self, source: int, target: int) -> int:
+        """
+        Return the shortest route from 'source' to 'target', or -1 if there is none.
+        """
+        best = -1
+        for e in range(self.offsets[source], self.offsets[source + 1]):
+            if self.targets[e] == target and (best < 0 or self.weights[e] < self.weights[best]):
+                best = e
+        return best
+
+    def reverse(self):
+        """
+        Return the reverse adjacency (incoming routes) as CSR arrays.
+
+        Returns:
+            (offsets, sources, weights, edges) where the incoming routes of
+            airport ``i`` occupy ``offsets[i]:offsets[i + 1]``; 'edges' maps
+            each entry back to its forward edge index. Built once per snapshot.
+        """
+        if self._reverse is None:
+            size = len(self.airport_ids)
+            counts = array('q', bytes(8 * (size + 1)))
+            for t in self.targets:
+                counts[t + 1] += 1
+            for i in range(size):
+                counts[i + 1] += counts[i]
+            offsets = array('q', counts)
+            fill = array('q', counts)
+            sources = array('i', bytes(4 * len(self.targets)))
+            weights = array('I', bytes(4 * len(self.targets)))
+            edges = array('q', bytes(8 * len(self.targets)))
+            for source in range(size):
+                for e in range(self.offsets[source], self.offsets[source + 1]):
+                    slot = fill[self.targets[e]]
+                    fill[self.targets[e]] += 1
+                    sources[slot] = source
+                    weights[slot] = self.weights[e]
+                    edges[slot] = e
+            self._reverse = (offsets, sources, weights, edges)
+        return self._reverse
+
+    def leg(self, source: int, route_id: int):
+        """
+        Describe route 'route_id' leaving airport 'source' as a RouteLeg, or
+        return None if the snapshot has no such route.
+        """
+        first, last = self.offsets[source], self.offsets[source + 1]
+        for e in range(first, last):
+            if self.route_ids[e] == route_id:
+                # Routes are ordered by position within a source (see fingerprint)
+                position = AirportRoute.LEFT if e == first and self.left[source] >= 0 else AirportRoute.RIGHT
+                target = self.targets[e]
+                return RouteLeg(
+                    route_id, self.airport_ids[source], self.airport_ids[target],
+                    self.codes[source], self.codes[target], position, self.weights[e],
+                )
+        return None
+
+    def successor(self, index: int, direction: str) -> int:
+        """
+        Return the index of the left or right child of 'index', or -1 if there is none.
+        """
+        return (self.left if direction == AirportRoute.LEFT else self.right)[index]
+
+    def neighbors(self, index: int):
+        """
+        Yield (target_index, weight, edge_index) for every route leaving 'index'.
+        """
+        for e in range(self.offsets[index], self.offsets[index + 1]):
+            yield self.targets[e], self.weights[e], e
+
+
+class RouteLeg:
+    """
+    One leg of a returned path, built from a RouteGraph snapshot instead of
+    loading an AirportRoute instance and its two airports.
+
+    Attributes:
+        pk: int - AirportRoute primary key
+        from_airport_id: int - primary key of the origin airport
+        to_airport_id: int - primary key of the destination airport
+        from_code: str - origin airport code
+        to_code: str - destination airport code
+        position: str - 'left' or 'right'
+        duration: int - route duration
+    """
+
+    __slots__ = ('pk', 'from_airport_id', 'to_airport_id', 'from_code', 'to_code', 'position', 'duration')
+
+    def __init__(self, pk, from_airport_id, to_airport_id, from_code, to_code, position, duration):
+        self.pk = pk
+        self.from_airport_id = from_airport_id
+        self.to_airport_id = to_airport_id
+        self.from_code = from_code
+        self.to_code = to_code
+        self.position = position
+        self.duration = duration
+
+    def __eq__(self, other):
+        if not isinstance(other, RouteLeg):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+    def __str__(self):
+        # Same form as AirportRoute.__str__
+        return f"{self.from_code} -> {self.to_code} ({self.position}, {self.duration} km)"
+
+    def __repr__(self):
+        return f"<RouteLeg: {self}>"
+
+
+FINGERPRINT_MODULUS = 2 ** 64
+
+
+def _element_hash(*parts) -> int:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def airport_fingerprint(airport_id: int, code: str) -> int:
+    """
+    Contribution of one airport to RouteGraph.fingerprint.
+    """
+    return _element_hash('airport', airport_id, code)
+
+
+def route_fingerprint(route_id: int, from_id: int, to_id: int, position: str, duration: int) -> int:
+    """
+    Contribution of one route to RouteGraph.fingerprint.
+
+    The fingerprint is a sum of per-element hashes, so an index that applies
+    a single insert can update its stored fingerprint by adding this value.
+    """
+    return _element_hash('route', route_id, from_id, to_id, position, duration)
+
+
+def network_stamp(using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Return the network stamp stored in database 'using' (one query), or 0
+    if the network was never written.
+    """
+    rows = NetworkVersion.objects.using(using).filter(pk=NETWORK_ROW)
+    return rows.values_list('stamp', flat=True).first() or 0
+
+
+def bump_graph_version(using: str = DEFAULT_DB_ALIAS) -> tuple:
+    """
+    Give the network a new stamp, invalidating the cached graph data of
+    every process once the current transaction commits.
+
+    Called by the model signals for every write; code writing with
+    queryset.update(), bulk_create() or raw SQL must call it itself, inside
+    the same transaction.
+
+    Returns:
+        (previous, stamp): the stamp replaced and the new one.
+    """
+    stamp = secrets.randbelow(2 ** 63 - 1) + 1
+    rows = NetworkVersion.objects.using(using).filter(pk=NETWORK_ROW)
+    # Both assignments read the row's old values, so 'previous' gets the old stamp
+    if not rows.update(previous=F('stamp'), stamp=stamp):
+        try:
+            with transaction.atomic(using=using):
+                NetworkVersion.objects.using(using).create(pk=NETWORK_ROW, previous=0, stamp=stamp)
+            return 0, stamp
+        except IntegrityError:
+            # Another writer created the row first
+            rows.update(previous=F('stamp'), stamp=stamp)
+    return rows.values_list('previous', flat=True).get(), stamp
+
+
+def cached_stamp():
+    """
+    Return the last stamp read from the primary if it was read within
+    settings.ROUTES_GRAPH_STAMP_TTL seconds, else None.
+
+    Never touches the database, so it is safe to call from async code.
+    """
+    stamp, checked_at = _checked
+    ttl = getattr(settings, 'ROUTES_GRAPH_STAMP_TTL', DEFAULT_STAMP_TTL)
+    if stamp is not None and ttl > 0 and time.monotonic() - checked_at < ttl:
+        return stamp
+    return None
+
+
+def current_stamp() -> int:
+    """
+    Return the primary's network stamp, reusing the last one read for up to
+    settings.ROUTES_GRAPH_STAMP_TTL seconds (0: read it on every call).
+
+    Within the TTL no query is made; a commit by this process resets it
+    through forget_stamp().
+    """
+    global _checked
+    stamp = cached_stamp()
+    if stamp is not None:
+        return stamp
+    stamp = network_stamp()
+    _checked = (stamp, time.monotonic())
+    return stamp
+
+
+def forget_stamp():
+    """
+    Make the next current_stamp() call read the stamp again; called once a
+    write of this process commits, so it reads its own writes.
+    """
+    global _checked
+    _checked = (None, 0.0)
+
+
+def reset_route_graph():
+    """
+    Drop this process's snapshot, so the next get_route_graph() call builds
+    it again (used to time the build when profiling).
+    """
+    global _snapshot
+    with _build_lock:
+        _snapshot = None
+    forget_stamp()
+
+
+def _build_snapshot() -> RouteGraph:
+    """
+    Map the exported graph file if it matches the database, else load from the database.
+
+    Reads go to the primary, whose stamp the snapshot is compared with.
+    """
+    with use_primary():
+        path = getattr(settings, 'ROUTES_GRAPH_FILE', None)
+        if path and os.path.exists(path):
+            from .graph_file import map_graph_file
+            graph = map_graph_file(path, network_stamp())
+            if graph is not None:
+                return graph
+        return RouteGraph.from_database_stamped()
+
+
+def cached_route_graph():
+    """
+    Return the cached RouteGraph if its stamp was confirmed within
+    settings.ROUTES_GRAPH_STAMP_TTL seconds, else None.
+
+    Never touches the database, so it is safe to call from async code.
+    """
+    snapshot = _snapshot
+    stamp = cached_stamp()
+    if snapshot is not None and stamp is not None and snapshot.version == stamp:
+        return snapshot
+    return None
+
+
+def get_route_graph() -> RouteGraph:
+    """
+    Return the cached RouteGraph, rebuilding it if the network stamp moved on.
+
+    Repeat calls with no intervening writes return the same snapshot, with
+    no query at all while the last stamp check is recent enough (see
+    current_stamp()). A rebuild maps settings.ROUTES_GRAPH_FILE when it is
+    up to date (see routes.graph_file) instead of reading every route.
+    """
+    global _snapshot, _checked
+    stamp = current_stamp()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == stamp:
+        return snapshot
+    with _build_lock:
+        # Another thread may have rebuilt the snapshot while we waited
+        if _snapshot is None or _snapshot.version != stamp:
+            with timed('graph_build'):
+                _snapshot = _build_snapshot()
+            # The build read the stamp from the primary just now
+            _checked = (_snapshot.version, time.monotonic())
+        return _snapshot
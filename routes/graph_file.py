@@ -0,0 +1,156 @@
+"""
+Memory-mapped binary file format for RouteGraph snapshots.
+
+Written by ``manage.py export_route_graph`` and mapped read-only by
+get_route_graph(), so every web worker shares the same page-cache pages
+instead of rebuilding the graph from the database. Mapping is zero-copy:
+the snapshot's arrays are memoryviews over the file, and only the airport
+code table is decoded on load, so start-up cost does not depend on the
+number of routes.
+
+The file records the network stamp of the data it was exported from. Every
+write to airports or routes replaces the stamp, renames and duration
+changes included, so a file is only mapped while nothing was written since
+its export.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header      magic, format version, airport/route counts, code table size,
+                graph fingerprint, network stamp (see routes.graph)
+    airport_ids int64[N]
+    offsets     int64[N + 1]
+    targets     int32[E]
+    weights     uint32[E]   (route durations)
+    route_ids   int64[E]
+    left        int32[N]
+    right       int32[N]
+    code_ends   uint32[N]   (end offset of each code in the code table)
+    codes       utf-8 bytes, concatenated airport codes
+"""
+from array import array
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+
+MAGIC = b'AEROGRF1'
+FORMAT_VERSION = 2
+
+# magic, format version, reserved, airports, routes, code bytes, fingerprint, network stamp
+HEADER = struct.Struct('<8sIIQQQQq')
+
+# (attribute, typecode, length) for each array section; N airports, E routes
+SECTIONS = (
+    ('airport_ids', 'q', 'N'),
+    ('offsets', 'q', 'N+1'),
+    ('targets', 'i', 'E'),
+    ('weights', 'I', 'E'),
+    ('route_ids', 'q', 'E'),
+    ('left', 'i', 'N'),
+    ('right', 'i', 'N'),
+    ('code_ends', 'I', 'N'),
+)
+
+
+def _section_length(length: str, airports: int, routes: int) -> int:
+    return {'N': airports, 'N+1': airports + 1, 'E': routes}[length]
+
+
+def _padding(size: int) -> int:
+    return -size % 8
+
+
+def write_graph_file(graph, path):
+    """
+    Atomically write 'graph' to 'path' in the mapped file format, stamped
+    with its version (the network stamp it was built at, see
+    RouteGraph.from_database_stamped()).
+
+    Args:
+        graph: RouteGraph to export
+        path: Path - destination file
+    """
+    encoded = [code.encode() for code in graph.codes]
+    code_ends = array('I')
+    end = 0
+    for code in encoded:
+        end += len(code)
+        code_ends.append(end)
+    code_bytes = b''.join(encoded)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(
+                MAGIC, FORMAT_VERSION, 0, graph.num_airports, graph.num_routes,
+                len(code_bytes), graph.fingerprint, graph.version,
+            ))
+            f.write(bytes(_padding(HEADER.size)))
+            for name, typecode, _ in SECTIONS:
+                values = code_ends if name == 'code_ends' else getattr(graph, name)
+                data = array(typecode, values)
+                if sys.byteorder != 'little':
+                    data.byteswap()
+                f.write(data.tobytes())
+                f.write(bytes(_padding(len(data) * data.itemsize)))
+            f.write(code_bytes)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def map_graph_file(path, stamp: int = None):
+    """
+    Map a graph file written by write_graph_file() as a RouteGraph tagged
+    with the network stamp stored in the file.
+
+    Args:
+        path: Path - file to map
+        stamp: if given, the file is only used when it was exported at
+            this network stamp
+
+    Returns:
+        RouteGraph backed by the mapped file, or None if the file is
+        missing, unreadable or stale.
+    """
+    from .graph import RouteGraph
+
+    if sys.byteorder != 'little':
+        # Zero-copy views need the file's byte order to match the machine's
+        return None
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mapped) < HEADER.size:
+        return None
+    magic, fmt, _, airports, routes, code_size, fingerprint, stored_stamp = HEADER.unpack_from(mapped)
+    if magic != MAGIC or fmt != FORMAT_VERSION:
+        return None
+    if stamp is not None and stored_stamp != stamp:
+        return None
+
+    view = memoryview(mapped)
+    position = HEADER.size + _padding(HEADER.size)
+    sections = {}
+    for name, typecode, length in SECTIONS:
+        size = _section_length(length, airports, routes) * struct.calcsize(typecode)
+        if position + size > len(mapped):
+            return None
+        sections[name] = view[position:position + size].cast(typecode)
+        position += size + _padding(size)
+    if position + code_size > len(mapped):
+        return None
+    code_bytes = bytes(view[position:position + code_size])
+
+    codes = []
+    start = 0
+    for end in sections.pop('code_ends'):
+        codes.append(code_bytes[start:end].decode())
+        start = end
+    return RouteGraph(stored_stamp, codes=codes, fingerprint=fingerprint, **sections)
@@ -0,0 +1,375 @@
+"""
+Jump-pointer (binary lifting) index for nth-left/nth-right lookups.
+
+Every airport has at most one left and one right child, so each direction
+is a functional graph: following it from any airport either ends or enters
+a cycle within N steps (N = number of airports). For each direction the
+index stores the 2^k-th successor of every airport plus the length of the
+cycle each airport sits on, which answers "n steps along the chain" in
+O(log N) array lookups for any n.
+
+The index is persisted to settings.ROUTES_INDEX_DIR together with the
+network stamp and graph fingerprint it describes, and patched in memory
+when an airport or route is created (see routes.signals), so neither a
+restart nor a single insert requires a full rebuild. Patches are written
+back lazily: every settings.ROUTES_JUMP_INDEX_SAVE_EVERY patches and when
+the process exits. A process whose index is behind the shared stamp
+reloads the file, and only rebuilds when the file is behind too.
+"""
+from array import array
+import atexit
+import threading
+
+from django.conf import settings
+
+from .graph import (
+    FINGERPRINT_MODULUS, airport_fingerprint, current_stamp, get_route_graph,
+    route_fingerprint,
+)
+from .metrics import timed
+from .models import AirportRoute
+from .storage import index_path, load_arrays, save_arrays
+
+
+INDEX_FILE = 'jump_pointers.idx'
+
+DIRECTIONS = (AirportRoute.LEFT, AirportRoute.RIGHT)
+
+# Loaded index for this process, the lock serialising loads and patches,
+# and the number of patches applied since the index was last saved
+_index = None
+_lock = threading.Lock()
+_unsaved = 0
+
+
+def _levels_for(size: int) -> int:
+    """
+    Number of jump levels needed so that a jump of 'size' steps fits.
+    """
+    return max(1, size.bit_length())
+
+
+def _lift(jumps: list, level: int, nodes):
+    """
+    Fill jumps[level] for 'nodes' from jumps[level - 1].
+    """
+    lower, upper = jumps[level - 1], jumps[level]
+    for x in nodes:
+        y = lower[x]
+        upper[x] = lower[y] if y >= 0 else -1
+
+
+def _cycle_lengths(successors) -> array:
+    """
+    Return, for every node, the length of the cycle it lies on (0 if none).
+    """
+    size = len(successors)
+    lengths = array('i', bytes(4 * size))
+    state = bytearray(size)  # 0 = unvisited, 1 = on current walk, 2 = done
+    for start in range(size):
+        walk = []
+        x = start
+        while x >= 0 and state[x] == 0:
+            state[x] = 1
+            walk.append(x)
+            x = successors[x]
+        if x >= 0 and state[x] == 1:
+            # The walk closed on itself: the tail from x onwards is a cycle
+            cycle = walk[walk.index(x):]
+            for y in cycle:
+                lengths[y] = len(cycle)
+        for y in walk:
+            state[y] = 2
+    return lengths
+
+
+class JumpPointerIndex:
+    """
+    Binary lifting tables for both chain directions.
+
+    Attributes:
+        version: network stamp the index is current for (see routes.graph)
+        fingerprint: RouteGraph.fingerprint of the network it describes
+        airport_ids: array of Airport primary keys, indexed by node
+        codes: list of airport codes, indexed by node
+        jumps: direction -> list of arrays; jumps[d][k][x] is the node
+            2^k steps from x, or -1
+        cycle_length: direction -> array of cycle lengths (0 off-cycle)
+    """
+
+    def __init__(self, version, fingerprint, airport_ids, codes, jumps, cycle_length):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.airport_ids = airport_ids
+        self.codes = codes
+        self.jumps = jumps
+        self.cycle_length = cycle_length
+        self._index_by_code = {code: i for i, code in enumerate(codes)}
+        self._index_by_id = {pk: i for i, pk in enumerate(airport_ids)}
+        # direction -> {node: nodes whose successor it is}, built on the first patch
+        self._predecessors = {}
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Build the index from a RouteGraph snapshot in O(N log N).
+        """
+        size = graph.num_airports
+        levels = _levels_for(size)
+        jumps = {}
+        cycle_length = {}
+        for direction in DIRECTIONS:
+            base = array('i', graph.left if direction == AirportRoute.LEFT else graph.right)
+            table = [base] + [array('i', base) for _ in range(1, levels)]
+            for k in range(1, levels):
+                _lift(table, k, range(size))
+            jumps[direction] = table
+            cycle_length[direction] = _cycle_lengths(base)
+        return cls(
+            graph.version, graph.fingerprint, array('q', graph.airport_ids),
+            list(graph.codes), jumps, cycle_length,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a persisted index, or return None if there is no usable file.
+        The index's version is the network stamp it was saved for.
+        """
+        loaded = load_arrays(path)
+        if loaded is None:
+            return None
+        meta, arrays = loaded
+        jumps = {
+            d: [arrays[f'{d}.{k}'] for k in range(meta['levels'])] for d in DIRECTIONS
+        }
+        cycle_length = {d: arrays[f'{d}.cycle'] for d in DIRECTIONS}
+        return cls(
+            meta.get('stamp'), meta['fingerprint'], arrays['airport_ids'], meta['codes'],
+            jumps, cycle_length,
+        )
+
+    def save(self, path):
+        """
+        Persist the index to 'path'.
+        """
+        arrays = {'airport_ids': self.airport_ids}
+        for d in DIRECTIONS:
+            for k, level in enumerate(self.jumps[d]):
+                arrays[f'{d}.{k}'] = level
+            arrays[f'{d}.cycle'] = self.cycle_length[d]
+        meta = {
+            'stamp': self.version,
+            'fingerprint': self.fingerprint,
+            'levels': len(self.jumps[DIRECTIONS[0]]),
+            'codes': self.codes,
+        }
+        save_arrays(path, meta, arrays)
+
+    def jump(self, node: int, direction: str, steps: int) -> int:
+        """
+        Return the node 'steps' hops from 'node', or -1 if the chain ends first.
+        'steps' must be smaller than 2 ** levels.
+        """
+        table = self.jumps[direction]
+        k = 0
+        while steps and node >= 0:
+            if steps & 1:
+                node = table[k][node]
+            steps >>= 1
+            k += 1
+        return node
+
+    def nth(self, start_code: str, direction: str, n: int):
+        """
+        Return the Airport primary key 'n' steps from 'start_code', or None.
+        """
+        node = self._index_by_code.get(start_code)
+        if node is None:
+            return None
+        size = len(self.airport_ids)
+        if n >= size:
+            # After N steps a surviving chain must be inside its cycle, so the
+            # remaining steps only matter modulo the cycle length
+            node = self.jump(node, direction, size)
+            if node < 0:
+                return None
+            n = (n - size) % self.cycle_length[direction][node]
+        node = self.jump(node, direction, n)
+        return self.airport_ids[node] if node >= 0 else None
+
+    def add_airport(self, airport_id: int, code: str) -> bool:
+        """
+        Append a newly created airport with no children.
+        """
+        self._index_by_id[airport_id] = len(self.airport_ids)
+        self._index_by_code[code] = len(self.airport_ids)
+        self.airport_ids.append(airport_id)
+        self.codes.append(code)
+        levels = _levels_for(len(self.airport_ids))
+        for d in DIRECTIONS:
+            table = self.jumps[d]
+            for level in table:
+                level.append(-1)
+            self.cycle_length[d].append(0)
+            # A larger network may need one more level for jumps of N steps
+            while len(table) < levels:
+                table.append(array('i', table[-1]))
+                _lift(table, len(table) - 1, range(len(self.airport_ids)))
+        self.fingerprint = (self.fingerprint + airport_fingerprint(airport_id, code)) % FINGERPRINT_MODULUS
+        return True
+
+    def _predecessors_of(self, direction: str) -> dict:
+        """
+        Return the predecessor lists of 'direction', building them in O(N)
+        the first time; add_route() keeps them current afterwards.
+        """
+        predecessors = self._predecessors.get(direction)
+        if predecessors is None:
+            predecessors = {}
+            for x, y in enumerate(self.jumps[direction][0]):
+                if y >= 0:
+                    predecessors.setdefault(y, []).append(x)
+            self._predecessors[direction] = predecessors
+        return predecessors
+
+    def add_route(self, route_id: int, from_id: int, to_id: int, position: str, duration: int) -> bool:
+        """
+        Patch the index for a newly created route.
+
+        Only airports whose chain reaches the route's source change, so the
+        jump rows are recomputed for that set alone, level by level.
+
+        Returns:
+            False if an endpoint is unknown to the index (caller must rebuild).
+        """
+        source = self._index_by_id.get(from_id)
+        target = self._index_by_id.get(to_id)
+        if source is None or target is None:
+            return False
+        table = self.jumps[position]
+        successors = table[0]
+        successors[source] = target
+        predecessors = self._predecessors_of(position)
+        predecessors.setdefault(target, []).append(source)
+
+        # Collect every node whose chain passes through 'source'; the walk
+        # stops at 'source' again if the new route closes a cycle
+        affected = [source]
+        for x in affected:
+            affected.extend(y for y in predecessors.get(x, ()) if y != source)
+        for k in range(1, len(table)):
+            _lift(table, k, affected)
+
+        # The source previously ended its chain, so none of the affected
+        # nodes was on a cycle; the new route may close one through it
+        lengths = self.cycle_length[position]
+        for x in affected:
+            lengths[x] = 0
+        cycle = [source]
+        x = target
+        while x >= 0 and x != source and len(cycle) <= len(affected):
+            cycle.append(x)
+            x = successors[x]
+        if x == source:
+            for y in cycle:
+                lengths[y] = len(cycle)
+
+        self.fingerprint = (
+            self.fingerprint + route_fingerprint(route_id, from_id, to_id, position, duration)
+        ) % FINGERPRINT_MODULUS
+        return True
+
+
+def get_jump_index() -> JumpPointerIndex:
+    """
+    Return the jump-pointer index for the current network stamp.
+
+    The loaded index is kept while the stamp is unchanged (or was moved on
+    by writes of this process it has been patched for). Otherwise the
+    persisted index is reused when it was saved for the current stamp (no
+    route graph needed, e.g. after another process patched and saved it) or
+    its fingerprint matches the current network; else the index is rebuilt
+    from the RouteGraph and saved.
+    """
+    global _index, _unsaved
+    stamp = current_stamp()
+    index = _index
+    if index is not None and index.version == stamp:
+        return index
+    with _lock:
+        if _index is not None and _index.version == stamp:
+            return _index
+        path = index_path(INDEX_FILE)
+        index = JumpPointerIndex.load(path)
+        if index is None or index.version != stamp:
+            graph = get_route_graph()
+            if index is not None and index.fingerprint == graph.fingerprint:
+                index.version = graph.version
+            else:
+                with timed('jump_index_build'):
+                    index = JumpPointerIndex.from_graph(graph)
+                    index.save(path)
+        _index = index
+        _unsaved = 0
+        return index
+
+
+@atexit.register
+def save_jump_index():
+    """
+    Write the loaded index back to disk if it has unsaved patches.
+    """
+    global _unsaved
+    with _lock:
+        if _index is not None and _unsaved:
+            _index.save(index_path(INDEX_FILE))
+            _unsaved = 0
+
+
+def nth_airport_id(start_code: str, direction: str, n: int):
+    """
+    Return the primary key of the airport 'n' steps from 'start_code', or None.
+    """
+    index = get_jump_index()
+    with _lock:
+        return index.nth(start_code, direction, n)
+
+
+def airport_created(airport_id: int, code: str, previous: int, stamp: int):
+    """
+    Patch the loaded index for a new airport committed by the write from
+    stamp 'previous' to 'stamp'.
+    """
+    _patch(previous, stamp, lambda index: index.add_airport(airport_id, code))
+
+
+def route_created(route_id, from_id, to_id, position, duration, previous: int, stamp: int):
+    """
+    Patch the loaded index for a new route committed by the write from
+    stamp 'previous' to 'stamp'.
+    """
+    _patch(previous, stamp, lambda index: index.add_route(route_id, from_id, to_id, position, duration))
+
+
+def _patch(previous: int, stamp: int, apply):
+    """
+    Apply one change to the loaded index if it was current just before it.
+
+    If the index is missing or behind (another process wrote in between),
+    nothing is done and the next lookup reloads or rebuilds it. The patched
+    index is only saved every settings.ROUTES_JUMP_INDEX_SAVE_EVERY patches
+    (and by save_jump_index() at exit), so a write costs O(affected nodes *
+    log N) rather than a rewrite of the whole file.
+    """
+    global _unsaved
+    with _lock:
+        index = _index
+        if index is None or index.version != previous:
+            return
+        if apply(index):
+            index.version = stamp
+            _unsaved += 1
+            if _unsaved >= getattr(settings, 'ROUTES_JUMP_INDEX_SAVE_EVERY', 1000):
+                index.save(index_path(INDEX_FILE))
+                _unsaved = 0
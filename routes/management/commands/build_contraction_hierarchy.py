@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from routes.contraction import (
+    DEFAULT_CORE_DEGREE, DEFAULT_WITNESS_LIMIT, INDEX_FILE, build_contraction_hierarchy,
+)
+from routes.graph import get_route_graph
+from routes.storage import index_path
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to contract the route network into a
+    contraction hierarchy and store it on disk for find_shortest_route_between.
+
+    Usage: python manage.py build_contraction_hierarchy [--witness-limit N] [--core-degree D]
+    """
+
+    help = "Precompute a contraction hierarchy for point-to-point shortest-route queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--witness-limit', type=int, default=DEFAULT_WITNESS_LIMIT,
+            help=f"Airports a witness search may settle (default: {DEFAULT_WITNESS_LIMIT})",
+        )
+        parser.add_argument(
+            '--core-degree', type=float, default=DEFAULT_CORE_DEGREE,
+            help=(
+                "Stop contracting once the remaining airports average more arcs than this "
+                f"(default: {DEFAULT_CORE_DEGREE})"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: load the route graph, contract it and write the
+        hierarchy to ROUTES_INDEX_DIR.
+        """
+        started = time.perf_counter()
+        graph = get_route_graph()
+        hierarchy = build_contraction_hierarchy(graph, options['witness_limit'], options['core_degree'])
+        path = index_path(INDEX_FILE)
+        hierarchy.save(path)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Built contraction hierarchy for {graph.num_airports} airports and "
+            f"{graph.num_routes} routes in {elapsed:.2f}s ({hierarchy.shortcuts} shortcuts, "
+            f"{hierarchy.core} core airports): {path}"
+        ))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from routes.distance_index import INDEX_FILE, KINDS, build_distance_index
+from routes.graph import get_route_graph
+from routes.storage import index_path
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to precompute shortest-path distances
+    and store them on disk for find_shortest_route_between.
+
+    Usage: python manage.py build_distance_index [--kind auto|apsp|alt] [--landmarks N]
+    """
+
+    help = "Precompute an all-pairs or ALT landmark distance index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', choices=KINDS, default='auto',
+            help="Index type; 'auto' picks apsp for small networks and alt otherwise",
+        )
+        parser.add_argument(
+            '--landmarks', type=int, default=None,
+            help="Number of ALT landmarks (default: ROUTES_ALT_LANDMARKS)",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: load the route graph, build the requested index
+        and write it to ROUTES_INDEX_DIR.
+        """
+        started = time.perf_counter()
+        graph = get_route_graph()
+        index = build_distance_index(graph, options['kind'], options['landmarks'])
+        path = index_path(INDEX_FILE)
+        index.save(path)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {index.kind} distance index for {graph.num_airports} airports "
+            f"and {graph.num_routes} routes in {elapsed:.2f}s: {path}"
+        ))
@@ -0,0 +1,63 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from routes.graph import get_route_graph
+from routes.parallel import RoutePool
+from routes.utils import find_shortest_routes
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to answer a large list of shortest-route
+    queries, optionally spread over several worker processes.
+
+    Input is CSV with one 'FROM,TO' airport code pair per line; output is
+    JSON Lines with one result object per pair.
+
+    Usage: python manage.py bulk_shortest_routes pairs.csv [--workers N] [--output results.jsonl]
+    """
+
+    help = "Answer many shortest-route queries in bulk, optionally in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="CSV file of FROM,TO pairs ('-' for stdin)")
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Worker processes sharing the route graph (default: 1, in-process)",
+        )
+        parser.add_argument('--output', default='-', help="JSON Lines output file ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: read the pairs, solve them and write the results.
+        """
+        source = sys.stdin if options['input'] == '-' else open(options['input'], newline='')
+        with source:
+            pairs = [(row[0].strip(), row[1].strip()) for row in csv.reader(source) if len(row) >= 2]
+
+        target = self.stdout if options['output'] == '-' else open(options['output'], 'w')
+        graph = get_route_graph()
+        started = time.perf_counter()
+        pool = RoutePool(graph, options['workers']) if options['workers'] > 1 else None
+        try:
+            for from_code, to_code, result in find_shortest_routes(pairs, pool=pool):
+                item = {'from': from_code, 'to': to_code, 'distance': None, 'path': None, 'route_ids': None}
+                if result:
+                    item.update(distance=result['distance'], path=result['path'],
+                                route_ids=[route.pk for route in result['routes']])
+                target.write(json.dumps(item) + '\n')
+        finally:
+            if pool is not None:
+                pool.close()
+            if target is not self.stdout:
+                target.close()
+
+        elapsed = time.perf_counter() - started
+        rate = len(pairs) / elapsed if elapsed else 0
+        self.stderr.write(self.style.SUCCESS(
+            f"Solved {len(pairs)} pairs with {options['workers']} worker(s) in {elapsed:.2f}s ({rate:.0f} pairs/s)"
+        ))
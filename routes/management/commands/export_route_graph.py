@@ -0,0 +1,41 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from routes.graph import RouteGraph
+from routes.graph_file import write_graph_file
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to export the route network as a
+    memory-mappable binary graph file (see routes.graph_file).
+
+    Usage: python manage.py export_route_graph [--output PATH]
+    """
+
+    help = "Export the route graph to a memory-mapped binary file"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=None,
+            help="Destination file (default: ROUTES_GRAPH_FILE)",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: load the graph and its network stamp in one
+        transaction and write them to the graph file.
+        """
+        path = Path(options['output'] or settings.ROUTES_GRAPH_FILE)
+        started = time.perf_counter()
+        graph = RouteGraph.from_database_stamped()
+        write_graph_file(graph, path)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {graph.num_airports} airports and {graph.num_routes} routes "
+            f"in {elapsed:.2f}s: {path}"
+        ))
@@ -0,0 +1,57 @@
+import gzip
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from routes.export import FORMATS, export_network
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to export the route network as JSON
+    Lines, a Graphviz DOT graph or an adjacency list.
+
+    Rows are streamed from the database in chunks and written as they are
+    read, so memory use does not grow with the network (see routes.export).
+    Output is gzip-compressed with --gzip or when the file name ends in '.gz'.
+
+    Usage: python manage.py export_routes [--format jsonl|dot|adjacency] [--output FILE] [--gzip]
+    """
+
+    help = "Stream the route network to a JSON Lines, DOT or adjacency-list file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='jsonl', help="Output format (default: jsonl)")
+        parser.add_argument('--output', default='-', help="Output file ('-' for stdout)")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip")
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: stream the export to the output and report its size.
+        """
+        path = options['output']
+        compress = options['gzip'] or path.endswith('.gz')
+        if path != '-':
+            target = gzip.open(path, 'wt', encoding='utf-8') if compress else open(path, 'w', encoding='utf-8')
+        elif compress:
+            # Closing the wrapper finishes the gzip stream but leaves stdout open
+            target = io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), encoding='utf-8')
+        else:
+            target = self.stdout
+
+        started = time.perf_counter()
+        written = 0
+        try:
+            for block in export_network(options['format']):
+                target.write(block)
+                written += len(block)
+        finally:
+            if target is not self.stdout:
+                target.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {written} characters as {options['format']} in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,176 @@
+import csv
+import itertools
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from routes import chain_index
+from routes.graph import bump_graph_version
+from routes.models import Airport, AirportRoute
+
+
+POSITIONS = {AirportRoute.LEFT, AirportRoute.RIGHT}
+
+# Number of rejected rows printed in detail before only counting them
+MAX_REPORTED_ERRORS = 10
+
+
+def read_records(path: str, fmt: str):
+    """
+    Stream dict records from a CSV (with header row) or JSON Lines file.
+    """
+    if fmt == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+
+def chunked(records, size: int):
+    """
+    Yield lists of at most 'size' records.
+    """
+    iterator = iter(records)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to bulk load airports and routes from
+    CSV or JSON Lines files.
+
+    Input is streamed in batches; each batch resolves airport codes with one
+    query, is validated in bulk and is written with a single bulk upsert
+    inside its own transaction.
+
+    Airport files need 'code' and 'name' columns; route files need 'from',
+    'to', 'position' and 'duration'. Existing airports are renamed and an
+    existing route in the same (from, position) slot is replaced.
+
+    Usage: python manage.py load_routes [--airports FILE] [--routes FILE] [--format csv|jsonl] [--batch-size N]
+    """
+
+    help = "Bulk load airports and routes from CSV or JSON Lines files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', help="File of airports (code, name)")
+        parser.add_argument('--routes', help="File of routes (from, to, position, duration)")
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'), default=None,
+            help="Input format (default: from the file extension)",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per transaction")
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: load airports first, then routes, reporting
+        throughput for each.
+        """
+        if not options['airports'] and not options['routes']:
+            raise CommandError("Provide --airports and/or --routes.")
+        self.errors = 0
+        if options['airports']:
+            self._load(options['airports'], options, 'airports', self._load_airports)
+        if options['routes']:
+            self._load(options['routes'], options, 'routes', self._load_routes)
+        if chain_index.enabled():
+            # bulk_create bypasses the signals that keep the chain index current
+            rows = chain_index.rebuild()
+            self.stdout.write(f"Rebuilt the chain index ({rows} rows)")
+        if self.errors > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... {self.errors - MAX_REPORTED_ERRORS} more rejected rows not shown")
+
+    def _load(self, path, options, label, load_batch):
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        started = time.perf_counter()
+        loaded = rejected = 0
+        for batch in chunked(read_records(path, fmt), options['batch_size']):
+            with transaction.atomic():
+                written = load_batch(batch)
+                # bulk_create sends no model signals, so replace the shared network
+                # stamp in the same transaction; every process serving lookups
+                # sees it and drops its cached graph data once the batch commits
+                bump_graph_version()
+            loaded += written
+            rejected += len(batch) - written
+
+        elapsed = time.perf_counter() - started
+        rate = (loaded + rejected) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {loaded} {label} ({rejected} rejected) in {elapsed:.2f}s ({rate:.0f} rows/s)"
+        ))
+
+    def _reject(self, row, reason):
+        self.errors += 1
+        if self.errors <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f"Rejected {row!r}: {reason}")
+
+    def _load_airports(self, batch) -> int:
+        """
+        Upsert one batch of airports keyed by code. Returns the number written.
+        """
+        airports = {}
+        accepted = 0
+        for row in batch:
+            code = (row.get('code') or '').strip()
+            name = (row.get('name') or '').strip()
+            if not code or len(code) > 10 or len(name) > 100:
+                self._reject(row, "code must be 1-10 characters and name at most 100")
+                continue
+            # A later row for the same code wins, as the upsert would
+            airports[code] = Airport(code=code, name=name or code)
+            accepted += 1
+        Airport.objects.bulk_create(
+            airports.values(),
+            update_conflicts=True, unique_fields=['code'], update_fields=['name'],
+        )
+        return accepted
+
+    def _load_routes(self, batch) -> int:
+        """
+        Upsert one batch of routes keyed by (from_airport, position).
+        Returns the number written.
+        """
+        codes = set()
+        for row in batch:
+            codes.add((row.get('from') or '').strip())
+            codes.add((row.get('to') or '').strip())
+        airports = Airport.objects.in_bulk(codes - {''}, field_name='code')
+
+        routes = {}
+        accepted = 0
+        for row in batch:
+            source = airports.get((row.get('from') or '').strip())
+            target = airports.get((row.get('to') or '').strip())
+            position = (row.get('position') or '').strip().lower()
+            try:
+                duration = int(row.get('duration'))
+            except (TypeError, ValueError):
+                duration = -1
+            if source is None or target is None:
+                self._reject(row, "unknown airport code")
+            elif source.pk == target.pk:
+                self._reject(row, "from and to airports must be different")
+            elif position not in POSITIONS:
+                self._reject(row, "position must be 'left' or 'right'")
+            elif not 0 <= duration <= AirportRoute.MAX_DURATION:
+                self._reject(row, f"duration must be an integer from 0 to {AirportRoute.MAX_DURATION}")
+            else:
+                # A later row for the same slot wins, as the upsert would
+                routes[(source.pk, position)] = AirportRoute(
+                    from_airport=source, to_airport=target, position=position, duration=duration,
+                )
+                accepted += 1
+        AirportRoute.objects.bulk_create(
+            routes.values(),
+            update_conflicts=True,
+            unique_fields=['from_airport', 'position'],
+            update_fields=['to_airport', 'duration'],
+        )
+        return accepted
@@ -0,0 +1,95 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from routes.profiling import profile_query
+from routes.search import ALGORITHMS
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to profile one shortest-route or
+    nth-node query and report its phases, SQL and search counters (see
+    routes.profiling).
+
+    The result cache is bypassed unless --use-cache is given. --cprofile
+    writes a .prof file for pstats or snakeviz; --collapsed writes collapsed
+    stacks for flamegraph.pl or speedscope.
+
+    Usage: python manage.py profile_query FROM TO [--algorithm dijkstra|bidirectional] [--max-hops N]
+                                          [--avoid CODES] [--max-leg-duration N]
+           python manage.py profile_query FROM --nth N [--direction left|right]
+           (either form with [--cold] [--use-cache] [--cprofile FILE | --collapsed FILE] [--json])
+    """
+
+    help = "Profile a single shortest-route or nth-node query"
+
+    def add_arguments(self, parser):
+        parser.add_argument('from_code', help="Airport code to start from")
+        parser.add_argument('to_code', nargs='?', help="Destination airport code (shortest-route query)")
+        parser.add_argument('--nth', type=int, help="Profile the nth-node query n steps from FROM instead")
+        parser.add_argument('--direction', choices=('left', 'right'), default='left',
+                            help="Direction of the nth-node query (default: left)")
+        parser.add_argument('--algorithm', choices=ALGORITHMS, help="Force a shortest-path search algorithm")
+        parser.add_argument('--max-hops', type=int, help="Most legs the route may use")
+        parser.add_argument('--avoid', default='', help="Comma-separated airport codes the route must not visit")
+        parser.add_argument('--max-leg-duration', type=int, help="Longest single route allowed")
+        parser.add_argument('--cold', action='store_true', help="Rebuild the route graph snapshot first and time it")
+        parser.add_argument('--use-cache', action='store_true', help="Let the result cache answer")
+        profilers = parser.add_mutually_exclusive_group()
+        profilers.add_argument('--cprofile', metavar='FILE', help="Write cProfile statistics to FILE")
+        profilers.add_argument('--collapsed', metavar='FILE', help="Write collapsed stacks (microseconds) to FILE")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: run the query once under the profiler and print the report.
+        """
+        if (options['to_code'] is None) == (options['nth'] is None):
+            raise CommandError("Give either a destination airport or --nth.")
+        if options['nth'] is not None and options['nth'] < 0:
+            raise CommandError("--nth must not be negative.")
+
+        profiler, output = None, None
+        if options['cprofile']:
+            profiler, output = 'cprofile', options['cprofile']
+        elif options['collapsed']:
+            profiler, output = 'collapsed', options['collapsed']
+        common = {'use_cache': options['use_cache'], 'cold': options['cold'], 'profiler': profiler, 'output': output}
+
+        if options['nth'] is not None:
+            report = profile_query('nth', options['from_code'], options['direction'], options['nth'], **common)
+        else:
+            report = profile_query(
+                'shortest', options['from_code'], options['to_code'],
+                algorithm=options['algorithm'],
+                max_hops=options['max_hops'],
+                avoid=[code.strip() for code in options['avoid'].split(',') if code.strip()],
+                max_leg_duration=options['max_leg_duration'],
+                **common,
+            )
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self._print_report(report)
+
+    def _print_report(self, report: dict):
+        """
+        Print the report as aligned text.
+        """
+        self.stdout.write(f"Query: {report['query']} {' '.join(str(arg) for arg in report['args'])}")
+        self.stdout.write(f"Result: {json.dumps(report['result'])}")
+        self.stdout.write(f"SQL: {report['db_queries']} queries in {report['db_ms']:.3f} ms")
+        self.stdout.write("Phases (nested, so they overlap):")
+        for name, ms in report['phases'].items():
+            self.stdout.write(f"  {name:<28} {ms:>10.3f} ms")
+        if report['search']:
+            self.stdout.write("Search:")
+            for name, value in report['search'].items():
+                self.stdout.write(f"  {name:<28} {value:>10}")
+        for name, value in report['counters'].items():
+            self.stdout.write(f"  {name:<28} {value:>10}")
+        if report['profile']:
+            self.stdout.write(f"Profile written to {report['profile']}")
+        self.stdout.write(self.style.SUCCESS(f"Profiled in {report['total_ms']:.3f} ms"))
@@ -0,0 +1,67 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from routes.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    """
+    Custom Django management command to copy the primary SQLite database
+    into the replica files configured in DJANGO_DB_REPLICAS, standing in
+    for database replication when testing read replicas locally.
+
+    Usage: python manage.py sync_sqlite_replicas
+    """
+
+    help = "Copy the primary SQLite database into each SQLite read replica file"
+
+    def handle(self, *args, **options):
+        """
+        Command entry point: take an online backup of the primary into every
+        replica that uses a file of its own.
+        """
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError("The primary database is not SQLite; replicate it with the database's own tools")
+        source_name = str(primary.settings_dict['NAME'])
+
+        synced = failed = 0
+        for alias in replica_aliases():
+            replica = connections[alias]
+            name = str(replica.settings_dict['NAME'])
+            if replica.vendor != 'sqlite' or name == source_name:
+                continue
+            started = time.perf_counter()
+            replica.close()
+            try:
+                self._copy(source_name, name)
+            except sqlite3.Error as exc:
+                failed += 1
+                self.stderr.write(self.style.ERROR(f"{alias}: {name}: {exc}"))
+                continue
+            synced += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{alias}: {name} ({elapsed:.2f}s)")
+
+        if failed:
+            raise CommandError(f"Synced {synced} SQLite replica(s), {failed} failed")
+        self.stdout.write(self.style.SUCCESS(f"Synced {synced} SQLite replica(s)"))
+
+    @staticmethod
+    def _copy(source_name: str, target_name: str):
+        """
+        Copy the database file 'source_name' over 'target_name'.
+        """
+        # The backup API copies a consistent snapshot while writers keep going
+        source = sqlite3.connect(source_name)
+        try:
+            target = sqlite3.connect(target_name)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
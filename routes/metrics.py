@@ -0,0 +1,275 @@
+"""
+Low-overhead request instrumentation for the routes app.
+
+measure() collects, for the code running inside it, the number and total
+time of SQL queries, named timings recorded with timed() / @instrumented
+and counters recorded with count(), such as the airports settled and heap
+pops of a Dijkstra search. When nothing is being measured, each hook costs
+one ContextVar lookup.
+
+Queries are seen through an execute wrapper installed on every database
+connection when it is opened (see routes.signals). The collector lives in a
+ContextVar, which sync_to_async() carries into its worker thread, so the
+queries of async views are attributed to their request too.
+
+RouteMetricsMiddleware wraps every request in measure(), reports the
+numbers in a Server-Timing response header and adds them to the
+process-wide registry, which the metrics endpoint renders in the
+Prometheus text format. Each process keeps its own registry; Prometheus
+sums across processes when scraping every worker.
+
+Streaming responses are generated after the middleware returns, so only the
+work done before the first byte is attributed to them.
+"""
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+# Metrics collector of the request (or measure() block) currently running
+_current = contextvars.ContextVar('route_metrics', default=None)
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    """
+    Numbers collected by one measure() block.
+
+    Attributes:
+        queries: int - SQL statements executed
+        db_seconds: float - time spent executing them
+        timings: dict of name -> seconds recorded by timed()
+        counters: dict of name -> value recorded by count()
+    """
+
+    __slots__ = ('queries', 'db_seconds', 'timings', 'counters')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.timings = {}
+        self.counters = {}
+
+    def server_timing(self, total: float = None) -> str:
+        """
+        Format the collected numbers as a Server-Timing header value.
+
+        Timings overlap (a utility function includes the graph build and
+        search it triggers), so they do not add up to the total.
+        """
+        entries = [f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"']
+        for name, seconds in self.timings.items():
+            entries.append(f'{name};dur={seconds * 1000:.2f}')
+        for name, value in self.counters.items():
+            entries.append(f'{name};desc="{value}"')
+        if total is not None:
+            entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+@contextlib.contextmanager
+def measure():
+    """
+    Collect query counts, timings and counters for the enclosed code.
+
+    Usage:
+        with measure() as metrics:
+            find_shortest_route_between('JFK', 'LHR')
+        print(metrics.queries, metrics.timings)
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def _count_query(execute, sql, params, many, context):
+    """
+    Execute wrapper counting and timing statements run inside measure().
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += time.perf_counter() - began
+        metrics.queries += 1
+
+
+def install_query_hook(connection):
+    """
+    Add the query counting wrapper to 'connection' (once).
+    """
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextlib.contextmanager
+def timed(name: str):
+    """
+    Add the time spent in the enclosed code to the timing 'name' of the
+    current measure() block, if any.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] = metrics.timings.get(name, 0.0) + time.perf_counter() - began
+
+
+def instrumented(func):
+    """
+    Decorator recording the time spent in 'func' (plain or async) under its name.
+    """
+    if iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with timed(func.__name__):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def count(name: str, value: int = 1):
+    """
+    Add 'value' to the counter 'name' of the current measure() block, if any.
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.counters[name] = metrics.counters.get(name, 0) + value
+
+
+class MetricsRegistry:
+    """
+    Process-wide totals of the per-request metrics, labelled by view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (metric, labels) -> value
+        self._histograms = {}  # view -> [bucket counts..., +Inf count, sum]
+        self._collectors = []
+
+    def add_collector(self, collector):
+        """
+        Register a callable returning extra counters to render, as a list of
+        (metric, labels, value) tuples with labels a tuple of (name, value) pairs.
+        """
+        self._collectors.append(collector)
+
+    def _add(self, metric: str, labels: tuple, value):
+        key = (metric, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, view: str, seconds: float, metrics: RequestMetrics):
+        """
+        Record one finished request.
+        """
+        with self._lock:
+            histogram = self._histograms.setdefault(view, [0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += seconds
+
+            labels = (('view', view),)
+            self._add('aeroroute_db_queries_total', labels, metrics.queries)
+            self._add('aeroroute_db_duration_seconds_total', labels, metrics.db_seconds)
+            for name, value in metrics.timings.items():
+                self._add('aeroroute_phase_duration_seconds_total', labels + (('phase', name),), value)
+            for name, value in metrics.counters.items():
+                self._add('aeroroute_search_events_total', labels + (('event', name),), value)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        lines = [
+            '# HELP aeroroute_request_duration_seconds Request latency by view.',
+            '# TYPE aeroroute_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            for view, histogram in sorted(self._histograms.items()):
+                for bound, total in zip(LATENCY_BUCKETS, histogram):
+                    lines.append(f'aeroroute_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {total}')
+                lines.append(f'aeroroute_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {histogram[-2]}')
+                lines.append(f'aeroroute_request_duration_seconds_sum{{view="{view}"}} {histogram[-1]:.6f}')
+                lines.append(f'aeroroute_request_duration_seconds_count{{view="{view}"}} {histogram[-2]}')
+
+            by_metric = {}
+            for (metric, labels), value in self._counters.items():
+                by_metric.setdefault(metric, []).append((labels, value))
+        for collector in self._collectors:
+            for metric, labels, value in collector():
+                by_metric.setdefault(metric, []).append((labels, value))
+        for metric, samples in sorted(by_metric.items()):
+            lines.append(f'# TYPE {metric} counter')
+            for labels, value in sorted(samples):
+                label_text = ','.join(f'{key}="{label}"' for key, label in labels)
+                text = f'{value:.6f}' if isinstance(value, float) else str(value)
+                lines.append(f'{metric}{{{label_text}}} {text}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RouteMetricsMiddleware:
+    """
+    Measure every request, add a Server-Timing header (unless
+    settings.ROUTES_SERVER_TIMING is False) and record the request in the
+    process-wide registry.
+
+    Supports both sync and async request handling, so async views are not
+    pushed into a thread under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        began = time.perf_counter()
+        with measure() as metrics:
+            response = self.get_response(request)
+        return self._finish(request, response, metrics, time.perf_counter() - began)
+
+    async def __acall__(self, request):
+        began = time.perf_counter()
+        with measure() as metrics:
+            response = await self.get_response(request)
+        return self._finish(request, response, metrics, time.perf_counter() - began)
+
+    def _finish(self, request, response, metrics, total):
+        match = request.resolver_match
+        registry.observe(match.view_name if match else 'unmatched', total, metrics)
+        if getattr(settings, 'ROUTES_SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing(total)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airportroute',
+            index=models.Index(fields=['from_airport', '-duration'], name='route_from_longest_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0002_route_from_longest_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteChainIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('left', 'Left'), ('right', 'Right')], max_length=5)),
+                ('chain', models.BigIntegerField()),
+                ('depth', models.PositiveIntegerField()),
+                ('length', models.PositiveIntegerField()),
+                ('loop_start', models.PositiveIntegerField(null=True)),
+                ('airport', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chain_positions', to='routes.airport')),
+                ('exit_airport', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='routes.airport')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('airport', 'direction'), name='unique_chain_position'), models.UniqueConstraint(fields=('direction', 'chain', 'depth'), name='unique_chain_depth')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:14
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0004_network_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='airportroute',
+            name='duration',
+            field=models.PositiveIntegerField(help_text='Distance in km (or duration in minutes)', validators=[django.core.validators.MaxValueValidator(2147483647)]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0005_route_duration_max'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='networkversion',
+            name='chain_index_stamp',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
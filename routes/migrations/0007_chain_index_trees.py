@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+def clear_chain_index(apps, schema_editor):
+    """
+    Drop the chain-layout rows; the table must be rebuilt with `manage.py build_chain_index`.
+    """
+    apps.get_model('routes', 'RouteChainIndex').objects.all().delete()
+    apps.get_model('routes', 'NetworkVersion').objects.update(chain_index_stamp=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('routes', '0006_chain_index_stamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_chain_index, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='routechainindex',
+            name='unique_chain_depth',
+        ),
+        migrations.RemoveField(
+            model_name='routechainindex',
+            name='chain',
+        ),
+        migrations.RemoveField(
+            model_name='routechainindex',
+            name='length',
+        ),
+        migrations.RemoveField(
+            model_name='routechainindex',
+            name='loop_start',
+        ),
+        migrations.RemoveField(
+            model_name='routechainindex',
+            name='exit_airport',
+        ),
+        migrations.AddField(
+            model_name='routechainindex',
+            name='tree',
+            field=models.BigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='routechainindex',
+            name='tin',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='routechainindex',
+            name='cycle_length',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='routechainindex',
+            name='cycle_position',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='routechainindex',
+            index=models.Index(fields=['direction', 'tree', 'depth', 'tin'], name='chain_tree_depth_tin'),
+        ),
+    ]
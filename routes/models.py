@@ -1,5 +1,5 @@
 from django.db import models
-from django.core.validators import ValidationError
+from django.core.validators import MaxValueValidator, ValidationError
 
 
 # Define the Airport model representing an airport entity with unique code and name
@@ -38,6 +38,10 @@ class AirportRoute(models.Model):
         (RIGHT, 'Right'),
     ]
 
+    # Largest duration a PositiveIntegerField holds on every database backend;
+    # the route graph stores durations as unsigned 32-bit integers
+    MAX_DURATION = 2147483647
+
     # ForeignKey to the source airport (this route originates here)
     # Multiple routes from the same airport allowed (related_name='routes_from')
     from_airport = models.ForeignKey(
@@ -53,7 +57,10 @@ class AirportRoute(models.Model):
     position = models.CharField(max_length=5, choices=POSITION_CHOICES)
 
     # Duration or distance of the route in kilometers (positive integer)
-    duration = models.PositiveIntegerField(help_text='Distance in km (or duration in minutes)')
+    duration = models.PositiveIntegerField(
+        help_text='Distance in km (or duration in minutes)',
+        validators=[MaxValueValidator(MAX_DURATION)],
+    )
 
     class Meta:
         # Constraint to ensure only one route per position (left or right) from a given airport
@@ -65,6 +72,10 @@ class AirportRoute(models.Model):
         ]
         # Default ordering by source airport and position for querysets
         ordering = ['from_airport', 'position']
+        # Longest outgoing route per airport (find_longest_node) is an index range scan
+        indexes = [
+            models.Index(fields=['from_airport', '-duration'], name='route_from_longest_idx'),
+        ]
 
     def clean(self):
         """
@@ -81,3 +92,78 @@ class AirportRoute(models.Model):
         e.g. 'JFK -> LHR (left, 4500 km)'
         """
         return f"{self.from_airport.code} -> {self.to_airport.code} ({self.position}, {self.duration} km)"
+
+
+# Materialized position of an airport in a left or right walk tree (see routes.chain_index)
+class RouteChainIndex(models.Model):
+    """
+    One row per airport and direction: the tree of walks the airport lies in,
+    its depth and its depth-first number there. Following 'direction' from an
+    airport moves one depth closer to the tree's root; a walk reaching depth 0
+    ends there or goes round the cycle the roots of the tree form.
+    """
+
+    # Airport this row places in a tree
+    airport = models.ForeignKey(Airport, related_name='chain_positions', on_delete=models.CASCADE)
+
+    # Walk direction: left or right
+    direction = models.CharField(max_length=5, choices=AirportRoute.POSITION_CHOICES)
+
+    # Tree id: primary key of the root airport, or of the first airport of the root cycle
+    tree = models.BigIntegerField()
+
+    # Steps from the airport to a root of its tree
+    depth = models.PositiveIntegerField()
+
+    # Preorder number in the tree; roots on a cycle are numbered by their position on it
+    tin = models.PositiveIntegerField()
+
+    # Number of airports on the root cycle, or null when walks in the tree end at its root
+    cycle_length = models.PositiveIntegerField(null=True)
+
+    # Position on the root cycle of the root this airport's walk reaches
+    cycle_position = models.PositiveIntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            # find_nth_node's lookup of the start airport
+            models.UniqueConstraint(fields=['airport', 'direction'], name='unique_chain_position'),
+        ]
+        indexes = [
+            # ... and of the airport n steps on: a seek by depth, then tin, within the tree
+            models.Index(fields=['direction', 'tree', 'depth', 'tin'], name='chain_tree_depth_tin'),
+        ]
+
+    def __str__(self):
+        """
+        String representation, e.g. 'left tree 12 [depth 3, #40]: airport 57'
+        """
+        return f"{self.direction} tree {self.tree} [depth {self.depth}, #{self.tin}]: airport {self.airport_id}"
+
+
+# Shared freshness marker of the route network (see routes.graph.network_stamp)
+class NetworkVersion(models.Model):
+    """
+    A single row (pk=1) whose 'stamp' changes with every committed write to
+    airports or routes. Every process compares it with the stamp its cached
+    graph data was built at, so a write made by another worker or command
+    invalidates that data too. Stamps are random rather than counted, so a
+    rolled-back write or a recreated database never reuses one.
+    """
+
+    # Stamp of the latest write (0 until the first one)
+    stamp = models.BigIntegerField(default=0)
+
+    # Stamp the latest write replaced, so a process can tell whether it saw
+    # the state just before it
+    previous = models.BigIntegerField(default=0)
+
+    # Stamp the RouteChainIndex table is current for (0: not built); lookups
+    # ignore the table while it differs from 'stamp' (see routes.chain_index)
+    chain_index_stamp = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        """
+        String representation, e.g. 'network stamp 1234 (after 987)'
+        """
+        return f"network stamp {self.stamp} (after {self.previous})"
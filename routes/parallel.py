@@ -0,0 +1,202 @@
+"""
+Process-pool execution for bulk shortest-route workloads.
+
+Dijkstra runs in pure Python, so a single process is limited to one core.
+RoutePool copies the CSR arrays of a RouteGraph into one shared memory block
+when it starts; worker processes attach to that block once, in their
+initializer, and search it in place. Each task then only carries dense
+airport indices in and distances plus edge indices out.
+"""
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+from multiprocessing import shared_memory
+import os
+import threading
+
+from django.conf import settings
+
+from .graph import get_route_graph
+from .search import solve_tasks
+
+
+# Snapshot arrays shared with the workers; codes are sent once per worker
+SHARED_ARRAYS = ('airport_ids', 'offsets', 'targets', 'weights', 'route_ids', 'left', 'right')
+
+# Origins per task: enough to amortise inter-process overhead, small enough to balance load
+ORIGINS_PER_TASK = 16
+
+# Graph attached by each worker process, and the shared block backing it
+_worker_graph = None
+_worker_memory = None
+
+# Pool kept for the current graph version by shared_route_pool()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _attach(name: str, layout: list, codes: list):
+    """
+    Worker initializer: map the shared block and wrap it in a RouteGraph.
+    """
+    global _worker_graph, _worker_memory
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # Spawned (not forked) workers start without Django configured
+        django.setup()
+    from .graph import RouteGraph
+
+    try:
+        memory = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers an attached block with the resource
+        # tracker. Pool workers share the parent's tracker, which already
+        # holds this block, so the registration changes nothing: the block
+        # is still unlinked (and unregistered) only by the parent's close().
+        memory = shared_memory.SharedMemory(name=name)
+    views = {
+        array_name: memory.buf[offset:offset + size].cast(typecode)
+        for array_name, typecode, offset, size in layout
+    }
+    _worker_memory = memory
+    _worker_graph = RouteGraph(0, codes=codes, **views)
+
+
+def _solve(tasks: list) -> list:
+    """
+    Worker task: answer a chunk of (origin, [target, ...]) queries.
+    """
+    return solve_tasks(_worker_graph, tasks)
+
+
+class RoutePool:
+    """
+    Worker processes sharing one read-only RouteGraph snapshot.
+
+    Use as a context manager, or call close() when done, so the workers are
+    stopped and the shared memory block is released. A pool shared between
+    threads is leased with acquire()/release() instead, and retire()
+    closes it once its last user is done.
+    """
+
+    def __init__(self, graph, workers: int = None):
+        self.graph = graph
+        self.workers = workers or os.cpu_count() or 1
+
+        # Lay the arrays out back to back, 8-byte aligned
+        layout = []
+        size = 0
+        for array_name in SHARED_ARRAYS:
+            # memoryview works for both array-backed and file-mapped snapshots
+            values = memoryview(getattr(graph, array_name))
+            layout.append((array_name, values.format, size, values.nbytes))
+            size += (values.nbytes + 7) // 8 * 8
+        self._memory = shared_memory.SharedMemory(create=True, size=max(size, 8))
+        for array_name, _, offset, nbytes in layout:
+            self._memory.buf[offset:offset + nbytes] = memoryview(getattr(graph, array_name)).cast('B')
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_attach,
+            initargs=(self._memory.name, layout, list(graph.codes)),
+        )
+
+        # Leases taken with acquire(), and whether retire() was called
+        self._users = 0
+        self._retired = False
+        self._lease_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory block.
+        """
+        self._executor.shutdown()
+        self._memory.close()
+        self._memory.unlink()
+
+    def acquire(self) -> 'RoutePool':
+        """
+        Take a lease on the pool; it is not closed before release() is called.
+        """
+        with self._lease_lock:
+            self._users += 1
+        return self
+
+    def release(self):
+        """
+        Return a lease taken with acquire(), closing a retired pool once unused.
+        """
+        with self._lease_lock:
+            self._users -= 1
+            if self._retired and self._users == 0:
+                self.close()
+
+    def retire(self):
+        """
+        Close the pool now if nobody holds a lease, else when the last one is released.
+        """
+        with self._lease_lock:
+            self._retired = True
+            if self._users == 0:
+                self.close()
+
+    def solve(self, tasks: list) -> list:
+        """
+        Parallel counterpart of routes.search.solve_tasks() for this pool's graph.
+
+        Tasks are sent to the workers in chunks of ORIGINS_PER_TASK origins;
+        the answers come back in task order.
+        """
+        chunks = [tasks[i:i + ORIGINS_PER_TASK] for i in range(0, len(tasks), ORIGINS_PER_TASK)]
+        answers = []
+        for chunk in self._executor.map(_solve, chunks):
+            answers.extend(chunk)
+        return answers
+
+
+@contextlib.contextmanager
+def shared_route_pool():
+    """
+    Lease the process-wide RoutePool for the current route graph for the
+    duration of the block; yields None if settings.ROUTES_BATCH_WORKERS is
+    below 2.
+
+    The pool is replaced when the graph version changes. The replaced pool
+    is retired rather than closed, so threads still searching on it finish
+    before its workers stop.
+    """
+    global _pool
+    workers = getattr(settings, 'ROUTES_BATCH_WORKERS', 0)
+    if workers < 2:
+        yield None
+        return
+    graph = get_route_graph()
+    with _pool_lock:
+        if _pool is None or _pool.graph is not graph:
+            if _pool is not None:
+                _pool.retire()
+            _pool = RoutePool(graph, workers)
+        pool = _pool.acquire()
+    try:
+        yield pool
+    finally:
+        pool.release()
+
+
+@atexit.register
+def _retire_shared_pool():
+    """
+    Stop the shared pool's workers and free its memory block at exit.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.retire()
+            _pool = None
@@ -0,0 +1,176 @@
+"""
+Opt-in profiling of single route queries.
+
+profile_query() runs find_shortest_route_between() or find_nth_node() once
+inside routes.metrics.measure() and reports what the query cost: its SQL
+statements, the time of every phase recorded with timed() (graph build,
+index loads, result cache, search, traversal) and the search counters of
+routes.search.SEARCH_STATS, including the stale heap entries that the
+'d != dist.get(node)' check pops and skips. Outside a profile the searches
+only pay for a few additions per run.
+
+By default the result cache is bypassed so the search itself runs. The
+query can also run under cProfile, writing a .prof file for pstats or
+snakeviz, or under a tracer writing collapsed stacks ("a;b;c microseconds"
+per line), the input of flamegraph.pl and speedscope.
+"""
+import cProfile
+import contextlib
+import sys
+import time
+
+from . import result_cache
+from .graph import reset_route_graph
+from .metrics import measure
+from .utils import find_nth_node, find_shortest_route_between
+
+
+QUERIES = {
+    'shortest': find_shortest_route_between,
+    'nth': find_nth_node,
+}
+
+PROFILERS = ('cprofile', 'collapsed')
+
+# Counters recorded by the searches (see routes.utils._count_search)
+SEARCH_COUNTERS = ('settled', 'heap_pops', 'heap_pushes', 'stale_pops', 'relaxations')
+
+
+class StackTracer:
+    """
+    Deterministic profiler collecting the self time of every call stack.
+
+    Installed with sys.setprofile(), so it sees Python and C calls of the
+    current thread only, and slows them down considerably; compare stacks
+    with each other rather than with unprofiled timings.
+
+    Attributes:
+        totals: dict of 'outer;...;inner' frame names -> self time in nanoseconds
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._stack = []  # [path, started, time spent in callees] per active call
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter_ns()
+        if event in ('call', 'c_call'):
+            name = _c_function_name(arg) if event == 'c_call' else _frame_name(frame)
+            path = f'{self._stack[-1][0]};{name}' if self._stack else name
+            self._stack.append([path, now, 0])
+        elif event in ('return', 'c_return', 'c_exception') and self._stack:
+            path, started, callees = self._stack.pop()
+            elapsed = now - started
+            self.totals[path] = self.totals.get(path, 0) + elapsed - callees
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def write(self, path: str):
+        """
+        Write the collected stacks in the collapsed format, in microseconds.
+        """
+        with open(path, 'w') as output:
+            for stack, nanoseconds in sorted(self.totals.items()):
+                if nanoseconds >= 1000:
+                    output.write(f'{stack} {nanoseconds // 1000}\n')
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _c_function_name(function) -> str:
+    module = getattr(function, '__module__', None) or 'builtins'
+    return f"{module}.{getattr(function, '__qualname__', repr(function))}"
+
+
+@contextlib.contextmanager
+def _profiler(kind: str, output: str):
+    """
+    Run the enclosed code under the profiler 'kind' and write its output to 'output'.
+    """
+    if kind is None:
+        yield
+        return
+    if kind == 'cprofile':
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(output)
+        return
+    tracer = StackTracer()
+    previous = sys.getprofile()
+    sys.setprofile(tracer)
+    try:
+        yield
+    finally:
+        sys.setprofile(previous)
+        tracer.write(output)
+
+
+def _describe(kind: str, result):
+    """
+    JSON-friendly summary of a query answer.
+    """
+    if result is None:
+        return None
+    if kind == 'nth':
+        return {'code': result.code, 'name': result.name}
+    return {'distance': result['distance'], 'path': result['path']}
+
+
+def profile_query(kind: str, *args, use_cache: bool = False, cold: bool = False,
+                  profiler: str = None, output: str = None, **kwargs) -> dict:
+    """
+    Run one query and report where its time went.
+
+    Args:
+        kind: str - 'shortest' (find_shortest_route_between) or 'nth' (find_nth_node)
+        args, kwargs: arguments of the query function
+        use_cache: bool - let the result cache answer instead of bypassing it
+        cold: bool - rebuild the route graph snapshot first, so the report
+            includes its construction (and the index loads it triggers)
+        profiler: str - None, 'cprofile' or 'collapsed' (see PROFILERS)
+        output: str - file the profiler writes to; required with 'profiler'
+
+    Returns:
+        dict with keys:
+            'query': kind, 'args': the positional arguments,
+            'result': summary of the answer, or None,
+            'total_ms': wall time of the query,
+            'db_queries' / 'db_ms': SQL statements run and their time,
+            'phases': timing name -> milliseconds (phases nest, so they
+                overlap: a find_* function includes the search it runs),
+            'search': SEARCH_COUNTERS -> value (empty if no search ran),
+            'counters': the other counters, such as result cache misses,
+            'profile': the profiler output file, or None.
+    """
+    if kind not in QUERIES:
+        raise ValueError(f"Unknown query: {kind!r}")
+    if profiler is not None and (profiler not in PROFILERS or not output):
+        raise ValueError(f"Profiler must be one of {', '.join(PROFILERS)}, with an output file")
+    if cold:
+        reset_route_graph()
+
+    caching = contextlib.nullcontext() if use_cache else result_cache.bypass()
+    with caching, measure() as metrics, _profiler(profiler, output):
+        began = time.perf_counter()
+        result = QUERIES[kind](*args, **kwargs)
+        total = time.perf_counter() - began
+
+    return {
+        'query': kind,
+        'args': list(args),
+        'result': _describe(kind, result),
+        'total_ms': round(total * 1000, 3),
+        'db_queries': metrics.queries,
+        'db_ms': round(metrics.db_seconds * 1000, 3),
+        'phases': {name: round(seconds * 1000, 3) for name, seconds in metrics.timings.items()},
+        'search': {name: value for name, value in metrics.counters.items() if name in SEARCH_COUNTERS},
+        'counters': {name: value for name, value in metrics.counters.items() if name not in SEARCH_COUNTERS},
+        'profile': output if profiler else None,
+    }
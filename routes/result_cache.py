@@ -0,0 +1,175 @@
+"""
+Cache of shortest-route and nth-node answers.
+
+Answers are stored in the Django cache named by settings.ROUTES_RESULT_CACHE
+(an alias in settings.CACHES; empty disables caching), so any backend
+works: the default local-memory cache evicts least recently used entries
+beyond MAX_ENTRIES and every backend expires entries after its TIMEOUT.
+
+Keys combine the query type, its arguments and the network stamp the
+answer was computed at (see routes.graph). Every airport or route write
+replaces the stamp, so it moves all queries to new keys (the old entries
+simply age out), and processes sharing a file-based or remote cache agree
+on which answers are current. The stamp is a plain integer, so building a
+key never hashes the network, not even on the event loop.
+
+Only identifiers are cached (airport and route primary keys, codes and
+distances); callers fetch fresh Airport instances for them, or describe
+route legs from the graph snapshot the key was made for.
+
+Code running inside bypass() neither reads nor fills the cache, so a query
+profiled there (see routes.profiling) really runs its search.
+"""
+from contextlib import contextmanager
+import contextvars
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import count, registry, timed
+
+
+# Marks a cached "no answer", which the cache itself would report as a miss
+NO_RESULT = 'none'
+
+_MISSING = object()
+
+# True inside bypass()
+_bypassed = contextvars.ContextVar('routes_result_cache_bypassed', default=False)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stores': 0}
+
+
+class CountingLocMemCache(LocMemCache):
+    """
+    Local-memory cache backend that counts the entries it evicts.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self.evictions = 0
+
+    def _cull(self):
+        # Called with the backend lock held
+        before = len(self._cache)
+        super()._cull()
+        self.evictions += before - len(self._cache)
+
+
+def get_cache():
+    """
+    Return the configured result cache, or None if caching is disabled.
+    """
+    alias = getattr(settings, 'ROUTES_RESULT_CACHE', '')
+    return caches[alias] if alias and not _bypassed.get() else None
+
+
+@contextmanager
+def bypass():
+    """
+    Disable the result cache for the code inside the block.
+    """
+    token = _bypassed.set(True)
+    try:
+        yield
+    finally:
+        _bypassed.reset(token)
+
+
+def make_key(kind: str, stamp: int, args: tuple) -> str:
+    """
+    Build the cache key for query 'kind' with 'args' at network stamp 'stamp'.
+    """
+    digest = hashlib.blake2b(repr(args).encode(), digest_size=12).hexdigest()
+    return f'routes:{kind}:{stamp:016x}:{digest}'
+
+
+def _record(event: str):
+    with _stats_lock:
+        _stats[event] += 1
+    count(f'result_cache_{event}')
+
+
+def lookup(kind: str, stamp: int, args: tuple):
+    """
+    Look up a cached answer.
+
+    Returns:
+        (True, value) on a hit, where 'value' is None for a cached "no
+        answer", or (False, None) on a miss or when caching is disabled.
+    """
+    cache = get_cache()
+    if cache is None:
+        return False, None
+    with timed('result_cache'):
+        value = cache.get(make_key(kind, stamp, args), _MISSING)
+    return _hit_or_miss(value)
+
+
+async def alookup(kind: str, stamp: int, args: tuple):
+    """
+    Async counterpart of lookup().
+    """
+    cache = get_cache()
+    if cache is None:
+        return False, None
+    value = await cache.aget(make_key(kind, stamp, args), _MISSING)
+    return _hit_or_miss(value)
+
+
+def _hit_or_miss(value):
+    if value is _MISSING:
+        _record('misses')
+        return False, None
+    _record('hits')
+    return True, None if value == NO_RESULT else value
+
+
+def store(kind: str, stamp: int, args: tuple, value):
+    """
+    Cache 'value' (None meaning "no answer") for the query.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    with timed('result_cache'):
+        cache.set(make_key(kind, stamp, args), NO_RESULT if value is None else value)
+    _record('stores')
+
+
+async def astore(kind: str, stamp: int, args: tuple, value):
+    """
+    Async counterpart of store().
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    await cache.aset(make_key(kind, stamp, args), NO_RESULT if value is None else value)
+    _record('stores')
+
+
+def stats() -> dict:
+    """
+    Return this process's hit, miss and store counts, and the evictions of
+    the cache backend when it counts them (see CountingLocMemCache).
+    """
+    with _stats_lock:
+        result = dict(_stats)
+    cache = get_cache()
+    result['evictions'] = getattr(cache, 'evictions', None)
+    return result
+
+
+def _collect():
+    return [
+        ('aeroroute_result_cache_events_total', (('event', event),), value)
+        for event, value in stats().items()
+        if value is not None
+    ]
+
+
+registry.add_collector(_collect)
@@ -0,0 +1,145 @@
+"""
+Database router sending read queries to replica databases.
+
+Every alias in settings.DATABASES other than the primary ('default') is a
+read replica holding the same data (see DATABASES in
+flight_routes/settings.py). Only models of the routes app are routed:
+writes always go to the primary; reads are spread over the replicas at
+random, so the lookups behind the find_* functions do not compete with
+writers for the primary. Every other app (sessions, auth, admin, ...) is
+left to Django's default, the primary, so a login is never checked
+against a replica that has not received it yet. Reads of routes models
+stay on the primary:
+
+    - inside a transaction on the primary, so a transaction sees its own
+      writes (load_routes, graph snapshot loads)
+    - for the rest of the request (or command) after a write, so a client
+      reads what it just wrote even if a replica lags behind
+    - inside use_primary(), for reads that must match the primary exactly
+    - when no replica is reachable
+
+Inside read_from(alias) the other reads all go to 'alias', so an answer
+built from several queries, and the ETag describing it, come from one
+database (see routes.api).
+
+A replica that fails to connect is skipped for
+settings.ROUTES_REPLICA_RETRY_SECONDS before it is tried again. Persistent
+connections (CONN_MAX_AGE) are validated by Django itself before reuse
+when CONN_HEALTH_CHECKS is set.
+"""
+from contextlib import contextmanager
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger(__name__)
+
+# The only app whose models are routed to replicas
+ROUTED_APP = 'routes'
+
+# True once the current request or command wrote routes models to the primary
+_pinned = contextvars.ContextVar('routes_primary_pinned', default=False)
+
+# Database every read is held to inside read_from(), or None
+_read_alias = contextvars.ContextVar('routes_read_alias', default=None)
+
+# Replica alias -> time.monotonic() until which it is skipped
+_down = {}
+
+
+def replica_aliases() -> list:
+    """
+    Aliases of the configured read replicas.
+    """
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+@contextmanager
+def use_primary():
+    """
+    Send every read inside the block to the primary database.
+    """
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+@contextmanager
+def read_from(alias: str):
+    """
+    Send every read inside the block to database 'alias' (unless it must
+    stay on the primary, see above).
+    """
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def unpin():
+    """
+    Let reads go to replicas again; called when a new request starts.
+    """
+    _pinned.set(False)
+
+
+def _available(alias: str) -> bool:
+    """
+    True if replica 'alias' is not known to be down; opens its connection
+    if needed so an unreachable replica is noticed before a query is sent.
+    """
+    down_until = _down.get(alias)
+    if down_until is not None:
+        if time.monotonic() < down_until:
+            return False
+        del _down[alias]
+    connection = connections[alias]
+    if connection.connection is None:
+        try:
+            connection.ensure_connection()
+        except DatabaseError as exc:
+            retry = getattr(settings, 'ROUTES_REPLICA_RETRY_SECONDS', 30)
+            _down[alias] = time.monotonic() + retry
+            logger.warning("Read replica %r is unavailable (%s); skipping it for %ss", alias, exc, retry)
+            return False
+    return True
+
+
+class ReplicaRouter:
+    """
+    Route reads to a healthy replica and writes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != ROUTED_APP:
+            return None
+        if _pinned.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if _read_alias.get() is not None:
+            return _read_alias.get()
+        replicas = [alias for alias in replica_aliases() if _available(alias)]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != ROUTED_APP:
+            return None
+        _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same routes data; other apps are left to Django
+        if obj1._meta.app_label == ROUTED_APP and obj2._meta.app_label == ROUTED_APP:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema from the primary
+        return db == DEFAULT_DB_ALIAS
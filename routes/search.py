@@ -0,0 +1,552 @@
+"""
+Shortest-path searches over a RouteGraph snapshot.
+
+The functions here work on dense airport indices and return edge indices
+into the snapshot's CSR arrays; routes.utils turns them into airport codes
+and RouteLeg records.
+"""
+import heapq
+
+
+INF = float('inf')
+
+ALGORITHMS = ('dijkstra', 'bidirectional')
+
+# Counters the searches add to their optional 'stats' dict:
+#   settled     - airports (or hop labels) settled
+#   pops        - heap entries popped, stale ones included (stale = pops - settled)
+#   pushes      - heap entries pushed, the initial ones included
+#   relaxations - routes examined out of settled airports
+SEARCH_STATS = ('settled', 'pops', 'pushes', 'relaxations')
+
+
+def tally(stats: dict, settled: int, pops: int, pushes: int, relaxations: int):
+    """
+    Add one search's counters (see SEARCH_STATS) to 'stats', if given.
+    """
+    if stats is not None:
+        for name, value in zip(SEARCH_STATS, (settled, pops, pushes, relaxations)):
+            stats[name] = stats.get(name, 0) + value
+
+
+def edge_path(graph, prev: dict, start: int, target: int) -> list:
+    """
+    Walk predecessor edges back from 'target' to 'start'.
+
+    Args:
+        graph: RouteGraph the edges index into
+        prev: dict - node index -> edge index used to reach it
+        start: int - source node index
+        target: int - destination node index
+
+    Returns:
+        list of edge indices from start to target.
+    """
+    edges = []
+    cur = target
+    while cur != start:
+        e = prev[cur]
+        edges.append(e)
+        cur = graph.source_of(e)
+    edges.reverse()
+    return edges
+
+
+def dijkstra(graph, start: int, target: int, stats: dict = None):
+    """
+    Point-to-point Dijkstra that stops once 'target' is settled.
+
+    Args:
+        stats: optional dict the search counters are added to (see SEARCH_STATS)
+
+    Returns:
+        (distance, edges) tuple, or None if 'target' is unreachable.
+    """
+    # Local references to the CSR arrays keep the inner loop cheap
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+    dist = {start: 0}  # shortest known distance to each node
+    prev = {}          # edge index used to reach each node
+    heap = [(0, start)]  # min-heap priority queue as (distance, node_index)
+    settled = pops = relaxations = 0
+    found = None
+
+    while heap:
+        d, node = heapq.heappop(heap)
+        pops += 1
+        if d != dist.get(node, INF):
+            # Skip outdated distance values in heap
+            continue
+        settled += 1
+        if node == target:
+            # Target reached, terminate early
+            found = d, edge_path(graph, prev, start, target)
+            break
+        relaxations += offsets[node + 1] - offsets[node]
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            nd = d + weights[e]
+            if nd < dist.get(neighbor, INF):
+                dist[neighbor] = nd
+                prev[neighbor] = e
+                heapq.heappush(heap, (nd, neighbor))
+
+    # Every entry pushed was either popped or is still queued
+    tally(stats, settled, pops, pops + len(heap), relaxations)
+    return found
+
+
+def bidirectional_dijkstra(graph, start: int, target: int, stats: dict = None):
+    """
+    Point-to-point Dijkstra searching forward from 'start' and backward from
+    'target' (over the reverse adjacency) at the same time.
+
+    The side with the smaller tentative distance is expanded next. Every
+    relaxation that reaches a node already labelled by the other side yields
+    a candidate path; the search stops once the two heap minima together are
+    no smaller than the best candidate, which is then optimal.
+
+    Args:
+        stats: optional dict the search counters of both sides are added to
+            (see SEARCH_STATS)
+
+    Returns:
+        (distance, edges) tuple, or None if 'target' is unreachable.
+    """
+    if start == target:
+        tally(stats, 1, 1, 1, 0)
+        return 0, []
+
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    r_offsets, r_sources, r_weights, r_edges = graph.reverse()
+
+    dist_f, dist_b = {start: 0}, {target: 0}
+    prev_f, prev_b = {}, {}  # forward edge index used to reach each node
+    heap_f, heap_b = [(0, start)], [(0, target)]
+    best = INF
+    meet = None
+    settled = pops = relaxations = 0
+
+    while heap_f and heap_b:
+        if heap_f[0][0] + heap_b[0][0] >= best:
+            # No unexplored path can beat the best meeting point
+            break
+        if heap_f[0][0] <= heap_b[0][0]:
+            d, node = heapq.heappop(heap_f)
+            pops += 1
+            if d != dist_f[node]:
+                continue
+            settled += 1
+            relaxations += offsets[node + 1] - offsets[node]
+            for e in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[e]
+                nd = d + weights[e]
+                if nd < dist_f.get(neighbor, INF):
+                    dist_f[neighbor] = nd
+                    prev_f[neighbor] = e
+                    heapq.heappush(heap_f, (nd, neighbor))
+                    other = dist_b.get(neighbor)
+                    if other is not None and nd + other < best:
+                        best, meet = nd + other, neighbor
+        else:
+            d, node = heapq.heappop(heap_b)
+            pops += 1
+            if d != dist_b[node]:
+                continue
+            settled += 1
+            relaxations += r_offsets[node + 1] - r_offsets[node]
+            for i in range(r_offsets[node], r_offsets[node + 1]):
+                neighbor = r_sources[i]
+                nd = d + r_weights[i]
+                if nd < dist_b.get(neighbor, INF):
+                    dist_b[neighbor] = nd
+                    prev_b[neighbor] = r_edges[i]
+                    heapq.heappush(heap_b, (nd, neighbor))
+                    other = dist_f.get(neighbor)
+                    if other is not None and nd + other < best:
+                        best, meet = nd + other, neighbor
+
+    tally(stats, settled, pops, pops + len(heap_f) + len(heap_b), relaxations)
+    if meet is None:
+        return None
+
+    # Forward half from the start to the meeting node, then follow the
+    # backward search's edges on to the target
+    edges = edge_path(graph, prev_f, start, meet)
+    node = meet
+    while node != target:
+        e = prev_b[node]
+        edges.append(e)
+        node = targets[e]
+    return best, edges
+
+
+def single_source(offsets, targets, weights, start: int):
+    """
+    Full Dijkstra from 'start' over CSR arrays.
+
+    Works for the forward arrays of a RouteGraph as well as for the reverse
+    arrays returned by RouteGraph.reverse().
+
+    Returns:
+        (dist, prev, order): distance and predecessor entry index per
+        reached node, and the nodes in the order they were settled.
+    """
+    dist = {start: 0}
+    prev = {}
+    order = []
+    heap = [(0, start)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d != dist.get(node, INF):
+            continue
+        order.append(node)
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            nd = d + weights[e]
+            if nd < dist.get(neighbor, INF):
+                dist[neighbor] = nd
+                prev[neighbor] = e
+                heapq.heappush(heap, (nd, neighbor))
+    return dist, prev, order
+
+
+def multi_target(graph, start: int, wanted: set):
+    """
+    Single-source Dijkstra that stops once every node in 'wanted' is settled.
+
+    Returns:
+        (dist, prev): distances and predecessor edges; the entries for
+        reachable 'wanted' nodes are final.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+    dist = {start: 0}
+    prev = {}
+    heap = [(0, start)]
+    remaining = set(wanted)
+    while heap and remaining:
+        d, node = heapq.heappop(heap)
+        if d != dist.get(node, INF):
+            continue
+        remaining.discard(node)
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            nd = d + weights[e]
+            if nd < dist.get(neighbor, INF):
+                dist[neighbor] = nd
+                prev[neighbor] = e
+                heapq.heappush(heap, (nd, neighbor))
+    return dist, prev
+
+
+def solve_tasks(graph, tasks: list) -> list:
+    """
+    Answer grouped one-to-many queries with one multi_target() run per origin.
+
+    Args:
+        tasks: list of (origin, [target, ...]) dense index tuples
+
+    Returns:
+        list of (origin, [(target, distance, edges), ...]) with distance and
+        edges set to None for unreachable targets.
+    """
+    answers = []
+    for origin, wanted in tasks:
+        dist, prev = multi_target(graph, origin, set(wanted))
+        found = []
+        for target in wanted:
+            if target in dist:
+                found.append((target, dist[target], edge_path(graph, prev, origin, target)))
+            else:
+                found.append((target, None, None))
+        answers.append((origin, found))
+    return answers
+
+
+def astar(graph, start: int, target: int, heuristic):
+    """
+    A* search guided by an admissible, consistent 'heuristic'.
+
+    Args:
+        heuristic: callable(node_index) -> lower bound on the distance to
+            target, or INF if the target is known to be unreachable
+
+    Returns:
+        (distance, edges) tuple, or None if 'target' is unreachable.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+    dist = {start: 0}
+    prev = {}
+    estimate = {start: heuristic(start)}
+    heap = [(estimate[start], start)]
+
+    while heap:
+        f, node = heapq.heappop(heap)
+        d = dist[node]
+        if f != d + estimate[node]:
+            continue
+        if node == target:
+            return d, edge_path(graph, prev, start, target)
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            nd = d + weights[e]
+            if nd < dist.get(neighbor, INF):
+                dist[neighbor] = nd
+                prev[neighbor] = e
+                h = estimate.get(neighbor)
+                if h is None:
+                    h = estimate[neighbor] = heuristic(neighbor)
+                if h != INF:
+                    # An infinite bound means the target is unreachable from here
+                    heapq.heappush(heap, (nd + h, neighbor))
+    return None
+
+
+def constrained_search(graph, start: int, target: int, max_hops: int = None, avoid=frozenset(),
+                       max_leg: int = None, stats: dict = None):
+    """
+    Shortest path from 'start' to 'target' under route constraints.
+
+    Routes longer than 'max_leg' and routes into airports in 'avoid' are
+    skipped while edges are expanded, so they are never queued.
+
+    With 'max_hops', a breadth-first pass backwards from 'target' first
+    finds the airports that can reach it within 'max_hops' legs under the
+    same constraints; no other airport is ever queued. Dijkstra restricted
+    to that region answers the query whenever its shortest path happens to
+    be short enough. Only when the hop limit actually binds does a
+    label-setting search over (airport, hops) labels run: labels are
+    settled in order of distance, a label is dropped when the same airport
+    was already settled with no more hops, and labels that cannot reach the
+    target within the remaining hops are never created. Every constraint
+    therefore removes airports or routes from the search; none adds work
+    unless it changes the answer.
+
+    Args:
+        max_hops: int - most legs the path may use, or None for no limit
+        avoid: set of airport indices the path must not visit
+        max_leg: int - longest route duration allowed, or None for no limit
+        stats: optional dict the search counters are added to (see
+            SEARCH_STATS); hop labels count as settled airports
+
+    Returns:
+        (distance, edges) tuple, or None if no path meets the constraints.
+    """
+    if max_leg is None:
+        max_leg = INF
+    if max_hops is not None and max_hops >= graph.num_airports - 1:
+        # No loopless path is longer, so the limit cannot bind
+        max_hops = None
+    found = None
+    if start not in avoid and target not in avoid:
+        to_go = None if max_hops is None else _hops_to_target(graph, target, max_hops, avoid, max_leg)
+        if to_go is None or start in to_go:
+            found = _pruned_dijkstra(graph, start, target, avoid, max_leg, to_go, stats)
+            if found is not None and max_hops is not None and len(found[1]) > max_hops:
+                found = _hop_labels(graph, start, target, max_hops, max_leg, to_go, stats)
+    return found
+
+
+def _pruned_dijkstra(graph, start: int, target: int, avoid, max_leg, region: dict = None, stats: dict = None):
+    """
+    Dijkstra skipping routes over 'max_leg', airports in 'avoid' and, when
+    'region' is given, airports not in it.
+
+    Returns:
+        (distance, edges) tuple, or None; counters are added to 'stats'.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    dist = {start: 0}
+    prev = {}
+    heap = [(0, start)]
+    settled = pops = relaxations = 0
+    found = None
+    while heap:
+        d, node = heapq.heappop(heap)
+        pops += 1
+        if d != dist.get(node, INF):
+            continue
+        settled += 1
+        if node == target:
+            found = d, edge_path(graph, prev, start, target)
+            break
+        relaxations += offsets[node + 1] - offsets[node]
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            if weights[e] > max_leg or neighbor in avoid or (region is not None and neighbor not in region):
+                continue
+            nd = d + weights[e]
+            if nd < dist.get(neighbor, INF):
+                dist[neighbor] = nd
+                prev[neighbor] = e
+                heapq.heappush(heap, (nd, neighbor))
+    tally(stats, settled, pops, pops + len(heap), relaxations)
+    return found
+
+
+def _hop_labels(graph, start: int, target: int, max_hops: int, max_leg, to_go: dict, stats: dict = None):
+    """
+    Hop-bounded label-setting search (see constrained_search()). Airports
+    outside 'to_go' (fewest legs to the target) are never reached.
+
+    Returns:
+        (distance, edges) tuple, or None; counters are added to 'stats'.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    fewest = {}   # airport -> fewest hops among its settled labels
+    labels = []   # settled labels as (edge, parent label)
+    heap = [(0, 0, start, -1, -1)]
+    settled = pops = relaxations = 0
+    found = None
+    while heap:
+        d, hops, node, edge, parent = heapq.heappop(heap)
+        pops += 1
+        if hops >= fewest.get(node, INF):
+            # Dominated by a label with no more distance and no more hops
+            continue
+        settled += 1
+        fewest[node] = hops
+        label = len(labels)
+        labels.append((edge, parent))
+        if node == target:
+            edges = []
+            while labels[label][0] != -1:
+                edges.append(labels[label][0])
+                label = labels[label][1]
+            edges.reverse()
+            found = d, edges
+            break
+        relaxations += offsets[node + 1] - offsets[node]
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            if weights[e] > max_leg or hops + 1 + to_go.get(neighbor, INF) > max_hops:
+                continue
+            if hops + 1 < fewest.get(neighbor, INF):
+                heapq.heappush(heap, (d + weights[e], hops + 1, neighbor, e, label))
+    tally(stats, settled, pops, pops + len(heap), relaxations)
+    return found
+
+
+def _hops_to_target(graph, target: int, max_hops: int, avoid, max_leg) -> dict:
+    """
+    Fewest legs from each airport to 'target' (up to 'max_hops'), using only
+    routes allowed by 'avoid' and 'max_leg'.
+    """
+    r_offsets, r_sources, r_weights, _ = graph.reverse()
+    to_go = {target: 0}
+    frontier = [target]
+    for hops in range(1, max_hops + 1):
+        following = []
+        for node in frontier:
+            for i in range(r_offsets[node], r_offsets[node + 1]):
+                source = r_sources[i]
+                if source not in to_go and source not in avoid and r_weights[i] <= max_leg:
+                    to_go[source] = hops
+                    following.append(source)
+        if not following:
+            break
+        frontier = following
+    return to_go
+
+
+def k_shortest_paths(graph, start: int, target: int, k: int, stats: dict = None) -> list:
+    """
+    Yen's algorithm: the 'k' shortest loopless paths from 'start' to 'target'.
+
+    One reverse Dijkstra from 'target' is shared by every spur search: it
+    gives the first path directly and, as exact distances to the target in
+    the unrestricted network, a consistent A* heuristic for the spur
+    searches, which then only explore around the edges and airports they
+    must avoid.
+
+    Args:
+        stats: optional dict; 'spurs' and 'settled' are set to the number of
+            spur searches run and of airports they settled
+
+    Returns:
+        list of up to k (distance, edges) tuples, shortest first.
+    """
+    if k < 1:
+        return []
+    targets, weights = graph.targets, graph.weights
+    r_offsets, r_sources, r_weights, r_edges = graph.reverse()
+    to_target, r_prev, _ = single_source(r_offsets, r_sources, r_weights, target)
+    if start not in to_target:
+        return []
+
+    # First path: follow the reverse tree from the start
+    edges = []
+    node = start
+    while node != target:
+        e = r_edges[r_prev[node]]
+        edges.append(e)
+        node = targets[e]
+    found = [(to_target[start], edges)]
+
+    candidates = []  # heap of (distance, edge tuple)
+    seen = {tuple(edges)}
+    spurs = settled = 0
+    while len(found) < k:
+        _, last = found[-1]
+        nodes = [start] + [targets[e] for e in last]
+        root_distance = 0
+        for i in range(len(last)):
+            root = last[:i]
+            # Edges leaving the spur node on earlier paths sharing this root
+            blocked_edges = {edges[i] for _, edges in found if len(edges) > i and edges[:i] == root}
+            spur, spur_settled = _spur_path(graph, nodes[i], target, to_target, set(nodes[:i]), blocked_edges)
+            spurs += 1
+            settled += spur_settled
+            if spur is not None:
+                path = tuple(root) + tuple(spur[1])
+                if path not in seen:
+                    seen.add(path)
+                    heapq.heappush(candidates, (root_distance + spur[0], path))
+            root_distance += weights[last[i]]
+        if not candidates:
+            break
+        distance, path = heapq.heappop(candidates)
+        found.append((distance, list(path)))
+
+    if stats is not None:
+        stats['spurs'] = spurs
+        stats['settled'] = settled
+    return found
+
+
+def _spur_path(graph, start: int, target: int, to_target: dict, blocked_nodes: set, blocked_edges: set):
+    """
+    A* from 'start' to 'target' avoiding 'blocked_nodes' and 'blocked_edges',
+    guided by the unrestricted distances 'to_target'.
+
+    Returns:
+        (found, settled) where 'found' is (distance, edges) or None if
+        'target' cannot be reached, and 'settled' counts the airports settled.
+    """
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    if start not in to_target:
+        return None, 0
+    dist = {start: 0}
+    prev = {}
+    heap = [(to_target[start], start)]
+    settled = 0
+    while heap:
+        f, node = heapq.heappop(heap)
+        d = dist[node]
+        if f != d + to_target[node]:
+            continue
+        settled += 1
+        if node == target:
+            return (d, edge_path(graph, prev, start, target)), settled
+        for e in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[e]
+            if e in blocked_edges or neighbor in blocked_nodes or neighbor not in to_target:
+                continue
+            nd = d + weights[e]
+            if nd < dist.get(neighbor, INF):
+                dist[neighbor] = nd
+                prev[neighbor] = e
+                heapq.heappush(heap, (nd + to_target[neighbor], neighbor))
+    return None, settled
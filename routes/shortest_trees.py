@@ -0,0 +1,523 @@
+"""
+Shortest-path trees for popular origins, repaired incrementally.
+
+find_shortest_route_between() counts queries per origin; once an origin has
+been asked for settings.ROUTES_SHORTEST_TREE_MIN_QUERIES times, a full
+single-source tree is built for it and later queries from it are answered
+by walking the tree. At most settings.ROUTES_SHORTEST_TREES trees are kept;
+the least-demanded one is replaced when a more popular origin appears.
+
+Every committed route write of this process is applied to the trees as soon
+as it commits (see routes.signals), without waiting for the next graph
+snapshot: the trees keep the snapshot they were built on plus a NetworkEdits
+overlay of the routes written since, and repair themselves over that in the
+style of Ramalingam and Reps' dynamic shortest-path algorithm:
+
+    - a new route or a shorter duration can only shorten distances: the
+      head of the edge is relaxed and the improvement is pushed outwards
+      with a Dijkstra pass over the improved airports only (improve());
+    - a deleted route, a longer duration or a moved route only affects the
+      airports whose tree path used it: that subtree is cut off, each of
+      its airports is seeded from its best incoming route outside the
+      subtree, and a Dijkstra pass over the subtree settles it (worsen()).
+
+When the next snapshot is loaded for a query it already contains those
+writes, so the trees are simply rebased onto it. Anything the trees cannot
+follow (airport deletions, bulk loads, writes by other processes) drops
+them, and they are rebuilt on demand.
+
+Trees are stored by dense airport index, which stays stable as airports
+are added because new airports sort last.
+"""
+from array import array
+from collections import Counter
+import heapq
+import itertools
+import threading
+
+from django.conf import settings
+
+from .distance_index import UNREACHABLE
+from .metrics import count, timed
+from .search import single_source
+
+
+# Demand counts are halved after this many recorded queries, so popularity follows recent traffic
+DEMAND_WINDOW = 10000
+
+_lock = threading.Lock()
+_graph = None           # snapshot the trees were built on or rebased onto
+_edits = None           # NetworkEdits of _graph: routes written since it was loaded
+_version = None         # network stamp the trees are current for
+_trees = {}             # origin index -> ShortestPathTree
+_demand = Counter()     # origin index -> recent queries
+_recorded = 0
+
+
+class NetworkEdits:
+    """
+    The routes of a RouteGraph snapshot with later route writes laid over them.
+
+    Lets the trees follow writes before a new snapshot is loaded. Edits are
+    few (they are dropped when the next snapshot is loaded), so they are
+    kept in plain dicts next to the snapshot's arrays.
+
+    Attributes:
+        graph: RouteGraph the edits apply to
+        replaced: set of route ids of the snapshot that were deleted or rewritten
+        routes: dict of route id -> (from_index, to_index, duration) written since
+        new_airports: dict of airport id -> dense index of airports created since
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.replaced = set()
+        self.routes = {}
+        self.new_airports = {}
+        self._from = {}     # from_index -> route ids in self.routes
+        self._to = {}       # to_index -> route ids in self.routes
+        self._incoming = None
+
+    @property
+    def num_airports(self) -> int:
+        return self.graph.num_airports + len(self.new_airports)
+
+    def index_of_id(self, airport_id: int):
+        """
+        Return the dense index of an airport, created since the snapshot or not.
+        """
+        index = self.graph.index_of_id(airport_id)
+        return index if index is not None else self.new_airports.get(airport_id)
+
+    def add_airport(self, airport_id: int):
+        """
+        Give a created airport the next dense index; new airports sort last
+        because their primary keys are the highest.
+        """
+        if self.index_of_id(airport_id) is None:
+            self.new_airports[airport_id] = self.num_airports
+
+    def route(self, route_id: int, from_index: int):
+        """
+        Return the current (from_index, to_index, duration) of a route leaving
+        'from_index', or None if it does not exist.
+        """
+        if route_id in self.routes:
+            return self.routes[route_id]
+        if route_id in self.replaced or from_index >= self.graph.num_airports:
+            return None
+        graph = self.graph
+        for e in range(graph.offsets[from_index], graph.offsets[from_index + 1]):
+            if graph.route_ids[e] == route_id:
+                return from_index, graph.targets[e], graph.weights[e]
+        return None
+
+    def set_route(self, route_id: int, from_index: int, to_index: int, duration: int):
+        """
+        Record a created or rewritten route.
+        """
+        self.remove_route(route_id)
+        self.routes[route_id] = (from_index, to_index, duration)
+        self._from.setdefault(from_index, set()).add(route_id)
+        self._to.setdefault(to_index, set()).add(route_id)
+
+    def remove_route(self, route_id: int):
+        """
+        Record that a route no longer exists in its snapshot form.
+        """
+        self.replaced.add(route_id)
+        edge = self.routes.pop(route_id, None)
+        if edge is not None:
+            self._from[edge[0]].discard(route_id)
+            self._to[edge[1]].discard(route_id)
+
+    def out_edges(self, node: int):
+        """
+        Yield (to_index, duration, route_id) for the routes leaving 'node'.
+        """
+        graph, replaced = self.graph, self.replaced
+        if node < graph.num_airports:
+            for e in range(graph.offsets[node], graph.offsets[node + 1]):
+                if graph.route_ids[e] not in replaced:
+                    yield graph.targets[e], graph.weights[e], graph.route_ids[e]
+        for route_id in self._from.get(node, ()):
+            _, to_index, duration = self.routes[route_id]
+            yield to_index, duration, route_id
+
+    def in_edges(self, node: int):
+        """
+        Yield (from_index, duration, route_id) for the routes reaching 'node'.
+        """
+        graph, replaced = self.graph, self.replaced
+        if node < graph.num_airports:
+            incoming = self._incoming_index()
+            for e in incoming[node]:
+                if graph.route_ids[e] not in replaced:
+                    yield graph.source_of(e), graph.weights[e], graph.route_ids[e]
+        for route_id in self._to.get(node, ()):
+            from_index, _, duration = self.routes[route_id]
+            yield from_index, duration, route_id
+
+    def _incoming_index(self) -> list:
+        """
+        Edge indices of the snapshot grouped by target, built on first use.
+        """
+        if self._incoming is None:
+            incoming = [[] for _ in range(self.graph.num_airports)]
+            for e, target in enumerate(self.graph.targets):
+                incoming[target].append(e)
+            self._incoming = incoming
+        return self._incoming
+
+
+class ShortestPathTree:
+    """
+    Distances and shortest-path predecessors from one origin.
+
+    Attributes:
+        origin: int - dense index of the origin airport
+        dist: array - distance per airport, UNREACHABLE if not reached
+        pred: array - predecessor airport per airport, -1 if none
+        route: array - primary key of the route from the predecessor, -1 if none
+    """
+
+    __slots__ = ('origin', 'dist', 'pred', 'route')
+
+    def __init__(self, origin: int, dist, pred, route):
+        self.origin = origin
+        self.dist = dist
+        self.pred = pred
+        self.route = route
+
+    @classmethod
+    def build(cls, graph, origin: int) -> 'ShortestPathTree':
+        """
+        Compute the tree for 'origin' from scratch.
+        """
+        n = graph.num_airports
+        dist = array('q', [UNREACHABLE]) * n
+        pred = array('i', [-1]) * n
+        route = array('q', [-1]) * n
+        distances, prev, _ = single_source(graph.offsets, graph.targets, graph.weights, origin)
+        for node, d in distances.items():
+            dist[node] = d
+        for node, e in prev.items():
+            pred[node] = graph.source_of(e)
+            route[node] = graph.route_ids[e]
+        return cls(origin, dist, pred, route)
+
+    def grow(self, size: int):
+        """
+        Extend the arrays to 'size' airports (new airports start unreached).
+        """
+        missing = size - len(self.dist)
+        if missing > 0:
+            self.dist.extend(itertools.repeat(UNREACHABLE, missing))
+            self.pred.extend(itertools.repeat(-1, missing))
+            self.route.extend(itertools.repeat(-1, missing))
+
+    def improve(self, edits: NetworkEdits, changes: list) -> int:
+        """
+        Repair the tree after routes were added or shortened.
+
+        Args:
+            edits: NetworkEdits that already contain the changes
+            changes: list of (from_index, to_index, duration, route_id)
+
+        Returns:
+            number of airports whose distance improved.
+        """
+        dist, pred, route = self.dist, self.pred, self.route
+        self.grow(edits.num_airports)
+
+        # Relax the changed edges themselves, seeding the heap with improved heads
+        heap = []
+        for u, v, w, route_id in changes:
+            if dist[u] != UNREACHABLE and dist[u] + w < dist[v]:
+                dist[v] = dist[u] + w
+                pred[v] = u
+                route[v] = route_id
+                heap.append((dist[v], v))
+        heapq.heapify(heap)
+
+        # Push the improvements outwards; only improved airports are ever queued
+        improved = 0
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d != dist[node]:
+                continue
+            improved += 1
+            for neighbor, w, route_id in edits.out_edges(node):
+                nd = d + w
+                if nd < dist[neighbor]:
+                    dist[neighbor] = nd
+                    pred[neighbor] = node
+                    route[neighbor] = route_id
+                    heapq.heappush(heap, (nd, neighbor))
+        return improved
+
+    def worsen(self, edits: NetworkEdits, route_ids: set) -> int:
+        """
+        Repair the tree after routes were deleted, lengthened or moved.
+
+        Only airports whose tree path used one of the routes can get
+        further away. They are cut off, seeded with their best incoming
+        route from the rest of the tree, and settled again with a Dijkstra
+        pass restricted to them.
+
+        Args:
+            edits: NetworkEdits that already contain the changes
+            route_ids: primary keys of the changed routes
+
+        Returns:
+            number of airports whose distance was recomputed.
+        """
+        dist, pred, route = self.dist, self.pred, self.route
+        self.grow(edits.num_airports)
+        roots = [node for node, route_id in enumerate(route) if route_id in route_ids]
+        if not roots:
+            return 0
+
+        # The affected airports: the subtrees hanging off the changed routes
+        children = {}
+        for node, parent in enumerate(pred):
+            if parent >= 0:
+                children.setdefault(parent, []).append(node)
+        affected = set(roots)
+        stack = list(roots)
+        while stack:
+            for child in children.get(stack.pop(), ()):
+                if child not in affected:
+                    affected.add(child)
+                    stack.append(child)
+        for node in affected:
+            dist[node] = UNREACHABLE
+            pred[node] = -1
+            route[node] = -1
+
+        # Seed each affected airport from the unaffected part of the tree
+        heap = []
+        for node in affected:
+            for u, w, route_id in edits.in_edges(node):
+                if u not in affected and dist[u] != UNREACHABLE and dist[u] + w < dist[node]:
+                    dist[node] = dist[u] + w
+                    pred[node] = u
+                    route[node] = route_id
+            if dist[node] != UNREACHABLE:
+                heap.append((dist[node], node))
+        heapq.heapify(heap)
+
+        # Unaffected distances cannot shorten, so only affected airports are relaxed
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d != dist[node]:
+                continue
+            for neighbor, w, route_id in edits.out_edges(node):
+                if neighbor in affected and d + w < dist[neighbor]:
+                    dist[neighbor] = d + w
+                    pred[neighbor] = node
+                    route[neighbor] = route_id
+                    heapq.heappush(heap, (d + w, neighbor))
+        return len(affected)
+
+    def path(self, graph, target: int):
+        """
+        Return (distance, edges) from the origin to 'target' in 'graph', or None if unreachable.
+        """
+        if self.dist[target] == UNREACHABLE:
+            return None
+        offsets, route_ids = graph.offsets, graph.route_ids
+        edges = []
+        node = target
+        while node != self.origin:
+            source = self.pred[node]
+            # Route ids are stable across snapshots; find the route's edge in this one
+            for e in range(offsets[source], offsets[source + 1]):
+                if route_ids[e] == self.route[node]:
+                    edges.append(e)
+                    break
+            node = source
+        edges.reverse()
+        return self.dist[target], edges
+
+
+def _same_airports(old, new) -> bool:
+    """
+    True if 'new' lists the airports of 'old' in the same order (possibly followed by more).
+    """
+    n = old.num_airports
+    # memoryview compares array-backed and file-mapped snapshots alike
+    return new.num_airports >= n and memoryview(new.airport_ids)[:n] == memoryview(old.airport_ids)[:n]
+
+
+def _drop():
+    """
+    Forget every tree. Called with _lock held.
+    """
+    _trees.clear()
+
+
+def _sync(graph) -> bool:
+    """
+    Bring the trees up to 'graph' and tell whether they may answer on it.
+
+    A snapshot at the stamp the trees are current for already contains the
+    edits they followed, so they are rebased onto it. Any other new
+    snapshot means writes the trees did not see: they are dropped. The
+    previous snapshot, still used by a query that started before a write,
+    is not answered from. Called with _lock held.
+    """
+    global _graph, _edits, _version
+    if graph is _graph:
+        return graph.version == _version
+    if _graph is None or graph.version != _version or not _same_airports(_graph, graph) or any(
+            graph.index_of_id(airport_id) != index for airport_id, index in _edits.new_airports.items()):
+        _drop()
+    _graph, _edits, _version = graph, NetworkEdits(graph), graph.version
+    return True
+
+
+def _follows(previous: int, stamp: int) -> bool:
+    """
+    Move the trees to 'stamp' if they are current for 'previous', else drop
+    them (another process wrote in between). Called with _lock held.
+    """
+    global _version
+    if not _trees:
+        return False
+    if _version != previous:
+        _drop()
+        return False
+    _version = stamp
+    return True
+
+
+def _repair(worse: set = frozenset(), better: list = ()):
+    """
+    Apply changed routes to every tree. Called with _lock held.
+    """
+    with timed('shortest_tree_repair'):
+        for tree in _trees.values():
+            if worse:
+                count('tree_repaired_airports', tree.worsen(_edits, worse))
+            if better:
+                count('tree_repaired_airports', tree.improve(_edits, better))
+
+
+def route_changed(route_id: int, from_id: int, to_id: int, duration: int, created: bool,
+                  previous: int, stamp: int):
+    """
+    Apply a route created or updated by the write from stamp 'previous' to 'stamp'.
+    """
+    with _lock:
+        if not _follows(previous, stamp):
+            return
+        u, v = _edits.index_of_id(from_id), _edits.index_of_id(to_id)
+        old = None if created else _edits.route(route_id, u) if u is not None else None
+        if u is None or v is None or (not created and old is None):
+            _drop()
+            return
+        _edits.set_route(route_id, u, v, duration)
+        if old is None or (old[1] == v and duration < old[2]):
+            _repair(better=[(u, v, duration, route_id)])
+        elif old[1] != v or duration > old[2]:
+            _repair(worse={route_id}, better=[(u, v, duration, route_id)])
+        # Otherwise only the position changed; distances are unaffected
+
+
+def route_deleted(route_id: int, from_id: int, previous: int, stamp: int):
+    """
+    Apply a route deleted by the write from stamp 'previous' to 'stamp'.
+    """
+    with _lock:
+        if not _follows(previous, stamp):
+            return
+        u = _edits.index_of_id(from_id)
+        if u is None or _edits.route(route_id, u) is None:
+            _drop()
+            return
+        _edits.remove_route(route_id)
+        _repair(worse={route_id})
+
+
+def airport_changed(airport_id: int, created: bool, previous: int, stamp: int):
+    """
+    Record an airport created or renamed by the write from stamp 'previous'
+    to 'stamp' (distances are unaffected).
+    """
+    with _lock:
+        if _follows(previous, stamp) and created:
+            _edits.add_airport(airport_id)
+
+
+def airport_deleted(previous: int, stamp: int):
+    """
+    Drop the trees after an airport is deleted: the dense indices of the
+    airports after it shift.
+    """
+    with _lock:
+        if _follows(previous, stamp):
+            _drop()
+
+
+def _record_demand(origin: int) -> int:
+    """
+    Count one query from 'origin' and return its recent demand. Called with _lock held.
+    """
+    global _recorded
+    _recorded += 1
+    if _recorded >= DEMAND_WINDOW:
+        _recorded = 0
+        for key in list(_demand):
+            _demand[key] //= 2
+            if not _demand[key]:
+                del _demand[key]
+    _demand[origin] += 1
+    return _demand[origin]
+
+
+def _admit(origin: int, demand: int) -> bool:
+    """
+    Decide whether 'origin' deserves a tree, evicting a less popular one if
+    the store is full. Called with _lock held.
+    """
+    limit = getattr(settings, 'ROUTES_SHORTEST_TREES', 8)
+    if limit <= 0 or demand < getattr(settings, 'ROUTES_SHORTEST_TREE_MIN_QUERIES', 5):
+        return False
+    if len(_trees) < limit:
+        return True
+    coldest = min(_trees, key=lambda key: _demand.get(key, 0))
+    if _demand.get(coldest, 0) >= demand:
+        return False
+    del _trees[coldest]
+    return True
+
+
+def shortest_path(graph, start: int, target: int):
+    """
+    Answer a query from the stored tree of 'start', building the tree if
+    'start' has become popular.
+
+    Returns:
+        (True, found) when a tree answered, with 'found' being (distance,
+        edges) or None if 'target' is unreachable; (False, None) otherwise.
+    """
+    with _lock:
+        if not _sync(graph):
+            return False, None
+        tree = _trees.get(start)
+        if tree is not None:
+            _record_demand(start)
+            return True, tree.path(graph, target)
+        if not _admit(start, _record_demand(start)):
+            return False, None
+
+    # Build outside the lock so other queries are not held up
+    with timed('shortest_tree_build'):
+        tree = ShortestPathTree.build(graph, start)
+    found = tree.path(graph, target)
+    with _lock:
+        # A write applied meanwhile is missing from the new tree
+        if _graph is graph and _version == graph.version:
+            _trees[start] = tree
+    return True, found
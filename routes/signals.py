@@ -0,0 +1,114 @@
+from functools import partial
+
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import chain_index, jump_pointers, metrics, routers, shortest_trees
+from .graph import bump_graph_version, forget_stamp
+from .models import Airport, AirportRoute
+
+
+# Every write gives the network a new stamp inside the writing transaction
+# (see routes.graph), so other processes see the change exactly when it
+# commits. This process's own in-memory data is patched once the write is
+# committed, so no other thread can rebuild from (and then keep) data that
+# is later rolled back. Outside a transaction on_commit callbacks run
+# immediately.
+#
+# The chain index lives in the database, so it is updated right after the
+# stamp, inside the writing transaction, and rolls back with it.
+#
+# Note: queryset.update(), bulk_create() and raw SQL do not send these
+# signals; callers using them must call bump_graph_version() themselves.
+
+
+def _airport_committed(airport_id, code, created, previous, stamp):
+    forget_stamp()
+    shortest_trees.airport_changed(airport_id, created, previous, stamp)
+    if created:
+        jump_pointers.airport_created(airport_id, code, previous, stamp)
+
+
+def _airport_deleted_committed(previous, stamp):
+    forget_stamp()
+    shortest_trees.airport_deleted(previous, stamp)
+
+
+def _route_deleted_committed(route_id, from_id, previous, stamp):
+    forget_stamp()
+    shortest_trees.route_deleted(route_id, from_id, previous, stamp)
+
+
+def _route_committed(route_id, from_id, to_id, position, duration, created, previous, stamp):
+    forget_stamp()
+    shortest_trees.route_changed(route_id, from_id, to_id, duration, created, previous, stamp)
+    if created:
+        jump_pointers.route_created(route_id, from_id, to_id, position, duration, previous, stamp)
+
+
+@receiver(post_save, sender=Airport)
+def airport_saved(sender, instance, created, using=None, **kwargs):
+    """
+    Refresh cached graph data after an airport is created or updated.
+    """
+    previous, stamp = bump_graph_version(using)
+    chain_index.airport_saved(instance.pk, created, previous, stamp)
+    transaction.on_commit(
+        partial(_airport_committed, instance.pk, instance.code, created, previous, stamp), using=using
+    )
+
+
+@receiver(post_save, sender=AirportRoute)
+def route_saved(sender, instance, created, using=None, **kwargs):
+    """
+    Refresh cached graph data after a route is created or updated.
+
+    New routes are patched into incrementally maintained indexes; updates
+    may move a route between slots, so the jump-pointer index is only
+    invalidated, while shortest-path trees are repaired for any change.
+    """
+    previous, stamp = bump_graph_version(using)
+    chain_index.route_saved(instance, created, previous, stamp)
+    transaction.on_commit(
+        partial(
+            _route_committed, instance.pk, instance.from_airport_id, instance.to_airport_id,
+            instance.position, instance.duration, created, previous, stamp,
+        ),
+        using=using,
+    )
+
+
+@receiver(post_delete, sender=Airport)
+@receiver(post_delete, sender=AirportRoute)
+def graph_row_deleted(sender, instance, using=None, **kwargs):
+    """
+    Invalidate cached graph data after an airport or route is deleted.
+    """
+    previous, stamp = bump_graph_version(using)
+    # Delete() clears instance.pk afterwards, so pass the values, not the instance
+    if sender is Airport:
+        chain_index.airport_deleted(instance.pk, previous, stamp)
+        committed = partial(_airport_deleted_committed, previous, stamp)
+    else:
+        chain_index.route_deleted(instance, previous, stamp)
+        committed = partial(_route_deleted_committed, instance.pk, instance.from_airport_id, previous, stamp)
+    transaction.on_commit(committed, using=using)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    """
+    Let routes.metrics count the queries run on a new database connection.
+    """
+    metrics.install_query_hook(connection)
+
+
+@receiver(request_started)
+def request_began(sender, **kwargs):
+    """
+    Let the new request read from replicas until it writes (see routes.routers).
+    """
+    routers.unpin()
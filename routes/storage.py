@@ -0,0 +1,84 @@
+"""
+On-disk storage for precomputed route indexes.
+
+Index files live in settings.ROUTES_INDEX_DIR and consist of a magic line,
+a JSON header (free-form metadata plus the layout of each array) and the raw
+bytes of each array in machine byte order. Files are written to a temporary
+name and renamed into place, so readers never see a partial file.
+"""
+from array import array
+import json
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+
+MAGIC = b'AEROIDX1'
+
+
+def index_dir() -> Path:
+    """
+    Return the directory holding persisted route indexes.
+    """
+    return Path(getattr(settings, 'ROUTES_INDEX_DIR', settings.BASE_DIR / 'route_indexes'))
+
+
+def index_path(name: str) -> Path:
+    """
+    Return the path of the index file called 'name'.
+    """
+    return index_dir() / name
+
+
+def save_arrays(path: Path, meta: dict, arrays: dict):
+    """
+    Atomically write 'meta' and the named arrays to 'path'.
+
+    Args:
+        path: Path - destination file
+        meta: dict - JSON-serialisable metadata
+        arrays: dict - name -> array.array
+    """
+    header = json.dumps({
+        'meta': meta,
+        'arrays': [[name, a.typecode, len(a)] for name, a in arrays.items()],
+    }).encode()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for a in arrays.values():
+                a.tofile(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_arrays(path: Path):
+    """
+    Read a file written by save_arrays().
+
+    Returns:
+        (meta, arrays) tuple, or None if the file is missing or unreadable.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (size,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(size))
+            arrays = {}
+            for name, typecode, length in header['arrays']:
+                a = array(typecode)
+                a.fromfile(f, length)
+                arrays[name] = a
+    except (OSError, ValueError, EOFError, KeyError, struct.error):
+        return None
+    return header['meta'], arrays
@@ -0,0 +1,146 @@
+"""
+Shared fixtures for the routes tests: a seeded random network and reference
+answers computed the slow, obvious way from the current rows.
+"""
+import heapq
+import random
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+
+from ..models import Airport, AirportRoute
+from ..traversal import nth_node
+from ..utils import find_shortest_route_between
+
+
+def walk(code: str, direction: str, n: int, successors: dict = None):
+    """
+    Reference nth-node answer: follow the routes one step at a time.
+    """
+    if successors is None:
+        successors = chain_successors(direction)
+    for _ in range(n):
+        code = successors.get(code)
+        if code is None:
+            return None
+    return code
+
+
+def chain_successors(direction: str) -> dict:
+    """
+    Airport code -> code of its 'direction' child, read from the current rows.
+    """
+    return dict(AirportRoute.objects.filter(position=direction).values_list(
+        'from_airport__code', 'to_airport__code'))
+
+
+def dijkstra_distance(from_code: str, to_code: str, avoid=()):
+    """
+    Reference shortest distance: textbook Dijkstra over the current rows.
+    """
+    edges = {}
+    for source, target, duration in AirportRoute.objects.values_list(
+            'from_airport__code', 'to_airport__code', 'duration'):
+        edges.setdefault(source, []).append((target, duration))
+    if from_code in avoid or to_code in avoid:
+        return None
+    dist = {from_code: 0}
+    heap = [(0, from_code)]
+    while heap:
+        d, code = heapq.heappop(heap)
+        if code == to_code:
+            return d
+        if d > dist[code]:
+            continue
+        for target, duration in edges.get(code, ()):
+            if target not in avoid and d + duration < dist.get(target, float('inf')):
+                dist[target] = d + duration
+                heapq.heappush(heap, (d + duration, target))
+    return None
+
+
+class NetworkTestCase(TestCase):
+    """
+    Test case with a seeded random network and its own index directory, so
+    persisted indexes never leak between runs.
+
+    The stamp TTL is 0: on_commit callbacks (which reset the stamp check
+    after a local write) do not run inside a test transaction.
+    """
+
+    AIRPORTS = 30
+    ROUTES = 45
+
+    def setUp(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir, ignore_errors=True)
+        overrides = override_settings(
+            ROUTES_INDEX_DIR=Path(index_dir),
+            ROUTES_GRAPH_FILE=Path(index_dir) / 'route_graph.bin',
+            ROUTES_GRAPH_STAMP_TTL=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.rng = random.Random(self.AIRPORTS)
+        self.airports = [Airport.objects.create(code=f'A{i}', name=f'Airport {i}') for i in range(self.AIRPORTS)]
+        while AirportRoute.objects.count() < self.ROUTES:
+            self.add_random_route()
+
+    def add_random_route(self):
+        source, target = self.rng.sample(self.airports, 2)
+        position = self.rng.choice((AirportRoute.LEFT, AirportRoute.RIGHT))
+        if AirportRoute.objects.filter(from_airport=source, position=position).exists():
+            return None
+        return AirportRoute.objects.create(
+            from_airport=source, to_airport=target, position=position, duration=self.rng.randint(1, 50),
+        )
+
+    def mutate(self):
+        """
+        Create, update, rename and delete, running the on_commit patches of
+        the incrementally maintained indexes as a real commit would.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.airports.append(Airport.objects.create(code='NEW', name='New airport'))
+            for _ in range(10):
+                self.add_random_route()
+        route = AirportRoute.objects.order_by('pk').first()
+        route.duration = 1
+        route.save()
+        route = AirportRoute.objects.order_by('-pk').first()
+        route.to_airport = next(a for a in self.airports if a.pk not in (route.from_airport_id, route.to_airport_id))
+        route.save()
+        AirportRoute.objects.order_by('pk')[3].delete()
+        renamed = Airport.objects.get(code='A5')
+        renamed.code = 'RENAMED'
+        renamed.save()
+        Airport.objects.get(code='A7').delete()
+        self.airports = list(Airport.objects.all())
+
+    def codes(self):
+        return list(Airport.objects.values_list('code', flat=True))
+
+    def assertNthNodeMatchesWalk(self, engine):
+        for direction in (AirportRoute.LEFT, AirportRoute.RIGHT):
+            successors = chain_successors(direction)
+            for code in self.codes():
+                for n in (1, 2, 3, 7, 40, 1001):
+                    airport = nth_node(code, direction, n, engine=engine)
+                    self.assertEqual(airport.code if airport else None, walk(code, direction, n, successors),
+                                     f"{engine}: {code} {direction} {n}")
+
+    def assertShortestMatchesDijkstra(self, algorithm=None):
+        codes = self.codes()
+        for from_code in codes[::3]:
+            for to_code in codes[1::4]:
+                result = find_shortest_route_between(from_code, to_code, algorithm=algorithm)
+                self.assertEqual(result['distance'] if result else None, dijkstra_distance(from_code, to_code),
+                                 f"{algorithm}: {from_code} -> {to_code}")
+                if result:
+                    # The legs must chain up and add up to the distance
+                    self.assertEqual(sum(leg.duration for leg in result['routes']), result['distance'])
+                    self.assertEqual(result['path'][0], from_code)
+                    self.assertEqual(result['path'][-1], to_code)
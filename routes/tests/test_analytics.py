@@ -0,0 +1,75 @@
+from ..models import Airport, AirportRoute
+from ..utils import find_reachable_airports, find_subtree_stats, is_in_subtree
+from .base import NetworkTestCase
+
+LEFT, RIGHT = AirportRoute.LEFT, AirportRoute.RIGHT
+
+
+class SubtreeAnalyticsTests(NetworkTestCase):
+    """
+    Subtree figures on a hand-built network whose sizes and sums are known:
+
+        A0 -L3-> A1 -L2-> A3
+                    -R4-> A4
+           -R5-> A2 -R7-> A5
+
+    A6 and A7 have no routes.
+    """
+
+    AIRPORTS = 8
+    ROUTES = 0
+
+    def setUp(self):
+        super().setUp()
+        for from_code, to_code, position, duration in (
+                ('A0', 'A1', LEFT, 3), ('A0', 'A2', RIGHT, 5), ('A1', 'A3', LEFT, 2),
+                ('A1', 'A4', RIGHT, 4), ('A2', 'A5', RIGHT, 7)):
+            self.add_route(from_code, to_code, position, duration)
+
+    def add_route(self, from_code, to_code, position, duration):
+        AirportRoute.objects.create(
+            from_airport=Airport.objects.get(code=from_code), to_airport=Airport.objects.get(code=to_code),
+            position=position, duration=duration,
+        )
+
+    def assertStats(self, code, **expected):
+        stats = find_subtree_stats(code)
+        self.assertEqual({key: stats[key] for key in expected}, expected)
+
+    def test_tree(self):
+        self.assertStats('A0', root='A0', parent=None, depth=0, height=2, subtree_size=6, subtree_duration=21,
+                         forest=True)
+        self.assertStats('A1', root='A0', parent='A0', depth=1, height=1, subtree_size=3, subtree_duration=6)
+        self.assertStats('A2', root='A0', parent='A0', depth=1, height=1, subtree_size=2, subtree_duration=7)
+        self.assertStats('A5', root='A0', parent='A2', depth=2, height=0, subtree_size=1, subtree_duration=0)
+        self.assertStats('A6', root='A6', parent=None, subtree_size=1, subtree_duration=0)
+        self.assertTrue(is_in_subtree('A0', 'A4'))
+        self.assertTrue(is_in_subtree('A1', 'A1'))
+        self.assertFalse(is_in_subtree('A1', 'A5'))
+        self.assertFalse(is_in_subtree('A4', 'A1'))
+        self.assertEqual(find_reachable_airports('A0'), ['A1', 'A3', 'A4', 'A2', 'A5'])
+        self.assertEqual(find_reachable_airports('A5'), [])
+
+    def test_unknown_airport(self):
+        self.assertIsNone(find_subtree_stats('XXX'))
+        self.assertIsNone(is_in_subtree('A0', 'XXX'))
+        self.assertIsNone(find_reachable_airports('XXX'))
+
+    def test_second_parent_follows_first_route_reached(self):
+        # A2 is now reached from A4 as well; the depth-first walk meets A4 -> A2
+        # (under A0's left branch) before A0 -> A2, so A2 moves under A4
+        self.add_route('A4', 'A2', LEFT, 1)
+        self.assertStats('A0', subtree_size=6, subtree_duration=17, forest=False)
+        self.assertStats('A1', height=3, subtree_size=5, subtree_duration=14)
+        self.assertStats('A2', root='A0', parent='A4', depth=3, subtree_size=2, subtree_duration=7)
+        self.assertTrue(is_in_subtree('A1', 'A5'))
+        self.assertEqual(find_reachable_airports('A2'), ['A5'])
+
+    def test_cycle_is_split_at_its_first_airport(self):
+        self.add_route('A6', 'A7', LEFT, 2)
+        self.add_route('A7', 'A6', LEFT, 3)
+        self.assertStats('A6', root='A6', parent=None, subtree_size=2, subtree_duration=2, forest=False)
+        self.assertStats('A7', root='A6', parent='A6', depth=1, subtree_size=1, subtree_duration=0)
+        # Reachability still follows every route, unlike the subtree
+        self.assertFalse(is_in_subtree('A7', 'A6'))
+        self.assertEqual(find_reachable_airports('A7'), ['A6'])
@@ -0,0 +1,72 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, override_settings
+
+from .. import utils
+from ..models import AirportRoute
+from ..utils import afind_nth_node, find_longest_node, find_nth_node
+from .base import NetworkTestCase, chain_successors, dijkstra_distance, walk
+
+
+@override_settings(ROUTES_RESULT_CACHE='routes')
+class AsyncApiTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.async_client = AsyncClient()
+
+    async def test_nth_node(self):
+        codes = await sync_to_async(self.codes)()
+        successors = await sync_to_async(chain_successors)(AirportRoute.LEFT)
+        for code in codes[::3]:
+            for n in (1, 4, 1001):
+                response = await self.async_client.get(
+                    '/api/nth-node/', {'airport_code': code, 'direction': 'left', 'n': n})
+                self.assertEqual(response.status_code, 200)
+                airport = response.json()['airport']
+                self.assertEqual(airport['code'] if airport else None, walk(code, 'left', n, successors))
+        response = await self.async_client.get('/api/nth-node/', {'airport_code': 'A0', 'direction': 'up', 'n': 1})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_nth_node_shares_cached_answers_with_the_sync_path(self):
+        expected = await sync_to_async(find_nth_node)('A0', AirportRoute.RIGHT, 5)
+        # Answered from the entry the sync call stored: no traversal, no route graph
+        with mock.patch.object(utils, 'nth_airport_id', side_effect=AssertionError("cache missed")), \
+                mock.patch.object(utils, 'get_route_graph', side_effect=AssertionError("graph built")):
+            airport = await afind_nth_node('A0', AirportRoute.RIGHT, 5)
+        self.assertEqual(airport, expected)
+
+        # And the other way round
+        expected = await afind_nth_node('A2', AirportRoute.LEFT, 2)
+        with mock.patch.object(utils, 'nth_node', side_effect=AssertionError("cache missed")):
+            self.assertEqual(await sync_to_async(find_nth_node)('A2', AirportRoute.LEFT, 2), expected)
+
+    async def test_longest_node(self):
+        for code in ('A0', 'A3', 'NOPE'):
+            response = await self.async_client.get('/api/longest-node/', {'airport_code': code})
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(find_longest_node)(code)
+            self.assertEqual(response.json()['airport'],
+                             {'code': expected.code, 'name': expected.name} if expected else None)
+        self.assertEqual((await self.async_client.get('/api/longest-node/')).status_code, 400)
+
+    async def test_shortest_route(self):
+        codes = await sync_to_async(self.codes)()
+        for source in codes[::4]:
+            for target in codes[1::7]:
+                response = await self.async_client.get(
+                    '/api/shortest-route/', {'from_airport': source, 'to_airport': target})
+                self.assertEqual(response.status_code, 200)
+                body = response.json()
+                self.assertEqual(body['distance'], await sync_to_async(dijkstra_distance)(source, target))
+                self.assertEqual(body['route_ids'] is None, body['distance'] is None)
+
+        avoid = codes[1:3]
+        response = await self.async_client.get(
+            '/api/shortest-route/', {'from_airport': codes[0], 'to_airport': codes[5], 'avoid': ','.join(avoid)})
+        self.assertEqual(response.json()['distance'],
+                         await sync_to_async(dijkstra_distance)(codes[0], codes[5], avoid=set(avoid)))
+        response = await self.async_client.get(
+            '/api/shortest-route/', {'from_airport': codes[0], 'to_airport': codes[5], 'avoid': codes[0]})
+        self.assertEqual(response.status_code, 400)
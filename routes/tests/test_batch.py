@@ -0,0 +1,75 @@
+import json
+from unittest import mock
+
+from django.test import override_settings
+
+from .. import api
+from ..utils import find_shortest_route_between, find_shortest_routes
+from .base import NetworkTestCase
+
+
+class BatchShortestRouteTests(NetworkTestCase):
+
+    def pairs(self):
+        codes = self.codes()
+        return [(source, target) for source in codes[::4] for target in codes[1::6]] + [('A0', 'NOPE')]
+
+    def post(self, body):
+        response = self.client.post('/api/shortest-routes/', json.dumps(body), content_type='application/json')
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, json.loads(content)
+
+    def test_matches_single_queries(self):
+        pairs = self.pairs()
+        answered = list(find_shortest_routes(pairs))
+        self.assertCountEqual([(source, target) for source, target, _ in answered], pairs)
+        for source, target, result in answered:
+            single = find_shortest_route_between(source, target)
+            if single is None:
+                self.assertIsNone(result, (source, target))
+                continue
+            # Same shape as the single query, RouteLeg records included
+            self.assertEqual(result['distance'], single['distance'])
+            self.assertEqual(result['path'], single['path'])
+            self.assertEqual([leg.pk for leg in result['routes']], [leg.pk for leg in single['routes']])
+
+    def test_endpoint_items_match_the_single_endpoint(self):
+        pairs = self.pairs()
+        status, body = self.post({'pairs': pairs})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['results']), len(pairs))
+        for item in body['results']:
+            single = self.client.get('/api/shortest-route/', {'from_airport': item['from'], 'to_airport': item['to']})
+            if single.status_code == 200:
+                self.assertEqual({key: item[key] for key in ('distance', 'path', 'route_ids')}, single.json())
+            else:
+                self.assertIsNone(item['distance'])
+
+    def test_sources_and_targets(self):
+        status, body = self.post({'sources': ['A0', 'A1'], 'targets': ['A2', 'A3', 'A4']})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['results']), 6)
+        status, body = self.post({'sources': [], 'targets': ['A2']})
+        self.assertEqual((status, body), (200, {'results': []}))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post({'pairs': [['A0']]})[0], 400)
+        self.assertEqual(self.post({'sources': 'A0', 'targets': ['A1']})[0], 400)
+        with override_settings(ROUTES_BATCH_MAX_PAIRS=3):
+            self.assertEqual(self.post({'sources': ['A0', 'A1'], 'targets': ['A2', 'A3']})[0], 400)
+
+    def test_failure_before_streaming_is_an_error_response(self):
+        with mock.patch.object(api, 'find_shortest_routes', side_effect=RuntimeError("no graph")):
+            with self.assertRaises(RuntimeError):
+                self.post({'pairs': [['A0', 'A1']]})
+
+    def test_failure_while_streaming_ends_the_body_cleanly(self):
+        def failing(pairs):
+            yield 'A0', 'A1', None
+            raise RuntimeError("lost the graph")
+
+        with mock.patch.object(api, 'find_shortest_routes', failing), self.assertLogs('routes.api', 'ERROR'):
+            status, body = self.post({'pairs': [['A0', 'A1'], ['A0', 'A2']]})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['results']), 1)
+        self.assertIn('error', body)
@@ -0,0 +1,98 @@
+from django.test import SimpleTestCase, override_settings
+
+from .. import chain_index
+from ..models import Airport, AirportRoute
+from ..utils import find_nth_node
+from .base import NetworkTestCase, chain_successors, walk
+
+LEFT, RIGHT = AirportRoute.LEFT, AirportRoute.RIGHT
+
+
+class LayoutTests(SimpleTestCase):
+
+    def test_trees_and_cycles(self):
+        # 1 -> 2 -> 3 (end), 4 -> 2; 5 -> 6 -> 7 -> 6 (cycle), 8 -> 7
+        successor = {1: 2, 2: 3, 4: 2, 5: 6, 6: 7, 7: 6, 8: 7}
+        rows = {row[0]: row[1:] for row in chain_index.layout(range(1, 9), successor)}
+        self.assertEqual(rows, {
+            # airport: (tree, depth, tin, cycle_length, cycle_position)
+            3: (3, 0, 0, None, None),
+            2: (3, 1, 1, None, None),
+            1: (3, 2, 2, None, None),
+            4: (3, 2, 3, None, None),
+            6: (6, 0, 0, 2, 0),
+            5: (6, 1, 2, 2, 0),
+            7: (6, 0, 1, 2, 1),
+            8: (6, 1, 3, 2, 1),
+        })
+
+
+@override_settings(ROUTES_NTH_NODE_ENGINE='chain')
+class ChainIndexTests(NetworkTestCase):
+
+    def assertTableAnswers(self, steps=range(0, 12)):
+        """
+        Every lookup is answered by the table itself (no fallback) and
+        matches a plain walk.
+        """
+        for direction in (LEFT, RIGHT):
+            successors = chain_successors(direction)
+            for code in self.codes():
+                for n in steps:
+                    found, airport = chain_index.nth_airport(code, direction, n)
+                    self.assertTrue(found, f"{code} {direction} {n}")
+                    self.assertEqual(airport.code if airport else None, walk(code, direction, n, successors),
+                                     f"{code} {direction} {n}")
+
+    def test_chain_engine_follows_writes(self):
+        chain_index.rebuild()
+        self.assertNthNodeMatchesWalk('chain')
+        self.assertTableAnswers()
+        self.mutate()
+        self.assertNthNodeMatchesWalk('chain')
+        self.assertTableAnswers()
+
+    def test_lookup_is_one_query(self):
+        chain_index.rebuild()
+        for n in (0, 1, 5, 1001):
+            with self.assertNumQueries(1):
+                chain_index.nth_airport('A0', LEFT, n)
+
+    def test_stale_table_is_refused(self):
+        chain_index.rebuild()
+        found, _ = chain_index.nth_airport('A0', LEFT, 1)
+        self.assertTrue(found)
+        # Written while another engine is configured: the table falls behind
+        with override_settings(ROUTES_NTH_NODE_ENGINE='jump'):
+            for _ in range(10):
+                self.add_random_route()
+            AirportRoute.objects.order_by('pk')[0].delete()
+        found, _ = chain_index.nth_airport('A0', LEFT, 1)
+        self.assertFalse(found)
+        for code in self.codes():
+            airport = find_nth_node(code, RIGHT, 3)
+            self.assertEqual(airport.code if airport else None, walk(code, RIGHT, 3))
+        chain_index.rebuild()
+        self.assertNthNodeMatchesWalk('chain')
+
+
+@override_settings(ROUTES_NTH_NODE_ENGINE='chain')
+class ChainIndexGraftTests(NetworkTestCase):
+    """
+    Routes appended one at a time graft trees under ends, inner airports and
+    cycle airports, or close cycles; the table must answer after each.
+    """
+
+    AIRPORTS = 10
+    ROUTES = 0
+
+    def test_appended_routes(self):
+        chain_index.rebuild()
+        for from_index, to_index in ((1, 2), (2, 3), (4, 5), (5, 2), (3, 1), (6, 7), (7, 1), (8, 3), (0, 6),
+                                     (9, 8)):
+            AirportRoute.objects.create(
+                from_airport=Airport.objects.get(code=f'A{from_index}'),
+                to_airport=Airport.objects.get(code=f'A{to_index}'),
+                position=LEFT, duration=1,
+            )
+            ChainIndexTests.assertTableAnswers(self, range(0, 15))
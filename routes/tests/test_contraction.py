@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.core.management import call_command
+
+from ..contraction import build_contraction_hierarchy, get_contraction_hierarchy
+from ..graph import get_route_graph
+from ..search import single_source
+from .base import NetworkTestCase
+
+
+class ContractionHierarchyTests(NetworkTestCase):
+
+    def assertHierarchyMatchesDijkstra(self, hierarchy, graph):
+        for start in range(graph.num_airports):
+            dist, _, _ = single_source(graph.offsets, graph.targets, graph.weights, start)
+            for target in range(graph.num_airports):
+                found = hierarchy.shortest(graph, start, target)
+                if target not in dist:
+                    self.assertIsNone(found)
+                    continue
+                distance, edges = found
+                self.assertEqual(distance, dist[target])
+                # The unpacked shortcuts must be a path of snapshot routes
+                node = start
+                for e in edges:
+                    self.assertTrue(graph.offsets[node] <= e < graph.offsets[node + 1])
+                    node = graph.targets[e]
+                self.assertEqual(node, target)
+                self.assertEqual(sum(graph.weights[e] for e in edges), distance)
+
+    def test_hierarchy_matches_dijkstra(self):
+        graph = get_route_graph()
+        # Fully contracted, with a core, and all core (plain bidirectional Dijkstra)
+        for core_degree in (float('inf'), 1.2, 0):
+            self.assertHierarchyMatchesDijkstra(build_contraction_hierarchy(graph, core_degree=core_degree), graph)
+        self.assertHierarchyMatchesDijkstra(build_contraction_hierarchy(graph, witness_limit=1), graph)
+
+    def test_stored_hierarchy_is_used_until_stale(self):
+        call_command('build_contraction_hierarchy', stdout=mock.MagicMock())
+        self.assertIsNotNone(get_contraction_hierarchy(get_route_graph()))
+        self.assertShortestMatchesDijkstra()
+        # The hierarchy is stale after a write and must not be used
+        self.mutate()
+        self.assertIsNone(get_contraction_hierarchy(get_route_graph()))
+        self.assertShortestMatchesDijkstra()
@@ -0,0 +1,15 @@
+from unittest import mock
+
+from django.core.management import call_command
+
+from .base import NetworkTestCase
+
+
+class DistanceIndexTests(NetworkTestCase):
+
+    def test_index_matches_dijkstra(self):
+        call_command('build_distance_index', stdout=mock.MagicMock())
+        self.assertShortestMatchesDijkstra()
+        # The index is stale after a write and must not be used
+        self.mutate()
+        self.assertShortestMatchesDijkstra()
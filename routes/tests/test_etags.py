@@ -0,0 +1,57 @@
+from django.test import override_settings
+
+from ..graph import bump_graph_version
+from ..models import AirportRoute
+from .base import NetworkTestCase
+
+
+class ApiETagTests(NetworkTestCase):
+
+    URLS = (
+        '/api/airports/?limit=5',
+        '/api/routes/?limit=5',
+        '/api/nth-node/?airport_code=A0&direction=left&n=2',
+        '/api/longest-node/?airport_code=A0',
+        '/api/longest-nodes/?airport_codes=A0,A1',
+        '/api/shortest-route/?from_airport=A0&to_airport=A1',
+        '/api/alternative-routes/?from_airport=A0&to_airport=A1&alternatives=2',
+        '/api/subtree/?airport_code=A0',
+        '/api/export/?format=adjacency',
+    )
+
+    def assertNotModifiedUntilWrite(self, url, write):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, url)
+        self.assertEqual(response['ETag'], etag)
+
+        write()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified_until_the_network_changes(self):
+        for url in self.URLS:
+            # A write by any process moves the stamp on
+            self.assertNotModifiedUntilWrite(url, bump_graph_version)
+
+    def test_local_write_changes_the_tag(self):
+        def write():
+            route = AirportRoute.objects.order_by('pk').first()
+            route.duration += 1
+            route.save()
+        for url in self.URLS[:3]:
+            self.assertNotModifiedUntilWrite(url, write)
+
+    @override_settings(ROUTES_NTH_NODE_ENGINE='sql')
+    def test_row_engine_nth_node(self):
+        self.assertNotModifiedUntilWrite('/api/nth-node/?airport_code=A0&direction=left&n=2', bump_graph_version)
+
+    def test_errors_carry_no_etag(self):
+        for url in ('/api/airports/?limit=0', '/api/nth-node/?airport_code=A0&direction=up&n=1',
+                    '/api/subtree/?airport_code=NOPE', '/api/export/?format=xml'):
+            response = self.client.get(url)
+            self.assertIn(response.status_code, (400, 404), url)
+            self.assertFalse(response.has_header('ETag'), url)
@@ -0,0 +1,58 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from ..models import Airport, AirportRoute
+from .base import NetworkTestCase
+
+
+@override_settings(ROUTES_EXPORT_CHUNK_SIZE=7)
+class ExportTests(NetworkTestCase):
+    """
+    The export streams every route in (from, position) order; a chunk size
+    smaller than the network makes the tests cross chunk boundaries.
+    """
+
+    def expected_rows(self):
+        return [
+            {'id': pk, 'from': from_code, 'to': to_code, 'position': position, 'duration': duration}
+            for pk, from_code, to_code, position, duration in AirportRoute.objects.order_by(
+                'from_airport_id', 'position').values_list(
+                'pk', 'from_airport__code', 'to_airport__code', 'position', 'duration')
+        ]
+
+    def test_gzip_jsonl_matches_database(self):
+        response = self.client.get('/api/export/', {'format': 'jsonl'}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response.streaming)
+        body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertEqual([json.loads(line) for line in body.splitlines()], self.expected_rows())
+
+    def test_plain_adjacency_matches_database(self):
+        response = self.client.get('/api/export/', {'format': 'adjacency'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        body = b''.join(response.streaming_content).decode()
+        expected = []
+        for airport in Airport.objects.order_by('pk'):
+            targets = airport.routes_from.order_by('position').values_list('to_airport__code', 'duration')
+            expected.append(' '.join([airport.code] + [f'{code}:{duration}' for code, duration in targets]))
+        self.assertEqual(body.splitlines(), expected)
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get('/api/export/', {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command_writes_gzip_file(self):
+        handle, path = tempfile.mkstemp(suffix='.jsonl.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        call_command('export_routes', '--output', path, stderr=io.StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.assertEqual([json.loads(line) for line in f], self.expected_rows())
@@ -0,0 +1,43 @@
+from django.test import override_settings
+
+from ..graph import bump_graph_version, get_route_graph, network_stamp
+from ..models import AirportRoute
+from .. import result_cache
+from ..utils import find_shortest_route_between
+from .base import NetworkTestCase
+
+
+class GraphSnapshotTests(NetworkTestCase):
+    """
+    The in-memory snapshot must follow every write, including writes made
+    by other processes, which only reach this one through the shared
+    network stamp.
+    """
+
+    def test_shortest_routes_follow_writes(self):
+        self.assertShortestMatchesDijkstra('dijkstra')
+        self.mutate()
+        self.assertShortestMatchesDijkstra('dijkstra')
+
+    def test_snapshot_follows_stamp(self):
+        graph = get_route_graph()
+        self.assertIs(get_route_graph(), graph)
+        self.assertEqual(graph.version, network_stamp())
+
+        # Written the way another process would: no signal reaches this
+        # process, only the stamp in the database moves on
+        route = AirportRoute.objects.order_by('pk').first()
+        AirportRoute.objects.filter(pk=route.pk).update(duration=AirportRoute.MAX_DURATION)
+        bump_graph_version()
+        self.assertIsNot(get_route_graph(), graph)
+        self.assertShortestMatchesDijkstra()
+
+    @override_settings(ROUTES_GRAPH_STAMP_TTL=60)
+    def test_warm_lookup_runs_no_queries(self):
+        route = AirportRoute.objects.order_by('pk').first()
+        source, target = route.from_airport.code, route.to_airport.code
+        with result_cache.bypass():
+            expected = find_shortest_route_between(source, target)
+            with self.assertNumQueries(0):
+                self.assertIs(get_route_graph(), get_route_graph())
+                self.assertEqual(find_shortest_route_between(source, target)['distance'], expected['distance'])
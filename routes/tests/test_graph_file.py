@@ -0,0 +1,46 @@
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+
+from ..graph import get_route_graph, network_stamp, reset_route_graph
+from ..graph_file import map_graph_file
+from ..models import Airport, AirportRoute
+from .base import NetworkTestCase
+
+
+class GraphFileTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = Path(settings.ROUTES_GRAPH_FILE)
+        call_command('export_route_graph', stdout=mock.MagicMock())
+
+    def test_fresh_file_is_mapped(self):
+        graph = get_route_graph()
+        mapped = map_graph_file(self.path, network_stamp())
+        self.assertIsNotNone(mapped)
+        self.assertEqual(mapped.version, graph.version)
+        self.assertEqual(list(mapped.codes), list(graph.codes))
+        for name in ('offsets', 'targets', 'weights', 'route_ids'):
+            self.assertEqual(list(getattr(mapped, name)), list(getattr(graph, name)), name)
+
+    def test_stale_after_rename(self):
+        # A rename changes no count or sum the file could be checked against
+        airport = Airport.objects.get(code='A3')
+        airport.code = 'Z3'
+        airport.save()
+        self.assertIsNone(map_graph_file(self.path, network_stamp()))
+        reset_route_graph()
+        self.assertIn('Z3', get_route_graph().codes)
+        self.assertNotIn('A3', get_route_graph().codes)
+
+    def test_stale_after_duration_swap(self):
+        first, second = AirportRoute.objects.order_by('pk')[:2]
+        first.duration, second.duration = second.duration + 1, first.duration - 1
+        first.save()
+        second.save()
+        self.assertIsNone(map_graph_file(self.path, network_stamp()))
+        reset_route_graph()
+        self.assertShortestMatchesDijkstra()
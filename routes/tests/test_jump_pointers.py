@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.test import override_settings
+
+from .. import jump_pointers
+from ..graph import bump_graph_version
+from ..models import Airport, AirportRoute
+from .base import NetworkTestCase
+
+
+class JumpPointerIndexTests(NetworkTestCase):
+
+    def test_jump_engine(self):
+        self.assertNthNodeMatchesWalk('jump')
+        self.mutate()
+        self.assertNthNodeMatchesWalk('jump')
+
+    def test_follows_writes_of_other_processes(self):
+        self.assertNthNodeMatchesWalk('jump')
+        # No signal reaches this process, only the stamp moves on
+        route = AirportRoute.objects.order_by('pk').first()
+        spare = next(a for a in self.airports if a.pk not in (route.from_airport_id, route.to_airport_id))
+        AirportRoute.objects.filter(pk=route.pk).update(to_airport=spare)
+        bump_graph_version()
+        self.assertNthNodeMatchesWalk('jump')
+
+    @override_settings(ROUTES_JUMP_INDEX_SAVE_EVERY=3)
+    def test_inserts_are_patched_and_saved_lazily(self):
+        index = jump_pointers.get_jump_index()
+        path = Path(settings.ROUTES_INDEX_DIR) / jump_pointers.INDEX_FILE
+        saved_at = path.stat().st_mtime_ns
+        with self.captureOnCommitCallbacks(execute=True):
+            self.airports.append(Airport.objects.create(code='NEW', name='New airport'))
+        with self.captureOnCommitCallbacks(execute=True):
+            while not self.add_random_route():
+                pass
+
+        # Patched in place, not rebuilt, and not written back yet
+        self.assertIs(jump_pointers.get_jump_index(), index)
+        self.assertEqual(path.stat().st_mtime_ns, saved_at)
+        self.assertNthNodeMatchesWalk('jump')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            while not self.add_random_route():
+                pass
+        self.assertNotEqual(path.stat().st_mtime_ns, saved_at)
+        self.assertEqual(jump_pointers.JumpPointerIndex.load(path).version, index.version)
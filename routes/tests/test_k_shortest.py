@@ -0,0 +1,97 @@
+from django.test import SimpleTestCase
+
+from ..graph import RouteGraph, get_route_graph
+from ..models import AirportRoute
+from ..search import k_shortest_paths
+from .base import NetworkTestCase
+
+LEFT, RIGHT = AirportRoute.LEFT, AirportRoute.RIGHT
+
+
+def simple_paths(graph, start: int, target: int) -> list:
+    """
+    Reference answer: every loopless path from 'start' to 'target' as
+    (distance, edges), found by exhaustive depth-first search.
+    """
+    found = []
+
+    def extend(node, visited, edges, distance):
+        if node == target:
+            found.append((distance, tuple(edges)))
+            return
+        for e in range(graph.offsets[node], graph.offsets[node + 1]):
+            neighbor = graph.targets[e]
+            if neighbor not in visited:
+                visited.add(neighbor)
+                edges.append(e)
+                extend(neighbor, visited, edges, distance + graph.weights[e])
+                edges.pop()
+                visited.remove(neighbor)
+
+    extend(start, {start}, [], 0)
+    return sorted(found)
+
+
+class KShortestTestMixin:
+
+    def assertMatchesEnumeration(self, graph, start: int, target: int, k: int):
+        """
+        Yen's answer must be loopless, distinct, shortest first, and have the
+        same distances as the k best enumerated paths (ties may swap paths).
+        """
+        expected = simple_paths(graph, start, target)
+        found = k_shortest_paths(graph, start, target, k)
+        self.assertEqual([d for d, _ in found], [d for d, _ in expected[:k]])
+        self.assertEqual(len({tuple(edges) for _, edges in found}), len(found))
+        for distance, edges in found:
+            self.assertIn((distance, tuple(edges)), expected)
+        return found, expected
+
+
+class KShortestPathTests(KShortestTestMixin, SimpleTestCase):
+    """
+    Yen's algorithm on a small hand-built network with a cycle (5 -> 2) and an
+    airport (7) nothing reaches.
+    """
+
+    def setUp(self):
+        airports = [(pk, 'A%d' % pk) for pk in range(1, 8)]
+        routes = [
+            (1, 1, 2, 4, LEFT), (2, 1, 3, 1, RIGHT),
+            (3, 2, 4, 5, LEFT), (4, 2, 6, 10, RIGHT),
+            (5, 3, 2, 2, LEFT), (6, 3, 4, 8, RIGHT),
+            (7, 4, 6, 3, LEFT), (8, 4, 5, 1, RIGHT),
+            (9, 5, 6, 1, LEFT), (10, 5, 2, 7, RIGHT),
+        ]
+        self.graph = RouteGraph.from_rows(airports, routes)
+        self.index = self.graph.index_of_id
+
+    def test_matches_enumeration(self):
+        for k in range(1, 5):
+            self.assertMatchesEnumeration(self.graph, self.index(1), self.index(6), k)
+
+    def test_k_beyond_path_count_returns_every_path(self):
+        found, expected = self.assertMatchesEnumeration(self.graph, self.index(1), self.index(6), 100)
+        self.assertEqual(sorted((d, tuple(edges)) for d, edges in found), expected)
+
+    def test_no_path(self):
+        self.assertEqual(k_shortest_paths(self.graph, self.index(1), self.index(7), 3), [])
+        self.assertEqual(k_shortest_paths(self.graph, self.index(6), self.index(1), 3), [])
+
+    def test_start_is_target(self):
+        # The empty path is the only loopless one
+        self.assertEqual(k_shortest_paths(self.graph, self.index(2), self.index(2), 3), [(0, [])])
+
+    def test_k_below_one(self):
+        self.assertEqual(k_shortest_paths(self.graph, self.index(1), self.index(6), 0), [])
+
+
+class KShortestNetworkTests(KShortestTestMixin, NetworkTestCase):
+
+    def test_matches_enumeration_on_random_network(self):
+        graph = get_route_graph()
+        codes = self.codes()
+        for _ in range(20):
+            start = graph.index_of(self.rng.choice(codes))
+            target = graph.index_of(self.rng.choice(codes))
+            self.assertMatchesEnumeration(graph, start, target, 4)
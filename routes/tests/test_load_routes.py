@@ -0,0 +1,31 @@
+import csv
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+
+from ..graph import network_stamp
+from ..models import AirportRoute
+from .base import NetworkTestCase
+
+
+class LoadRoutesTests(NetworkTestCase):
+
+    def test_durations_beyond_field_range_are_rejected(self):
+        path = Path(settings.ROUTES_INDEX_DIR) / 'routes.csv'
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['from', 'to', 'position', 'duration'])
+            writer.writerow(['A0', 'A1', 'left', AirportRoute.MAX_DURATION + 1])
+            writer.writerow(['A1', 'A2', 'left', 2 ** 32])
+            writer.writerow(['A2', 'A3', 'left', AirportRoute.MAX_DURATION])
+        stamp = network_stamp()
+        call_command('load_routes', routes=str(path), stdout=mock.MagicMock(), stderr=mock.MagicMock())
+
+        # The batch moved the shared stamp on, so cached graphs are rebuilt
+        self.assertNotEqual(network_stamp(), stamp)
+        self.assertEqual(AirportRoute.objects.get(from_airport__code='A2', position='left').duration,
+                         AirportRoute.MAX_DURATION)
+        self.assertFalse(AirportRoute.objects.filter(duration__gt=AirportRoute.MAX_DURATION).exists())
+        self.assertShortestMatchesDijkstra()
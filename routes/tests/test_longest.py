@@ -0,0 +1,33 @@
+from ..models import Airport, AirportRoute
+from ..utils import find_longest_node, find_longest_nodes
+from .base import NetworkTestCase
+
+
+class LongestNodeTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # A tie between both routes of one airport, and an airport with no routes
+        source, left, right = (Airport.objects.create(code=code, name=code) for code in ('TIE', 'TL', 'TR'))
+        AirportRoute.objects.create(from_airport=source, to_airport=left, position=AirportRoute.LEFT, duration=9)
+        AirportRoute.objects.create(from_airport=source, to_airport=right, position=AirportRoute.RIGHT, duration=9)
+        self.requested = self.codes() + ['NOPE']
+
+    def test_bulk_matches_single_lookups(self):
+        with self.assertNumQueries(1):
+            longest = find_longest_nodes(self.requested)
+        self.assertEqual(list(longest), self.requested)
+        for code in self.requested:
+            self.assertEqual(longest[code], find_longest_node(code), code)
+        self.assertEqual(longest['TIE'].code, 'TL')
+        self.assertIsNone(longest['TL'])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/longest-nodes/', {'airport_codes': ','.join(self.requested)})
+        self.assertEqual(response.status_code, 200)
+        airports = response.json()['airports']
+        for code in self.requested:
+            single = find_longest_node(code)
+            self.assertEqual(airports[code], {'code': single.code, 'name': single.name} if single else None)
+
+        self.assertEqual(self.client.get('/api/longest-nodes/', {'airport_codes': ' , '}).status_code, 400)
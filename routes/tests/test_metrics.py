@@ -0,0 +1,56 @@
+import re
+
+from django.test import override_settings
+
+from .. import result_cache
+from .base import NetworkTestCase
+
+
+class RequestMetricsTests(NetworkTestCase):
+
+    def scrape(self) -> dict:
+        """
+        Fetch /metrics/ and return its samples as {'name{labels}': value}.
+        """
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line and not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_server_timing_and_prometheus_samples(self):
+        view = 'routes:api_shortest_route'
+        before = self.scrape()
+        with result_cache.bypass():
+            response = self.client.get('/api/shortest-route/', {'from_airport': 'A0', 'to_airport': 'A1'})
+        self.assertEqual(response.status_code, 200)
+
+        entries = {entry.split(';')[0]: entry for entry in response['Server-Timing'].split(', ')}
+        self.assertRegex(entries['db'], r'^db;dur=\d+\.\d{2};desc="\d+ queries"$')
+        self.assertRegex(entries['total'], r'^total;dur=\d+\.\d{2}$')
+        # Timed by @instrumented whichever index or search answered
+        self.assertRegex(entries['afind_shortest_route_between'], r'^afind_shortest_route_between;dur=\d+\.\d{2}$')
+
+        after = self.scrape()
+        count = f'aeroroute_request_duration_seconds_count{{view="{view}"}}'
+        self.assertEqual(after[count] - before.get(count, 0), 1)
+        inf_bucket = f'aeroroute_request_duration_seconds_bucket{{view="{view}",le="+Inf"}}'
+        self.assertEqual(after[inf_bucket], after[count])
+        buckets = [value for name, value in after.items()
+                   if name.startswith(f'aeroroute_request_duration_seconds_bucket{{view="{view}",le="')]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertGreater(after[f'aeroroute_request_duration_seconds_sum{{view="{view}"}}'], 0)
+        self.assertIn(f'aeroroute_db_queries_total{{view="{view}"}}', after)
+        phase = f'aeroroute_phase_duration_seconds_total{{view="{view}",phase="afind_shortest_route_between"}}'
+        self.assertGreater(after[phase], before.get(phase, 0))
+
+    @override_settings(ROUTES_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get('/api/airports/?limit=1')
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertTrue(any(re.match(r'aeroroute_request_duration_seconds_count\{view="routes:api_airports"\}', name)
+                            for name in self.scrape()))
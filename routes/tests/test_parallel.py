@@ -0,0 +1,84 @@
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+
+from .. import parallel
+from ..graph import get_route_graph, network_stamp
+from ..graph_file import map_graph_file
+from ..models import AirportRoute
+from ..search import solve_tasks
+from ..utils import find_shortest_routes
+from .base import NetworkTestCase, dijkstra_distance
+
+
+@override_settings(ROUTES_BATCH_WORKERS=2)
+class RoutePoolTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(parallel._retire_shared_pool)
+
+    def pairs(self):
+        codes = self.codes()
+        return [(source, target) for source in codes[::3] for target in codes[1::5]]
+
+    def assertBatchMatchesDijkstra(self):
+        for source, target, result in find_shortest_routes(self.pairs()):
+            self.assertEqual(result['distance'] if result else None, dijkstra_distance(source, target))
+
+    def test_pool_answers_match_dijkstra(self):
+        with parallel.RoutePool(get_route_graph(), 2) as pool:
+            for source, target, result in find_shortest_routes(self.pairs(), pool=pool):
+                self.assertEqual(result['distance'] if result else None, dijkstra_distance(source, target))
+
+    def test_retired_pool_closes_after_its_last_lease(self):
+        pool = parallel.RoutePool(get_route_graph(), 2)
+        with mock.patch.object(pool, 'close', wraps=pool.close) as close:
+            pool.acquire()
+            pool.acquire()
+            pool.retire()
+            pool.release()
+            close.assert_not_called()
+            pool.release()
+            close.assert_called_once()
+
+    def test_shared_pool_is_recycled_when_the_stamp_moves(self):
+        with parallel.shared_route_pool() as pool:
+            self.assertIs(pool.graph, get_route_graph())
+        with parallel.shared_route_pool() as again:
+            self.assertIs(again, pool)
+
+        route = AirportRoute.objects.order_by('pk').first()
+        route.duration = AirportRoute.MAX_DURATION
+        with mock.patch.object(pool, 'close', wraps=pool.close) as close:
+            with parallel.shared_route_pool() as leased:
+                # Written while the old pool is leased: it is retired, not closed under the lease
+                route.save()
+                with parallel.shared_route_pool() as fresh:
+                    self.assertIsNot(fresh, leased)
+                    self.assertEqual(fresh.graph.version, network_stamp())
+                close.assert_not_called()
+                self.assertEqual(leased.solve([(0, [1])]), solve_tasks(leased.graph, [(0, [1])]))
+            close.assert_called_once()
+        self.assertBatchMatchesDijkstra()
+
+    def test_stale_graph_file_falls_back_to_the_database(self):
+        path = Path(settings.ROUTES_GRAPH_FILE)
+        call_command('export_route_graph', stdout=mock.MagicMock())
+        with parallel.shared_route_pool() as pool:
+            # Mapped from the fresh file; the pool copies the mapped arrays
+            self.assertIsNotNone(map_graph_file(path, pool.graph.version))
+        self.assertBatchMatchesDijkstra()
+
+        route = AirportRoute.objects.order_by('pk').first()
+        route.duration = AirportRoute.MAX_DURATION
+        route.save()
+        self.assertIsNone(map_graph_file(path, network_stamp()))
+        with parallel.shared_route_pool() as pool:
+            self.assertEqual(pool.graph.version, network_stamp())
+            edge = list(pool.graph.route_ids).index(route.pk)
+            self.assertEqual(pool.graph.weights[edge], AirportRoute.MAX_DURATION)
+        self.assertBatchMatchesDijkstra()
@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import re
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+
+from .. import result_cache
+from ..graph import get_route_graph
+from ..models import AirportRoute
+from ..search import dijkstra
+from .base import NetworkTestCase, dijkstra_distance, walk
+
+
+class ProfileQueryTests(NetworkTestCase):
+
+    def profile(self, *args) -> dict:
+        out = io.StringIO()
+        call_command('profile_query', *args, '--json', stdout=out)
+        return json.loads(out.getvalue())
+
+    def reachable_pair(self):
+        """
+        Two airports more than one route apart.
+        """
+        direct = set(AirportRoute.objects.values_list('from_airport__code', 'to_airport__code'))
+        codes = self.codes()
+        for from_code in codes:
+            for to_code in codes:
+                if from_code == to_code or (from_code, to_code) in direct:
+                    continue
+                distance = dijkstra_distance(from_code, to_code)
+                if distance is not None:
+                    return from_code, to_code, distance
+        self.fail("No airports two routes apart")
+
+    def test_shortest_route_counters(self):
+        from_code, to_code, distance = self.reachable_pair()
+        report = self.profile(from_code, to_code, '--algorithm', 'dijkstra')
+        self.assertEqual(report['query'], 'shortest')
+        self.assertEqual(report['args'], [from_code, to_code])
+        self.assertEqual(report['result']['distance'], distance)
+        self.assertIn('search', report['phases'])
+        self.assertIsNone(report['profile'])
+
+        # The counters are those of the same search run directly
+        graph = get_route_graph()
+        stats = {}
+        dijkstra(graph, graph.index_of(from_code), graph.index_of(to_code), stats)
+        self.assertGreater(stats['settled'], 1)
+        self.assertEqual(report['search'], {
+            'settled': stats['settled'],
+            'heap_pops': stats['pops'],
+            'heap_pushes': stats['pushes'],
+            'stale_pops': stats['pops'] - stats['settled'],
+            'relaxations': stats['relaxations'],
+        })
+        # The result cache was bypassed
+        self.assertNotIn('result_cache_misses', report['counters'])
+
+    @override_settings(ROUTES_RESULT_CACHE='routes')
+    def test_use_cache(self):
+        result_cache.get_cache().clear()
+        from_code, to_code, _ = self.reachable_pair()
+        first = self.profile(from_code, to_code, '--algorithm', 'dijkstra', '--use-cache')
+        self.assertEqual(first['counters'].get('result_cache_misses'), 1)
+        second = self.profile(from_code, to_code, '--algorithm', 'dijkstra', '--use-cache')
+        self.assertEqual(second['counters'].get('result_cache_hits'), 1)
+        self.assertEqual(second['search'], {})
+        self.assertEqual(second['result'], first['result'])
+
+    def test_collapsed_stacks(self):
+        from_code, to_code, _ = self.reachable_pair()
+        handle, path = tempfile.mkstemp(suffix='.folded')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        report = self.profile(from_code, to_code, '--algorithm', 'dijkstra', '--collapsed', path)
+        self.assertEqual(report['profile'], path)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r'^\S+ \d+$')
+        stacks = [line.rsplit(' ', 1)[0].split(';') for line in lines]
+        # The search is nested under the query function
+        self.assertTrue(any(
+            'routes.utils.find_shortest_route_between' in frames
+            and frames.index('routes.utils.find_shortest_route_between') < frames.index(frame)
+            for frames in stacks for frame in frames if frame == 'routes.search.dijkstra'
+        ))
+
+    def test_nth_node_text_report(self):
+        out = io.StringIO()
+        call_command('profile_query', 'A0', '--nth', '2', '--direction', 'right', stdout=out)
+        text = out.getvalue()
+        self.assertIn('Query: nth A0 right 2', text)
+        result = json.loads(re.search(r'^Result: (.*)$', text, re.M).group(1))
+        self.assertEqual(result['code'] if result else None, walk('A0', AirportRoute.RIGHT, 2))
+        self.assertRegex(text, r'SQL: \d+ queries in')
+
+    def test_requires_one_query(self):
+        with self.assertRaises(CommandError):
+            call_command('profile_query', 'A0', stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('profile_query', 'A0', 'A1', '--nth', '2', stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            call_command('profile_query', 'A0', '--nth', '-1', stdout=io.StringIO())
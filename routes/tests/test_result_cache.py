@@ -0,0 +1,87 @@
+from django.test import override_settings
+
+from .. import result_cache
+from ..graph import bump_graph_version
+from ..models import AirportRoute
+from ..utils import find_k_shortest_routes, find_nth_node, find_shortest_route_between
+from .base import NetworkTestCase, dijkstra_distance, walk
+
+
+@override_settings(ROUTES_RESULT_CACHE='routes')
+class ResultCacheTests(NetworkTestCase):
+
+    def setUp(self):
+        super().setUp()
+        result_cache.get_cache().clear()
+        route = AirportRoute.objects.order_by('pk').first()
+        self.source, self.target = route.from_airport.code, route.to_airport.code
+
+    def events(self, call):
+        """
+        Run call() and return (its result, the hits, misses and stores it caused).
+        """
+        before = result_cache.stats()
+        value = call()
+        after = result_cache.stats()
+        return value, tuple(after[event] - before[event] for event in ('hits', 'misses', 'stores'))
+
+    def write_elsewhere(self, **changes):
+        """
+        Change the first route the way another process would: only the
+        stamp in the database moves on.
+        """
+        AirportRoute.objects.filter(from_airport__code=self.source, to_airport__code=self.target).update(**changes)
+        bump_graph_version()
+
+    def test_miss_then_hit(self):
+        def shortest():
+            return find_shortest_route_between(self.source, self.target)
+
+        first, events = self.events(shortest)
+        self.assertEqual(events, (0, 1, 1))
+        again, events = self.events(shortest)
+        self.assertEqual(events, (1, 0, 0))
+        self.assertEqual(again['path'], first['path'])
+        self.assertEqual([leg.pk for leg in again['routes']], [leg.pk for leg in first['routes']])
+
+        # Other arguments are other entries
+        _, events = self.events(lambda: find_shortest_route_between(self.source, self.target, algorithm='dijkstra'))
+        self.assertEqual(events, (0, 1, 1))
+
+    def test_no_answer_is_cached(self):
+        def nowhere():
+            return find_nth_node('NOPE', AirportRoute.LEFT, 1)
+
+        self.assertEqual(self.events(nowhere), (None, (0, 1, 1)))
+        self.assertEqual(self.events(nowhere), (None, (1, 0, 0)))
+
+    def test_stamp_change_invalidates(self):
+        find_shortest_route_between(self.source, self.target)
+        find_k_shortest_routes(self.source, self.target, 3)
+        find_nth_node(self.source, AirportRoute.LEFT, 2)
+
+        self.write_elsewhere(duration=AirportRoute.MAX_DURATION)
+        result, events = self.events(lambda: find_shortest_route_between(self.source, self.target))
+        self.assertEqual(events, (0, 1, 1))
+        self.assertEqual(result['distance'] if result else None, dijkstra_distance(self.source, self.target))
+        found, events = self.events(lambda: find_k_shortest_routes(self.source, self.target, 3))
+        self.assertEqual(events, (0, 1, 1))
+        with result_cache.bypass():
+            fresh = find_k_shortest_routes(self.source, self.target, 3)
+        self.assertEqual([r['distance'] for r in found], [r['distance'] for r in fresh])
+        airport, events = self.events(lambda: find_nth_node(self.source, AirportRoute.LEFT, 2))
+        self.assertEqual(events, (0, 1, 1))
+        self.assertEqual(airport.code if airport else None, walk(self.source, AirportRoute.LEFT, 2))
+
+    def test_keys_carry_the_stamp(self):
+        args = ('A0', 'A1', None)
+        self.assertNotEqual(result_cache.make_key('shortest', 1, args), result_cache.make_key('shortest', 2, args))
+        self.assertNotEqual(result_cache.make_key('shortest', 1, args), result_cache.make_key('nth', 1, args))
+        result_cache.store('shortest', 1, args, None)
+        self.assertEqual(result_cache.lookup('shortest', 1, args), (True, None))
+        self.assertEqual(result_cache.lookup('shortest', 2, args), (False, None))
+
+    @override_settings(ROUTES_RESULT_CACHE='')
+    def test_disabled(self):
+        _, events = self.events(lambda: find_shortest_route_between(self.source, self.target))
+        self.assertEqual(events, (0, 0, 0))
@@ -0,0 +1,54 @@
+from ..graph import RouteLeg
+from ..models import AirportRoute
+from ..utils import find_k_shortest_routes, find_shortest_route_between
+from .base import NetworkTestCase
+
+
+class RouteLegTests(NetworkTestCase):
+    """
+    Path legs are RouteLeg records built from the snapshot, not AirportRoute
+    instances; each must describe the route row it stands for.
+    """
+
+    def assertLegsMatchRows(self, result):
+        legs = result['routes']
+        self.assertEqual(len(legs), len(result['path']) - 1)
+        self.assertEqual(sum(leg.duration for leg in legs), result['distance'])
+        rows = AirportRoute.objects.select_related('from_airport', 'to_airport').in_bulk(
+            [leg.pk for leg in legs])
+        for leg, from_code, to_code in zip(legs, result['path'], result['path'][1:]):
+            self.assertIsInstance(leg, RouteLeg)
+            self.assertFalse(hasattr(leg, '__dict__'))
+            self.assertEqual((leg.from_code, leg.to_code), (from_code, to_code))
+            row = rows[leg.pk]
+            self.assertEqual(
+                (leg.from_airport_id, leg.to_airport_id, leg.from_code, leg.to_code, leg.position, leg.duration),
+                (row.from_airport_id, row.to_airport_id, row.from_airport.code, row.to_airport.code,
+                 row.position, row.duration))
+            self.assertEqual(str(leg), str(row))
+
+    def test_shortest_route_legs(self):
+        codes = self.codes()
+        checked = 0
+        for from_code in codes[::3]:
+            for to_code in codes[1::3]:
+                result = find_shortest_route_between(from_code, to_code)
+                if result and result['routes']:
+                    self.assertLegsMatchRows(result)
+                    checked += 1
+        self.assertGreater(checked, 0)
+
+    def test_alternative_route_legs(self):
+        route = AirportRoute.objects.select_related('from_airport', 'to_airport').order_by('pk').first()
+        results = find_k_shortest_routes(route.from_airport.code, route.to_airport.code, 3)
+        self.assertTrue(results)
+        for result in results:
+            self.assertLegsMatchRows(result)
+
+    def test_legs_follow_writes(self):
+        route = AirportRoute.objects.select_related('from_airport', 'to_airport').order_by('pk').first()
+        route.duration = 0
+        route.save()
+        result = find_shortest_route_between(route.from_airport.code, route.to_airport.code)
+        self.assertEqual(result['distance'], 0)
+        self.assertLegsMatchRows(result)
@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.test import SimpleTestCase, TransactionTestCase
+
+from .. import routers
+from ..models import Airport, AirportRoute
+
+
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        patches = (
+            mock.patch.object(routers, 'replica_aliases', return_value=['replica']),
+            mock.patch.object(routers, '_available', return_value=True),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        routers.unpin()
+
+    def test_routes_reads_use_replicas(self):
+        self.assertEqual(self.router.db_for_read(Airport), 'replica')
+        with routers.use_primary():
+            self.assertEqual(self.router.db_for_read(Airport), 'default')
+        with routers.read_from('default'):
+            self.assertEqual(self.router.db_for_read(AirportRoute), 'default')
+
+    def test_writes_pin_reads_to_primary(self):
+        self.assertEqual(self.router.db_for_write(AirportRoute), 'default')
+        self.assertEqual(self.router.db_for_read(Airport), 'default')
+        routers.unpin()
+        self.assertEqual(self.router.db_for_read(Airport), 'replica')
+
+    def test_other_apps_stay_on_default(self):
+        # Sessions and users on a lagging replica would break admin logins
+        self.assertIsNone(self.router.db_for_read(Session))
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertIsNone(self.router.db_for_write(Session))
+        # Writing a session must not pin routes reads to the primary
+        self.assertEqual(self.router.db_for_read(Airport), 'replica')
+
+    def test_relations_outside_routes_are_left_to_django(self):
+        airport, route, user = Airport(code='A'), AirportRoute(), User(username='u')
+        self.assertIs(self.router.allow_relation(airport, route), True)
+        self.assertIsNone(self.router.allow_relation(airport, user))
+        self.assertIsNone(self.router.allow_relation(user, route))
+        self.assertIsNone(self.router.allow_relation(user, Session()))
+
+
+class AdminLoginTests(TransactionTestCase):
+    """
+    Outside a test transaction, with a replica configured that has none of
+    the primary's data, the admin must still log in.
+    """
+
+    def test_admin_login(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        with mock.patch.object(routers, 'replica_aliases', return_value=['replica']), \
+                mock.patch.object(routers, '_available', return_value=True):
+            response = self.client.post('/admin/login/?next=/admin/', {'username': 'admin', 'password': 'secret'})
+            self.assertRedirects(response, '/admin/', fetch_redirect_response=False)
+            self.assertEqual(self.client.get('/admin/').status_code, 200)
@@ -0,0 +1,53 @@
+from ..models import AirportRoute
+from ..utils import find_shortest_route_between
+from .base import NetworkTestCase, dijkstra_distance
+
+
+def hop_bounded_distance(from_code: str, to_code: str, max_hops: int, max_leg_duration: int = None):
+    """
+    Reference constrained distance: Bellman-Ford rounds, one per allowed leg.
+    """
+    edges = AirportRoute.objects.values_list('from_airport__code', 'to_airport__code', 'duration')
+    if max_leg_duration is not None:
+        edges = edges.filter(duration__lte=max_leg_duration)
+    edges = list(edges)
+    best = {from_code: 0}
+    for _ in range(max_hops):
+        reached = dict(best)
+        for source, target, duration in edges:
+            if source in best and best[source] + duration < reached.get(target, float('inf')):
+                reached[target] = best[source] + duration
+        best = reached
+    return best.get(to_code)
+
+
+class ShortestRouteTests(NetworkTestCase):
+
+    def test_bidirectional_matches_dijkstra(self):
+        self.assertShortestMatchesDijkstra('bidirectional')
+        self.mutate()
+        self.assertShortestMatchesDijkstra('bidirectional')
+
+
+class ConstrainedSearchTests(NetworkTestCase):
+
+    def test_avoided_airports(self):
+        codes = self.codes()
+        avoid = [codes[1], codes[4]]
+        for from_code in codes[::5]:
+            for to_code in codes[2::5]:
+                result = find_shortest_route_between(from_code, to_code, avoid=avoid)
+                self.assertEqual(result['distance'] if result else None,
+                                 dijkstra_distance(from_code, to_code, avoid=set(avoid)))
+
+    def test_hop_and_leg_limits(self):
+        codes = self.codes()
+        for from_code in codes[::4]:
+            for to_code in codes[1::4]:
+                for max_hops, max_leg_duration in ((1, None), (3, None), (4, 25)):
+                    result = find_shortest_route_between(
+                        from_code, to_code, max_hops=max_hops, max_leg_duration=max_leg_duration)
+                    expected = hop_bounded_distance(from_code, to_code, max_hops, max_leg_duration)
+                    self.assertEqual(result['distance'] if result else None, expected)
+                    if result:
+                        self.assertLessEqual(len(result['routes']), max_hops)
@@ -0,0 +1,144 @@
+from django.test import override_settings
+
+from .. import result_cache, shortest_trees
+from ..graph import RouteGraph, get_route_graph
+from ..models import Airport, AirportRoute
+from ..shortest_trees import NetworkEdits, ShortestPathTree
+from ..utils import find_shortest_route_between
+from .base import NetworkTestCase
+
+
+class TreeRepairTests(NetworkTestCase):
+    """
+    improve() and worsen() against trees built from scratch on the changed network.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.graph = RouteGraph.from_database()
+        self.edits = NetworkEdits(self.graph)
+        self.trees = [ShortestPathTree.build(self.graph, origin) for origin in range(0, self.AIRPORTS, 3)]
+
+    def assertTreesMatchRebuilt(self):
+        graph = RouteGraph.from_database()
+        for tree in self.trees:
+            fresh = ShortestPathTree.build(graph, tree.origin)
+            self.assertEqual(list(tree.dist), list(fresh.dist), f"origin {tree.origin}")
+            # The predecessors must form shortest paths too
+            for node, d in enumerate(tree.dist):
+                if node != tree.origin and tree.pred[node] >= 0:
+                    edge = self.edits.route(tree.route[node], tree.pred[node])
+                    self.assertEqual(edge[1], node)
+                    self.assertEqual(tree.dist[tree.pred[node]] + edge[2], d)
+
+    def index(self, airport_id):
+        return self.edits.index_of_id(airport_id)
+
+    def test_insert(self):
+        for _ in range(15):
+            route = self.add_random_route()
+            if route is None:
+                continue
+            u, v = self.index(route.from_airport_id), self.index(route.to_airport_id)
+            self.edits.set_route(route.pk, u, v, route.duration)
+            for tree in self.trees:
+                tree.improve(self.edits, [(u, v, route.duration, route.pk)])
+            self.assertTreesMatchRebuilt()
+
+    def test_duration_change(self):
+        for route in AirportRoute.objects.order_by('pk')[:20]:
+            old = self.edits.route(route.pk, self.index(route.from_airport_id))
+            route.duration = self.rng.choice((1, route.duration // 2, route.duration * 3 + 1))
+            route.save()
+            u, v = self.index(route.from_airport_id), self.index(route.to_airport_id)
+            self.edits.set_route(route.pk, u, v, route.duration)
+            for tree in self.trees:
+                if route.duration > old[2]:
+                    tree.worsen(self.edits, {route.pk})
+                else:
+                    tree.improve(self.edits, [(u, v, route.duration, route.pk)])
+            self.assertTreesMatchRebuilt()
+
+    def test_delete(self):
+        for route_id in self.rng.sample(list(AirportRoute.objects.values_list('pk', flat=True)), 15):
+            AirportRoute.objects.get(pk=route_id).delete()
+            self.edits.remove_route(route_id)
+            for tree in self.trees:
+                tree.worsen(self.edits, {route_id})
+            self.assertTreesMatchRebuilt()
+
+    def test_new_airport(self):
+        airport = Airport.objects.create(code='NEW', name='New airport')
+        self.edits.add_airport(airport.pk)
+        # Into the new airport from one with a free slot, and on to A1
+        source = Airport.objects.exclude(pk=airport.pk).exclude(
+            pk__in=AirportRoute.objects.filter(position=AirportRoute.LEFT).values('from_airport')).first()
+        routes = (
+            AirportRoute.objects.create(
+                from_airport=source, to_airport=airport, position=AirportRoute.LEFT, duration=1),
+            AirportRoute.objects.create(
+                from_airport=airport, to_airport=Airport.objects.get(code='A1'), position=AirportRoute.LEFT,
+                duration=1),
+        )
+        for route in routes:
+            u, v = self.index(route.from_airport_id), self.index(route.to_airport_id)
+            self.edits.set_route(route.pk, u, v, 1)
+            for tree in self.trees:
+                tree.improve(self.edits, [(u, v, 1, route.pk)])
+        self.assertTreesMatchRebuilt()
+
+
+@override_settings(ROUTES_SHORTEST_TREE_MIN_QUERIES=1, ROUTES_SHORTEST_TREES=64,
+                   ROUTES_USE_DISTANCE_INDEX=False, ROUTES_USE_CONTRACTION_HIERARCHY=False)
+class StoredTreeTests(NetworkTestCase):
+    """
+    Committed writes of this process reach the stored trees at once, before
+    the next graph snapshot is loaded.
+    """
+
+    def setUp(self):
+        super().setUp()
+        with result_cache.bypass():
+            for code in ('A0', 'A3', 'A6'):
+                find_shortest_route_between(code, 'A1')
+        self.origins = {code: get_route_graph().index_of(code) for code in ('A0', 'A3', 'A6')}
+        self.stored = {code: shortest_trees._trees[origin] for code, origin in self.origins.items()}
+
+    def assertStoredTreesCurrent(self):
+        # Compared before any query loads the new snapshot
+        graph = RouteGraph.from_database()
+        for code, tree in self.stored.items():
+            self.assertEqual(list(tree.dist), list(ShortestPathTree.build(graph, tree.origin).dist), code)
+
+    def test_writes_are_applied_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_random_route()
+            self.add_random_route()
+        self.assertStoredTreesCurrent()
+        route = AirportRoute.objects.order_by('pk').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            route.duration = 1
+            route.save()
+        self.assertStoredTreesCurrent()
+        with self.captureOnCommitCallbacks(execute=True):
+            route.duration = 10 ** 6
+            route.save()
+        self.assertStoredTreesCurrent()
+        with self.captureOnCommitCallbacks(execute=True):
+            AirportRoute.objects.order_by('pk')[4].delete()
+        self.assertStoredTreesCurrent()
+
+        # The next snapshot already contains the writes: the trees are kept and answer on it
+        with result_cache.bypass():
+            self.assertShortestMatchesDijkstra()
+        for code, origin in self.origins.items():
+            self.assertIs(shortest_trees._trees[origin], self.stored[code])
+
+    def test_unseen_writes_drop_the_trees(self):
+        # Written without the signals' on_commit hooks, as by another process
+        while self.add_random_route() is None:
+            pass
+        with result_cache.bypass():
+            self.assertShortestMatchesDijkstra()
+        for code, origin in self.origins.items():
+            self.assertIsNot(shortest_trees._trees.get(origin), self.stored[code])
@@ -0,0 +1,19 @@
+from .base import NetworkTestCase
+
+
+class NthNodeEngineTests(NetworkTestCase):
+    """
+    Every nth-node engine must give the answer of a plain walk, cycles and
+    broken chains included, before and after every kind of write.
+    """
+
+    def assertEngineFollowsWrites(self, engine):
+        self.assertNthNodeMatchesWalk(engine)
+        self.mutate()
+        self.assertNthNodeMatchesWalk(engine)
+
+    def test_sql_engine(self):
+        self.assertEngineFollowsWrites('sql')
+
+    def test_memory_engine(self):
+        self.assertEngineFollowsWrites('memory')
@@ -0,0 +1,185 @@
+"""
+Traversal engines for left/right route chains.
+
+Each airport has at most one left and one right child, so following one
+direction from a start airport walks a chain that either ends or runs into
+a cycle. The engines below answer "n steps along that chain" in a constant
+number of queries:
+
+    - 'jump': O(log N) lookups in the binary lifting index (routes.jump_pointers)
+    - 'sql': one WITH RECURSIVE query (SQLite and PostgreSQL)
+    - 'memory': pointer chasing over the cached RouteGraph snapshot
+    - 'chain': one indexed SELECT on the RouteChainIndex table (routes.chain_index)
+
+All of them resolve cyclic chains arithmetically, so a large n never costs
+more than one lap of the cycle.
+"""
+from django.conf import settings
+from django.db import connections, router
+
+from . import chain_index, jump_pointers
+from .graph import get_route_graph
+from .metrics import timed
+from .models import Airport, AirportRoute
+
+
+# Database vendors that support the recursive query, with the SQL used to
+# test whether an airport id already appears in the visited path string
+SQL_CONTAINS = {
+    'sqlite': "instr({haystack}, {needle})",
+    'postgresql': "strpos({haystack}, {needle})",
+}
+
+ENGINES = ('auto', 'jump', 'sql', 'memory', 'chain')
+
+
+def resolve_cycle(depth: int, loop_start: int, loop_length: int) -> int:
+    """
+    Map a chain depth onto an already visited depth when the chain loops.
+
+    Args:
+        depth: int - requested number of steps
+        loop_start: int - depth of the first airport on the cycle
+        loop_length: int - number of steps in one lap of the cycle
+
+    Returns:
+        int depth in range [0, loop_start + loop_length) equivalent to 'depth'.
+    """
+    if depth < loop_start:
+        return depth
+    return loop_start + (depth - loop_start) % loop_length
+
+
+def walk_chain(graph, start: int, direction: str, n: int):
+    """
+    Follow 'direction' from dense index 'start' for 'n' steps over 'graph'.
+
+    Returns:
+        dense index of the nth airport, or None if the chain ends early.
+    """
+    successors = graph.left if direction == AirportRoute.LEFT else graph.right
+    chain = [start]
+    seen = {start: 0}
+    current = start
+    while len(chain) <= n:
+        current = successors[current]
+        if current < 0:
+            return None
+        if current in seen:
+            # The chain loops back; the answer is already in 'chain'
+            loop_start = seen[current]
+            return chain[resolve_cycle(n, loop_start, len(chain) - loop_start)]
+        seen[current] = len(chain)
+        chain.append(current)
+    return chain[n]
+
+
+def _nth_node_memory(start_code: str, direction: str, n: int):
+    """
+    Resolve the nth node by pointer chasing over the cached RouteGraph.
+    """
+    graph = get_route_graph()
+    start = graph.index_of(start_code)
+    if start is None:
+        return None
+    index = walk_chain(graph, start, direction, n)
+    if index is None:
+        return None
+    return Airport.objects.filter(pk=graph.airport_ids[index]).first()
+
+
+def _nth_node_jump(start_code: str, direction: str, n: int):
+    """
+    Resolve the nth node with the jump-pointer index.
+    """
+    airport_id = jump_pointers.nth_airport_id(start_code, direction, n)
+    if airport_id is None:
+        return None
+    return Airport.objects.filter(pk=airport_id).first()
+
+
+def _nth_node_chain(start_code: str, direction: str, n: int):
+    """
+    Resolve the nth node with the materialized chain index, falling back to
+    the jump-pointer index while the table cannot answer (not built, or
+    behind the network stamp after writes made under another engine).
+    """
+    found, airport = chain_index.nth_airport(start_code, direction, n)
+    if not found:
+        return _nth_node_jump(start_code, direction, n)
+    return airport
+
+
+def _nth_node_sql(start_code: str, direction: str, n: int):
+    """
+    Resolve the nth node with a single recursive query.
+
+    The recursive part walks the chain up to depth n, carrying a
+    comma-separated string of visited airport ids. A step that lands on an
+    already visited airport is emitted with is_cycle = 1 and not expanded,
+    which gives the start and length of the loop for the final lookup.
+    """
+    # Run on the alias the router picks for Airport reads; replicas may use another backend
+    database = router.db_for_read(Airport)
+    connection = connections[database]
+    quote = connection.ops.quote_name
+    airport = quote(Airport._meta.db_table)
+    route = quote(AirportRoute._meta.db_table)
+    contains = SQL_CONTAINS[connection.vendor].format(
+        haystack="c.visited", needle="',' || r.to_airport_id || ','"
+    )
+    sql = f"""
+        WITH RECURSIVE chain(airport_id, depth, visited, is_cycle) AS (
+            SELECT a.id, 0, ',' || a.id || ',', 0
+            FROM {airport} a
+            WHERE a.code = %s
+            UNION ALL
+            SELECT r.to_airport_id, c.depth + 1, c.visited || r.to_airport_id || ',',
+                   CASE WHEN {contains} > 0 THEN 1 ELSE 0 END
+            FROM chain c
+            JOIN {route} r ON r.from_airport_id = c.airport_id AND r.{quote('position')} = %s
+            WHERE c.depth < %s AND c.is_cycle = 0
+        ),
+        loop(loop_start, loop_length) AS (
+            SELECT f.depth, c.depth - f.depth
+            FROM chain c
+            JOIN chain f ON f.airport_id = c.airport_id AND f.is_cycle = 0
+            WHERE c.is_cycle = 1
+        )
+        SELECT a.id, a.code, a.name
+        FROM chain c
+        JOIN {airport} a ON a.id = c.airport_id
+        WHERE c.is_cycle = 0 AND c.depth = COALESCE(
+            (SELECT CASE WHEN %s < loop_start THEN %s
+                         ELSE loop_start + (%s - loop_start) %% loop_length END
+             FROM loop),
+            %s
+        )
+    """
+    rows = list(Airport.objects.using(database).raw(sql, [start_code, direction, n, n, n, n, n]))
+    return rows[0] if rows else None
+
+
+def nth_node(start_code: str, direction: str, n: int, engine: str = None):
+    """
+    Return the Airport 'n' steps away from 'start_code' in 'direction'.
+
+    Args:
+        start_code: str - Airport code to start from
+        direction: str - 'left' or 'right'
+        n: int - number of steps to move in the direction
+        engine: str - one of ENGINES; defaults to settings.ROUTES_NTH_NODE_ENGINE.
+            'auto' uses the jump-pointer index.
+
+    Returns:
+        Airport instance or None if the path breaks before n steps or airport does not exist.
+    """
+    engine = engine or getattr(settings, 'ROUTES_NTH_NODE_ENGINE', 'auto')
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown nth-node engine: {engine!r}")
+    engines = {
+        'auto': _nth_node_jump, 'jump': _nth_node_jump, 'sql': _nth_node_sql,
+        'chain': _nth_node_chain, 'memory': _nth_node_memory,
+    }
+    with timed('traverse'):
+        return engines[engine](start_code, direction, n)
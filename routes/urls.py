@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'routes'
 
@@ -19,4 +19,34 @@ urlpatterns = [
 
     # URL path for finding the shortest multi-hop route between two airports
     path('shortest-node/', views.shortest_node, name='shortest_node'),
+
+    # URL path for subtree size/depth/duration and reachability of an airport
+    path('subtree/', views.subtree, name='subtree'),
+
+    # JSON API: many shortest-route queries answered in one streamed response
+    path('api/shortest-routes/', api.shortest_routes_batch, name='api_shortest_routes'),
+
+    # Async JSON API for single queries (served without a thread per request under ASGI)
+    path('api/nth-node/', api.nth_node, name='api_nth_node'),
+    path('api/longest-node/', api.longest_node, name='api_longest_node'),
+    path('api/shortest-route/', api.shortest_route, name='api_shortest_route'),
+
+    # JSON API: longest direct route from many airports in one query
+    path('api/longest-nodes/', api.longest_nodes, name='api_longest_nodes'),
+
+    # JSON API: the k shortest alternative routes between two airports
+    path('api/alternative-routes/', api.alternative_routes, name='api_alternative_routes'),
+
+    # JSON API: subtree analytics and reachability (Euler-tour index)
+    path('api/subtree/', api.subtree, name='api_subtree'),
+
+    # Streaming export of the whole network (JSON Lines, DOT or adjacency list)
+    path('api/export/', api.export, name='api_export'),
+
+    # JSON listings of airports and routes with keyset pagination
+    path('api/airports/', api.airports, name='api_airports'),
+    path('api/routes/', api.routes, name='api_routes'),
+
+    # Prometheus scrape endpoint with per-view query counts and timings of this process
+    path('metrics/', api.metrics, name='metrics'),
 ]
@@ -1,15 +1,46 @@
-from collections import defaultdict
-import heapq
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import contextvars
+import functools
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+
+from . import result_cache, shortest_trees
+from .analytics import get_tree_index, reachable_from
+from .contraction import get_contraction_hierarchy
 from .models import Airport, AirportRoute
-from django.db.models import Prefetch
+from .distance_index import get_distance_index
+from .graph import cached_route_graph, cached_stamp, current_stamp, get_route_graph
+from .jump_pointers import nth_airport_id
+from .metrics import count, instrumented, timed
+from .parallel import shared_route_pool
+from .search import bidirectional_dijkstra, constrained_search, dijkstra, k_shortest_paths, solve_tasks
+from .traversal import nth_node
+
 
+# Threads running graph searches for the async functions (see _run_search)
+_executor = None
+_executor_lock = threading.Lock()
 
+
+@instrumented
 def find_nth_node(start_code: str, direction: str, n: int):
     """
     Traverse 'n' steps in the given 'direction' (left or right) starting from airport with code 'start_code'.
     n=1 returns the immediate child in that direction.
     Returns the Airport instance at the nth position if exists, otherwise None.
 
+    The chain is resolved by a traversal engine (see routes.traversal) in a
+    constant number of queries regardless of n. Cyclic chains are followed
+    around the loop, exactly as repeated single steps would. Answers are
+    cached (see routes.result_cache) except with the SQL and chain engines,
+    which answer from whichever database the router picks rather than from
+    the primary's network stamp that keys the cache.
+
     Args:
         start_code: str - Airport code to start from
         direction: str - 'left' or 'right'
@@ -18,130 +49,543 @@ def find_nth_node(start_code: str, direction: str, n: int):
     Returns:
         Airport instance or None if the path breaks before n steps or airport does not exist.
     """
-    try:
-        # Get starting airport instance by code
-        current = Airport.objects.get(code=start_code)
-    except Airport.DoesNotExist:
-        return None
+    if getattr(settings, 'ROUTES_NTH_NODE_ENGINE', 'auto') in ('sql', 'chain'):
+        return nth_node(start_code, direction, n)
 
-    # Traverse n times following the given direction link (left or right child)
-    for _ in range(n):
-        try:
-            # Query for the route from current airport in the specified direction
-            route = AirportRoute.objects.get(from_airport=current, position=direction)
-            # Move to the next airport along the route
-            current = route.to_airport
-        except AirportRoute.DoesNotExist:
-            # If no route exists in direction, return None (path ended early)
-            return None
-    return current
+    # The key only needs the stamp, so a cache hit never builds the route graph
+    stamp = current_stamp()
+    args = (start_code, direction, n)
+    hit, airport_id = result_cache.lookup('nth', stamp, args)
+    if hit:
+        return Airport.objects.filter(pk=airport_id).first() if airport_id is not None else None
+    airport = nth_node(start_code, direction, n)
+    result_cache.store('nth', stamp, args, airport.pk if airport else None)
+    return airport
 
 
+@instrumented
 def find_longest_node(start_code: str):
     """
     Find the outgoing route with the maximum duration from the airport with 'start_code'.
     Returns the Airport instance that is the destination of this longest route.
 
+    One query: the route_from_longest_idx index on (from_airport, -duration)
+    yields the longest route first, and its destination is joined in. Ties
+    go to the left route.
+
     Args:
         start_code: str - Airport code to start from
 
     Returns:
         Airport instance representing the longest child node or None if not found.
     """
-    try:
-        airport = Airport.objects.get(code=start_code)
-    except Airport.DoesNotExist:
-        return None
-
-    # Query for the outgoing route with the maximum duration
-    route = AirportRoute.objects.filter(from_airport=airport).order_by('-duration').first()
+    route = _longest_route(start_code).first()
 
     # Return the destination airport if such a route exists
     return route.to_airport if route else None
 
 
-def find_shortest_route_between(from_code: str, to_code: str):
+@instrumented
+def find_longest_nodes(start_codes) -> dict:
+    """
+    Bulk variant of find_longest_node() answering many airports in one query.
+
+    Every airport has at most a left and a right route, so all candidate
+    routes are fetched together and the longest is picked per airport.
+
+    Args:
+        start_codes: iterable of airport codes
+
+    Returns:
+        dict mapping each requested code to the destination Airport of its
+        longest outgoing route, or None if the airport is missing or has no
+        outgoing routes.
+    """
+    longest = dict.fromkeys(start_codes)
+    routes = (
+        AirportRoute.objects.filter(from_airport__code__in=list(longest))
+        .select_related('to_airport')
+        .annotate(from_code=F('from_airport__code'))
+        .order_by('from_airport', '-duration', 'position')
+    )
+    for route in routes:
+        # Ordered longest first within each airport, so keep the first seen
+        if longest[route.from_code] is None:
+            longest[route.from_code] = route.to_airport
+    return longest
+
+
+@instrumented
+def find_shortest_route_between(from_code: str, to_code: str, algorithm: str = None,
+                                max_hops: int = None, avoid=(), max_leg_duration: int = None):
     """
     Compute the shortest path between two airports using Dijkstra's algorithm
     over a graph formed by the AirportRoute edges weighted by duration.
 
+    The search runs on the process-wide RouteGraph snapshot (see routes.graph),
+    so repeat queries do not reload the route table, and the legs of the
+    returned path are described from the snapshot too (no query). When a distance index built
+    by `manage.py build_distance_index` matches the current network, it is
+    used instead of a fresh Dijkstra run (see routes.distance_index).
+    Answers are cached until the network changes (see routes.result_cache).
+
+    Constraints are enforced during the search (see
+    routes.search.constrained_search) rather than by filtering answers;
+    constrained queries do not use the distance index or stored trees.
+
     Args:
         from_code: str - Starting airport code
         to_code: str - Target airport code
+        algorithm: str - 'dijkstra' or 'bidirectional' to force a search mode.
+            By default the distance index is used when fresh, otherwise
+            bidirectional Dijkstra on networks with at least
+            settings.ROUTES_BIDIRECTIONAL_MIN_AIRPORTS airports.
+            Ignored when a constraint is given.
+        max_hops: int - most legs the path may use (None: no limit)
+        avoid: iterable of airport codes the path must not visit, the
+            endpoints included
+        max_leg_duration: int - longest single route allowed (None: no limit)
 
     Returns:
         dict with keys:
             'distance': total duration of shortest path,
             'path': list of airport codes for the path,
-            'routes': list of AirportRoute objects forming the shortest path,
+            'routes': list of RouteLeg records (see routes.graph) forming the
+                shortest path, with the AirportRoute's pk, endpoint ids and
+                codes, position and duration,
         or None if no path exists.
     """
-    try:
-        start = Airport.objects.get(code=from_code)
-        target = Airport.objects.get(code=to_code)
-    except Airport.DoesNotExist:
+    graph = get_route_graph()
+    start = graph.index_of(from_code)
+    target = graph.index_of(to_code)
+    if start is None or target is None:
         return None
 
-    # Build graph adjacency list: node_id -> list of (neighbor_id, weight)
-    # Preload all routes with related airports to prevent extra queries (N+1 problem)
-    all_routes = AirportRoute.objects.select_related('from_airport', 'to_airport').all()
-    graph = defaultdict(list)
-    route_map = {}  # Maps (from_id, to_id) tuple to AirportRoute instance
-
-    for r in all_routes:
-        graph[r.from_airport_id].append((r.to_airport_id, r.duration))
-        route_map[(r.from_airport_id, r.to_airport_id)] = r
-
-    # Initialize Dijkstra algorithm data structures
-    dist = {start.id: 0}  # shortest known distance to each node
-    prev = {}             # predecessor node in shortest path
-    heap = [(0, start.id)]  # min-heap priority queue as (distance, node_id)
-
-    # Main Dijkstra loop
-    while heap:
-        d, node = heapq.heappop(heap)
-        if d != dist.get(node, float('inf')):
-            # Skip outdated distance values in heap
-            continue
-        if node == target.id:
-            # Target reached, terminate early
-            break
-        # Explore neighbors
-        for neighbor, weight in graph.get(node, []):
-            nd = d + weight
-            # Update shortest path if better distance found
-            if nd < dist.get(neighbor, float('inf')):
-                dist[neighbor] = nd
-                prev[neighbor] = node
-                heapq.heappush(heap, (nd, neighbor))
+    constraints = _constraints(graph, max_hops, avoid, max_leg_duration)
+    args = _shortest_args(from_code, to_code, algorithm, constraints, avoid)
+    hit, answer = result_cache.lookup('shortest', graph.version, args)
+    if not hit:
+        found = _locate(graph, start, target, algorithm, constraints)
+        answer = _path_answer(graph, start, *found) if found else None
+        result_cache.store('shortest', graph.version, args, answer)
 
     # If target is unreachable, return None
-    if target.id not in dist:
+    if answer is None:
         return None
+    return _route_result(graph, answer)
+
+
+@instrumented
+def find_k_shortest_routes(from_code: str, to_code: str, k: int) -> list:
+    """
+    Compute up to 'k' alternative routes between two airports, shortest first.
+
+    Uses Yen's algorithm (see routes.search.k_shortest_paths) on the shared
+    RouteGraph snapshot; routes never visit an airport twice. The first
+    route has the same distance as find_shortest_route_between()'s answer.
+    Answers are cached until the network changes (see routes.result_cache).
+
+    Args:
+        from_code: str - Starting airport code
+        to_code: str - Target airport code
+        k: int - maximum number of routes to return
+
+    Returns:
+        list of dicts shaped like find_shortest_route_between()'s result;
+        empty if either airport is unknown or no path exists.
+    """
+    graph = get_route_graph()
+    start = graph.index_of(from_code)
+    target = graph.index_of(to_code)
+    if start is None or target is None or k < 1:
+        return []
+
+    args = (from_code, to_code, k)
+    hit, answers = result_cache.lookup('k_shortest', graph.version, args)
+    if not hit:
+        if k == 1:
+            # A single route needs no reverse tree; use the regular search (and its indexes)
+            found = _locate(graph, start, target)
+            found = [found] if found else []
+        else:
+            stats = {}
+            with timed('search'):
+                found = k_shortest_paths(graph, start, target, k, stats)
+            count('spur_searches', stats.get('spurs', 0))
+            count('settled', stats.get('settled', 0))
+        answers = [_path_answer(graph, start, distance, edges) for distance, edges in found]
+        result_cache.store('k_shortest', graph.version, args, answers)
 
-    # Reconstruct the path by walking backward through the predecessors
-    path_ids = []
-    cur = target.id
-    while cur != start.id:
-        path_ids.append(cur)
-        cur = prev[cur]
-    path_ids.append(start.id)
-    path_ids.reverse()  # Reverse to get path from start to target
+    return [_route_result(graph, answer) for answer in answers]
 
-    # Fetch Airport instances from database for path IDs
-    airports = Airport.objects.in_bulk(path_ids)
 
-    # Convert path IDs to airport codes for easy readable output
-    path_codes = [airports[_id].code for _id in path_ids]
+@instrumented
+def find_subtree_stats(start_code: str):
+    """
+    Describe the subtree of the airport with 'start_code' in the left/right
+    route tree (see routes.analytics); every figure is an O(1) lookup in the
+    Euler-tour index of the cached graph.
+
+    When the network is not a forest (an airport with two incoming routes,
+    or a cycle), the figures describe the spanning forest laid out by a
+    depth-first traversal from the airports without incoming routes, left
+    before right: each airport sits under the first route that reaches it,
+    so a subtree can leave out airports reachable from its root, and
+    'forest' is False. Use find_reachable_airports() for reachability.
+
+    Args:
+        start_code: str - Airport code
+
+    Returns:
+        dict with keys:
+            'airport': the airport code,
+            'root': code of the root of its tree,
+            'parent': code of its parent, or None for a root,
+            'depth': routes from the root,
+            'height': routes on the longest downward path,
+            'subtree_size': airports in the subtree, itself included,
+            'subtree_duration': total duration of the routes in the subtree,
+            'forest': True if the network is a forest, i.e. the subtree is
+                exactly the set of airports reachable from it,
+        or None if the airport does not exist.
+    """
+    graph = get_route_graph()
+    node = graph.index_of(start_code)
+    if node is None:
+        return None
+    index = get_tree_index(graph)
+    parent = index.parent[node]
+    return {
+        'airport': start_code,
+        'root': graph.codes[index.root[node]],
+        'parent': graph.codes[parent] if parent >= 0 else None,
+        'depth': index.depth[node],
+        'height': index.height[node],
+        'subtree_size': index.subtree_size(node),
+        'subtree_duration': index.subtree_duration(node),
+        'forest': index.forest,
+    }
+
+
+@instrumented
+def is_in_subtree(ancestor_code: str, code: str):
+    """
+    Tell whether airport 'code' lies in the subtree of 'ancestor_code' (an
+    airport is in its own subtree), in O(1) via the Euler-tour index.
+
+    On a network that is not a forest this is membership of the spanning
+    forest described in find_subtree_stats(), not reachability.
+
+    Returns:
+        bool, or None if either airport does not exist.
+    """
+    graph = get_route_graph()
+    ancestor, node = graph.index_of(ancestor_code), graph.index_of(code)
+    if ancestor is None or node is None:
+        return None
+    return get_tree_index(graph).contains(ancestor, node)
+
+
+@instrumented
+def find_reachable_airports(start_code: str):
+    """
+    List the airports reachable from 'start_code' over any sequence of
+    routes, excluding the start itself.
+
+    On a forest this is a slice of the Euler tour, in depth-first order
+    (left before right); otherwise the routes are traversed.
+
+    Returns:
+        list of airport codes, or None if the airport does not exist.
+    """
+    graph = get_route_graph()
+    node = graph.index_of(start_code)
+    if node is None:
+        return None
+    reached = reachable_from(graph, get_tree_index(graph), node)
+    return [graph.codes[i] for i in reached[1:]]
+
+
+@instrumented
+async def afind_nth_node(start_code: str, direction: str, n: int):
+    """
+    Async counterpart of find_nth_node().
+
+    With the jump-pointer engine the chain is resolved in memory and the
+    airport is fetched with the async ORM; other engines run in a thread.
+    Answers are cached like find_nth_node()'s.
+    """
+    engine = getattr(settings, 'ROUTES_NTH_NODE_ENGINE', 'auto')
+    if engine in ('sql', 'chain'):
+        return await sync_to_async(nth_node)(start_code, direction, n)
+
+    # Keyed by current_stamp() like find_nth_node(), so both share cached
+    # answers and a hit never builds the route graph
+    stamp = cached_stamp()
+    if stamp is None:
+        stamp = await sync_to_async(current_stamp)()
+    args = (start_code, direction, n)
+    hit, airport_id = await result_cache.alookup('nth', stamp, args)
+    if not hit:
+        if engine == 'memory':
+            airport = await sync_to_async(nth_node)(start_code, direction, n)
+            airport_id = airport.pk if airport else None
+        else:
+            airport_id = await sync_to_async(nth_airport_id)(start_code, direction, n)
+        await result_cache.astore('nth', stamp, args, airport_id)
+    if airport_id is None:
+        return None
+    return await Airport.objects.filter(pk=airport_id).afirst()
+
+
+@instrumented
+async def afind_longest_node(start_code: str):
+    """
+    Async counterpart of find_longest_node().
+    """
+    route = await _longest_route(start_code).afirst()
+    return route.to_airport if route else None
 
-    # Fetch the actual AirportRoute instances for each leg of the path
-    routes = []
-    for a, b in zip(path_ids, path_ids[1:]):
-        routes.append(route_map.get((a, b)))
+
+@instrumented
+async def afind_shortest_route_between(from_code: str, to_code: str, algorithm: str = None,
+                                       max_hops: int = None, avoid=(), max_leg_duration: int = None):
+    """
+    Async counterpart of find_shortest_route_between().
+
+    The search runs on a bounded thread pool (settings.ROUTES_ASYNC_SEARCH_WORKERS
+    threads), so the event loop keeps serving other requests meanwhile.
+    """
+    graph = cached_route_graph() or await sync_to_async(get_route_graph)()
+    start = graph.index_of(from_code)
+    target = graph.index_of(to_code)
+    if start is None or target is None:
+        return None
+
+    constraints = _constraints(graph, max_hops, avoid, max_leg_duration)
+    args = _shortest_args(from_code, to_code, algorithm, constraints, avoid)
+    hit, answer = await result_cache.alookup('shortest', graph.version, args)
+    if not hit:
+        found = await _run_search(_locate, graph, start, target, algorithm, constraints)
+        answer = _path_answer(graph, start, *found) if found else None
+        await result_cache.astore('shortest', graph.version, args, answer)
+
+    if answer is None:
+        return None
+    return _route_result(graph, answer)
+
+
+def find_shortest_routes(pairs, pool=None):
+    """
+    Compute shortest paths for many (from_code, to_code) pairs at once.
+
+    Pairs are grouped by origin and answered with one single-source Dijkstra
+    per distinct origin over a single RouteGraph snapshot; each search stops
+    as soon as all destinations of its origin are settled. No database
+    queries are made once the snapshot is loaded.
+
+    The searches run in worker processes when a RoutePool is given, or when
+    settings.ROUTES_BATCH_WORKERS enables the shared pool (see routes.parallel).
+
+    Args:
+        pairs: iterable of (from_code, to_code) tuples
+        pool: optional RoutePool to run the searches on
+
+    Yields:
+        (from_code, to_code, result) tuples grouped by origin, in order of
+        first appearance. 'result' is shaped like find_shortest_route_between()'s
+        ('distance', 'path' and 'routes' as RouteLeg records), or None if
+        either airport is unknown or no path exists.
+    """
+    by_origin = {}
+    for from_code, to_code in pairs:
+        by_origin.setdefault(from_code, []).append(to_code)
+
+    # The shared pool is leased until the searches are done, so a pool
+    # replaced meanwhile by another thread is not closed under them
+    if pool is None and len(by_origin) > 1:
+        leased = shared_route_pool()
+    else:
+        leased = contextlib.nullcontext(pool)
+    with leased as pool:
+        graph = pool.graph if pool is not None else get_route_graph()
+
+        tasks = []
+        for origin, destinations in by_origin.items():
+            start = graph.index_of(origin)
+            if start is not None:
+                tasks.append((start, sorted({graph.index_of(code) for code in destinations} - {None})))
+        solved = pool.solve(tasks) if pool is not None else solve_tasks(graph, tasks)
+    answers = {origin: {target: (d, edges) for target, d, edges in found} for origin, found in solved}
+
+    for origin, destinations in by_origin.items():
+        found = answers.get(graph.index_of(origin), {})
+        for to_code in destinations:
+            distance, edges = found.get(graph.index_of(to_code), (None, None))
+            if distance is None:
+                yield origin, to_code, None
+                continue
+            yield origin, to_code, _route_result(graph, _path_answer(graph, graph.index_of(origin), distance, edges))
+
+
+def _longest_route(start_code: str):
+    """
+    Queryset of the routes leaving 'start_code', longest first (ties: left
+    first), with the destination joined in.
+    """
+    return (
+        AirportRoute.objects.filter(from_airport__code=start_code)
+        .select_related('to_airport')
+        .order_by('-duration', 'position')
+    )
+
+
+def _constraints(graph, max_hops: int = None, avoid=(), max_leg_duration: int = None):
+    """
+    Translate route constraints to constrained_search() keyword arguments,
+    or return None when there are none. Unknown avoided codes are dropped.
+    """
+    if max_hops is None and not avoid and max_leg_duration is None:
+        return None
+    indices = (graph.index_of(code) for code in avoid)
+    return {
+        'max_hops': max_hops,
+        'avoid': frozenset(index for index in indices if index is not None),
+        'max_leg': max_leg_duration,
+    }
+
+
+def _shortest_args(from_code: str, to_code: str, algorithm: str, constraints: dict, avoid) -> tuple:
+    """
+    Result cache arguments of a shortest-route query (unconstrained queries
+    keep their original key).
+    """
+    if constraints is None:
+        return from_code, to_code, algorithm
+    return from_code, to_code, algorithm, constraints['max_hops'], sorted(set(avoid)), constraints['max_leg']
+
+
+def _locate(graph, start: int, target: int, algorithm: str = None, constraints: dict = None):
+    """
+    Find the shortest path from 'start' to 'target' as (distance, edges), or None.
+
+    With 'constraints' (see _constraints) runs the constrained search.
+    Otherwise, when no algorithm is forced, uses the distance index if it
+    is fresh, else the contraction hierarchy if it is fresh, else the stored
+    shortest-path tree of a popular origin (see routes.shortest_trees).
+    Makes no database queries.
+    """
+    if constraints is not None:
+        stats = {}
+        with timed('search'):
+            found = constrained_search(graph, start, target, stats=stats, **constraints)
+        _count_search(stats)
+        return found
+    if algorithm is None:
+        index = get_distance_index(graph)
+        if index is not None:
+            with timed('search'):
+                return index.shortest(graph, start, target)
+        hierarchy = get_contraction_hierarchy(graph)
+        if hierarchy is not None:
+            stats = {}
+            with timed('search'):
+                found = hierarchy.shortest(graph, start, target, stats)
+            _count_search(stats)
+            return found
+        answered, found = shortest_trees.shortest_path(graph, start, target)
+        if answered:
+            return found
+        algorithm = _default_algorithm(graph)
+    return _search(graph, start, target, algorithm)
+
+
+def _search_executor() -> ThreadPoolExecutor:
+    """
+    Return the bounded thread pool used by the async search functions.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ROUTES_ASYNC_SEARCH_WORKERS', 4),
+                thread_name_prefix='route-search',
+            )
+        return _executor
+
+
+async def _run_search(func, *args):
+    """
+    Run func(*args) on the search thread pool, carrying the current context
+    (and with it the request's metrics) into the worker thread.
+    """
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_search_executor(), functools.partial(context.run, func, *args))
+
+
+def _default_algorithm(graph) -> str:
+    """
+    Pick the search algorithm for 'graph' when the caller did not choose one.
+    """
+    threshold = getattr(settings, 'ROUTES_BIDIRECTIONAL_MIN_AIRPORTS', 10000)
+    return 'bidirectional' if graph.num_airports >= threshold else 'dijkstra'
+
+
+def _search(graph, start: int, target: int, algorithm: str):
+    """
+    Run the point-to-point search named by 'algorithm', recording its
+    timing and search counters for routes.metrics.
+    """
+    searches = {'dijkstra': dijkstra, 'bidirectional': bidirectional_dijkstra}
+    if algorithm not in searches:
+        raise ValueError(f"Unknown shortest-path algorithm: {algorithm!r}")
+    stats = {}
+    with timed('search'):
+        found = searches[algorithm](graph, start, target, stats)
+    _count_search(stats)
+    return found
+
+
+def _count_search(stats: dict):
+    """
+    Record the counters of a search (see routes.search.SEARCH_STATS) for
+    routes.metrics, adding the stale heap entries it popped and skipped.
+    """
+    settled, pops = stats.get('settled', 0), stats.get('pops', 0)
+    count('settled', settled)
+    count('heap_pops', pops)
+    count('heap_pushes', stats.get('pushes', 0))
+    count('stale_pops', pops - settled)
+    count('relaxations', stats.get('relaxations', 0))
+
+
+def _path_answer(graph, start: int, distance: int, edges: list) -> dict:
+    """
+    Describe a path given as edge indices by its distance, airport codes and
+    route primary keys (the form kept in the result cache).
+    """
+    return {
+        'distance': distance,
+        'path': [graph.codes[start]] + [graph.codes[graph.targets[e]] for e in edges],
+        'route_ids': [graph.route_ids[e] for e in edges],
+    }
+
+
+def _route_result(graph, answer: dict):
+    """
+    Build the find_shortest_route_between result from a _path_answer()
+    computed on 'graph', describing each leg with a RouteLeg from the
+    snapshot rather than loading AirportRoute instances.
+    """
+    legs = [
+        graph.leg(graph.index_of(code), route_id)
+        for code, route_id in zip(answer['path'], answer['route_ids'])
+    ]
 
     # Return comprehensive path and route details
     return {
-        'distance': dist[target.id],
-        'path': path_codes,
-        'routes': routes
+        'distance': answer['distance'],
+        'path': answer['path'],
+        'routes': legs,
     }
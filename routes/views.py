@@ -1,7 +1,14 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from .forms import AirportRouteForm, NthNodeSearchForm, ShortestNodeSearchForm
-from .utils import find_nth_node, find_longest_node, find_shortest_route_between
+from .forms import AirportRouteForm, NthNodeSearchForm, ShortestNodeSearchForm, SubtreeSearchForm
+from .utils import (
+    find_k_shortest_routes, find_nth_node, find_longest_node, find_reachable_airports, find_shortest_route_between,
+    find_subtree_stats, is_in_subtree,
+)
+
+
+# Reachable airports listed on the subtree page before the rest are only counted
+MAX_LISTED_AIRPORTS = 100
 
 
 def home(request):
@@ -98,23 +105,81 @@ def shortest_node(request):
     Find the shortest path between two airports using multi-hop Dijkstra algorithm.
 
     For POST requests:
-        - Validate the shortest node search form (from_airport and to_airport codes).
+        - Validate the shortest node search form (from_airport and to_airport codes,
+          optional constraints on hops, avoided airports and leg duration).
         - Use utility function `find_shortest_route_between` to compute path and distance.
         - Format the path and distance in a readable message or failure message.
+        - If more than one route is asked for, list the alternatives from
+          `find_k_shortest_routes` as well, shortest first.
 
     For GET requests:
         - Display empty form with no result.
 
-    Renders 'shortest_node.html' with form and result.
+    Renders 'shortest_node.html' with form, result and alternatives.
     """
     result = None
+    alternatives = []
     form = ShortestNodeSearchForm(request.POST or None)
     if request.method == 'POST' and form.is_valid():
         from_code = form.cleaned_data['from_airport']
         to_code = form.cleaned_data['to_airport']
-        res = find_shortest_route_between(from_code, to_code)
+        k = form.cleaned_data['alternatives'] or 1
+        if k > 1:
+            found = find_k_shortest_routes(from_code, to_code, k)
+            res = found[0] if found else None
+            alternatives = [f"{alt['distance']} km: {' -> '.join(alt['path'])}" for alt in found[1:]]
+        else:
+            res = find_shortest_route_between(from_code, to_code, **form.constraints())
         if res:
             result = f"Shortest distance: {res['distance']} km. Path: {' -> '.join(res['path'])}"
         else:
             result = "No path found between the given airports."
-    return render(request, 'routes/shortest_node.html', {'form': form, 'result': result})
+    context = {'form': form, 'result': result, 'alternatives': alternatives}
+    return render(request, 'routes/shortest_node.html', context)
+
+
+def subtree(request):
+    """
+    Show subtree and reachability analytics for an airport.
+
+    For POST requests:
+        - Validate the subtree search form (airport code, optional second airport).
+        - Use `find_subtree_stats` for the subtree size, depth, height and total duration.
+        - Optionally check with `is_in_subtree` whether the second airport is in the subtree,
+          and list the reachable airports with `find_reachable_airports`.
+
+    For GET requests:
+        - Show empty form.
+
+    Renders 'subtree.html' with form and result lines.
+    """
+    results = []
+    form = SubtreeSearchForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        code = form.cleaned_data['airport_code']
+        stats = find_subtree_stats(code)
+        if stats is None:
+            results.append("Airport not found.")
+        else:
+            parent = stats['parent'] or "none (root)"
+            results.append(
+                f"{code}: depth {stats['depth']} below {stats['root']}, parent {parent}, height {stats['height']}."
+            )
+            results.append(
+                f"Subtree: {stats['subtree_size']} airports, {stats['subtree_duration']} km of routes."
+            )
+            if not stats['forest']:
+                results.append("The network is not a tree; the subtree follows the first route reaching each airport.")
+            other = form.cleaned_data['descendant_code']
+            if other:
+                inside = is_in_subtree(code, other)
+                if inside is None:
+                    results.append(f"Airport {other} not found.")
+                else:
+                    results.append(f"{other} is {'' if inside else 'not '}in the subtree of {code}.")
+            if form.cleaned_data['list_reachable']:
+                reachable = find_reachable_airports(code)
+                listed = ', '.join(reachable[:MAX_LISTED_AIRPORTS]) or "none"
+                more = len(reachable) - MAX_LISTED_AIRPORTS
+                results.append(f"Reachable ({len(reachable)}): {listed}" + (f" and {more} more." if more > 0 else "."))
+    return render(request, 'routes/subtree.html', {'form': form, 'results': results})